@@ -12,7 +12,9 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 # ADDED: APIKeyHeader
 from fastapi.security import APIKeyHeader 
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -38,6 +40,38 @@ async def verify_api_key(api_key: str = Depends(api_key_header)):
     return api_key
 # -----------------------------
 
+# --- LIFESPAN (shared resources) ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from src.llm.clients import get_client, close_clients
+    from src.llm.context_cache import context_cache
+    from src.llm.configs import config_registry
+    from src.database.client import get_supabase, close_supabase
+    from src.database.user_questions import interaction_writer
+    from src.question_generation.prefetch import question_pool
+    from src.question_generation.bank import question_bank
+    from src.llm.response_cache import response_cache
+    from src.studio.sessions import studio_sessions
+
+    # Create the pooled clients up front so the first request doesn't pay for them
+    get_client()
+    get_supabase()
+    # Generator modules are imported with the routers, so all builders are registered
+    config_registry.warm()
+    interaction_writer.start()
+    yield
+    # Stop speculative question generation before the clients close
+    await question_pool.aclose()
+    await question_bank.aclose()
+    # Flush queued interaction saves before the database pool goes away
+    await asyncio.to_thread(interaction_writer.close)
+    await context_cache.aclose()
+    await close_clients()
+    close_supabase()
+    response_cache.close()
+    studio_sessions.close()
+# -----------------------------
+
 # Create FastAPI application instance
 # REMOVED: dependencies=[Depends(verify_api_key)] from here
 # We don't want to lock the /health endpoint!
@@ -46,7 +80,8 @@ app = FastAPI(
     description="REST API for personalized AI tutoring system",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS middleware
@@ -109,6 +144,7 @@ from src.api.endpoints.steps import router as steps_router
 from src.api.endpoints.subjects import router as subjects_router
 from src.api.endpoints.grading import router as grading_router
 from src.api.endpoints.studio import router as studio_router
+from src.api.endpoints.metrics import router as metrics_router
 
 # We add the dependency here!
 # This protects /questions, /steps, /subjects, and /grading, but leaves /health open.
@@ -119,6 +155,7 @@ app.include_router(steps_router, dependencies=protected_deps)
 app.include_router(subjects_router, dependencies=protected_deps)
 app.include_router(grading_router, dependencies=protected_deps)
 app.include_router(studio_router, dependencies=protected_deps)
+app.include_router(metrics_router, dependencies=protected_deps)
 
 if __name__ == "__main__":
     import uvicorn
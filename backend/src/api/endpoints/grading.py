@@ -2,24 +2,38 @@
 Grading API endpoints.
 
 This module contains the POST /api/v1/grade-answer endpoint
-for grading student answers.
+for grading student answers, its streaming (SSE) variant, and the
+POST /api/v1/grade-answers batch endpoint.
 """
 
 import json
-from fastapi import APIRouter, HTTPException
-from src.api.models import GradingRequest, GradingResponse, ErrorResponse
+from fastapi import APIRouter, HTTPException, Response
+from src.api.models import GradingRequest, GradingResponse, GradingBatchRequest, GradingBatchResponse, ErrorResponse
+from src.api.streaming import sse_response
+from src.llm.response_cache import response_cache
+from src.llm.singleflight import request_key, single_flight
 from src.solo_mode.main import generate as grade_answer
+from src.solo_mode.main import generate_stream as grade_answer_stream
+from src.solo_mode.main import generate_batch as grade_answers
 
 router = APIRouter(prefix="/api/v1", tags=["grading"])
 
 
+def _grading_input(request: GradingRequest) -> str:
+    return json.dumps({
+        "question": request.question,
+        "student_answer": request.student_answer
+    })
+
+
 @router.post("/grade-answer", response_model=GradingResponse)
-async def grade_answer_endpoint(request: GradingRequest):
+async def grade_answer_endpoint(request: GradingRequest, response: Response):
     """
     Grade a student's answer to a question.
     
     Args:
         request: GradingRequest containing model_name, question, and student_answer
+        response: Used to set the X-Cache (HIT/MISS) header when the response cache is on
         
     Returns:
         GradingResponse containing marks, correction, and remarks
@@ -29,20 +43,29 @@ async def grade_answer_endpoint(request: GradingRequest):
     """
     try:
         # Prepare input JSON for the grading function
-        input_json = json.dumps({
-            "question": request.question,
-            "student_answer": request.student_answer
-        })
+        input_json = _grading_input(request)
         
-        # Call the grading function
-        response_data = grade_answer(request.model_name, input_json)
+        # Call the grading function; repeated inputs come from the response cache
+        # and identical requests already in flight share one call
+        response_data, cache_status = await response_cache.get_or_call(
+            "grade-answer",
+            request.model_name,
+            request.model_dump(exclude={"model_name"}),
+            lambda: single_flight.do(
+                request_key("/grade-answer", request),
+                lambda: grade_answer(request.model_name, input_json, request.latency_tier),
+            ),
+        )
+        if cache_status:
+            response.headers["X-Cache"] = cache_status
         
         # The response_data is already a dict from the function_call.args
         # Extract the required fields
         return GradingResponse(
             marks=response_data["marks"],
             correction=response_data["correction"],
-            remarks=response_data["remarks"]
+            remarks=response_data["remarks"],
+            model_used=response_data.get("model_used")
         )
         
     except KeyError as e:
@@ -87,3 +110,61 @@ async def grade_answer_endpoint(request: GradingRequest):
                 status_code=500,
                 detail=f"Internal server error: Grading failed ({error_type})"
             )
+
+
+@router.post("/grade-answer/stream")
+async def grade_answer_stream_endpoint(request: GradingRequest):
+    """
+    Streaming variant of /grade-answer (Server-Sent Events).
+    
+    Emits `delta` events with the `correction` text as it is generated,
+    then a `result` event containing a GradingResponse (or an `error` event).
+    
+    Args:
+        request: GradingRequest containing model_name, question, and student_answer
+        
+    Returns:
+        text/event-stream response
+    """
+    events = grade_answer_stream(request.model_name, _grading_input(request), request.latency_tier)
+    return sse_response(
+        events,
+        lambda data: GradingResponse(
+            marks=data["marks"],
+            correction=data["correction"],
+            remarks=data["remarks"],
+            model_used=data.get("model_used")
+        ),
+        "Grading",
+    )
+
+
+@router.post("/grade-answers", response_model=GradingBatchResponse)
+async def grade_answers_endpoint(request: GradingBatchRequest):
+    """
+    Grade a batch of answers (e.g. a whole worksheet) in as few model calls as possible.
+    
+    Items are packed several to a model call and graded in parallel. Failures
+    are per item: an item that could not be graded carries an `error` instead
+    of a `result`, and the other items are still returned.
+    
+    Args:
+        request: GradingBatchRequest containing model_name and up to 50 items
+        
+    Returns:
+        GradingBatchResponse with one result per item (in request order) and throughput stats
+        
+    Raises:
+        HTTPException: 500 if the batch could not be processed at all
+    """
+    try:
+        return await grade_answers(
+            request.model_name,
+            [item.model_dump() for item in request.items],
+            request.latency_tier,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: Batch grading failed ({type(e).__name__})"
+        )
@@ -0,0 +1,54 @@
+"""
+Metrics API endpoints.
+
+This module contains the GET /api/v1/metrics endpoint exposing
+in-process counters (caches, queues) for monitoring.
+"""
+
+from fastapi import APIRouter
+from src.database.gene_question import cartridge_cache
+from src.database.user_questions import history_cache, interaction_writer
+from src.llm import calls
+from src.llm.configs import config_registry
+from src.llm.context_cache import context_cache
+from src.llm.governor import governor
+from src.llm.response_cache import response_cache
+from src.llm.routing import routing_table
+from src.llm.singleflight import single_flight
+from src.question_generation.bank import question_bank
+from src.question_generation.prefetch import question_pool
+from src.solo_mode.main import batch_stats, symbolic_stats
+from src.steps_generation.main import speculation_stats
+from src.steps_generation.sessions import step_sessions
+from src.studio.sessions import studio_sessions
+
+router = APIRouter(prefix="/api/v1", tags=["metrics"])
+
+
+@router.get("/metrics", response_model=dict)
+async def get_metrics():
+    """
+    Return a snapshot of in-process performance counters.
+    
+    Returns:
+        Dictionary of counters grouped by component
+    """
+    return {
+        "cartridge_cache": cartridge_cache.stats(),
+        "history_cache": history_cache.stats(),
+        "interaction_writer": interaction_writer.stats(),
+        "context_cache": context_cache.stats(),
+        "configs": config_registry.stats(),
+        "question_pool": question_pool.stats(),
+        "question_bank": question_bank.stats(),
+        "step_sessions": step_sessions.stats(),
+        "step_speculation": speculation_stats(),
+        "studio_sessions": studio_sessions.stats(),
+        "single_flight": single_flight.stats(),
+        "response_cache": response_cache.stats(),
+        "symbolic_grader": symbolic_stats(),
+        "batch_grading": batch_stats(),
+        "governor": governor.stats(),
+        "calls": calls.stats(),
+        "routing": routing_table.stats(),
+    }
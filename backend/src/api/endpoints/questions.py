@@ -42,13 +42,19 @@ async def generate_question_endpoint(request: QuestionRequest):
             input_json = {}
         
         # Call the existing question generation function
-        response_text = generate_question(request.model_name, input_json, request.user_id, request.subject_id)
+        response_text = await generate_question(
+            request.model_name, input_json, request.user_id, request.subject_id, request.latency_tier
+        )
         
         # Parse the JSON response
         response_data = json.loads(response_text)
         
         # Return the formatted response
-        return QuestionResponse(question=response_data["question"], level=response_data["level"])
+        return QuestionResponse(
+            question=response_data["question"],
+            level=response_data["level"],
+            model_used=response_data.get("model_used")
+        )
         
     except json.JSONDecodeError as e:
         raise HTTPException(
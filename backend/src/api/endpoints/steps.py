@@ -2,25 +2,81 @@
 Steps generation API endpoints.
 
 This module contains the POST /api/v1/generate-steps endpoint
-for providing step-by-step guidance for algebra problems.
+for providing step-by-step guidance for algebra problems, and its
+streaming (SSE) variant.
 """
 
 import json
 from typing import Union
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from src.api.models import StepsRequest, StepResponse, FinalAnswerResponse, ErrorResponse
+from src.api.streaming import sse_response
+from src.llm.response_cache import response_cache
+from src.llm.singleflight import request_key, single_flight
 from src.steps_generation.main import generate as generate_steps
+from src.steps_generation.main import generate_stream as generate_steps_stream
 
 router = APIRouter(prefix="/api/v1", tags=["steps"])
 
 
+def _steps_input(request: StepsRequest) -> str:
+    input_data = {
+        "question": request.question
+    }
+    
+    # Add conversation history if provided
+    if request.conversation_history:
+        conversation_history_data = []
+        for step in request.conversation_history:
+            conversation_history_data.append({
+                "step": step.step,
+                "your_prompt": step.your_prompt,
+                "student_answer": step.student_answer
+            })
+        input_data["conversation_history"] = conversation_history_data
+    
+    # Add student_answer if provided (scenario 3)
+    if request.student_answer:
+        input_data["student_answer"] = request.student_answer
+    
+    return json.dumps(input_data)
+
+
+def _dict_to_response(response_data: dict) -> Union[StepResponse, FinalAnswerResponse]:
+    if "next_step" in response_data and response_data.get("type") != "final_answer":
+        return StepResponse(
+            type="step",
+            next_step=response_data["next_step"],
+            model_used=response_data.get("model_used"),
+            session_id=response_data.get("session_id")
+        )
+    elif "marks" in response_data:
+        remarks = response_data.get("remarks", [])
+        remarks_list = remarks if remarks else None
+        
+        return FinalAnswerResponse(
+            type="final_answer",
+            marks=response_data["marks"],
+            tip=response_data.get("tip", ""),
+            remarks=remarks_list,
+            model_used=response_data.get("model_used"),
+            session_id=response_data.get("session_id")
+        )
+    else:
+        raise HTTPException(
+            status_code=500,
+            detail="Invalid response format from steps generation service: missing required fields"
+        )
+
+
 @router.post("/generate-steps", response_model=Union[StepResponse, FinalAnswerResponse])
-async def generate_steps_endpoint(request: StepsRequest):
+async def generate_steps_endpoint(request: StepsRequest, response: Response):
     """
     Generate step-by-step guidance for algebra problems.
     
     Args:
         request: StepsRequest containing model_name, question, and optional conversation_history
+        response: Used to set the X-Cache (HIT/MISS) header when the response cache is on
         
     Returns:
         StepResponse for intermediate steps or FinalAnswerResponse for completed problems
@@ -30,29 +86,33 @@ async def generate_steps_endpoint(request: StepsRequest):
     """
     try:
         # Prepare input JSON for the existing generate function
-        input_data = {
-            "question": request.question
-        }
-        
-        # Add conversation history if provided
-        if request.conversation_history:
-            conversation_history_data = []
-            for step in request.conversation_history:
-                conversation_history_data.append({
-                    "step": step.step,
-                    "your_prompt": step.your_prompt,
-                    "student_answer": step.student_answer
-                })
-            input_data["conversation_history"] = conversation_history_data
-        
-        # Add student_answer if provided (scenario 3)
-        if request.student_answer:
-            input_data["student_answer"] = request.student_answer
+        input_json = _steps_input(request)
         
-        input_json = json.dumps(input_data)
-        
-        # Call the existing steps generation function
-        response_data = generate_steps(request.model_name, input_json)
+        if request.session_id or request.start_session:
+            # Session turns update server-side state and each conversation gets its own session id,
+            # so they are neither shared with identical requests nor served from the response cache
+            response_data = await generate_steps(
+                request.model_name, input_json, request.latency_tier,
+                request.session_id, request.student_answer, request.start_session,
+            )
+            cache_status = None
+        else:
+            # Call the existing steps generation function; identical requests already in flight share one call
+            def call():
+                return single_flight.do(
+                    request_key("/generate-steps", request),
+                    lambda: generate_steps(request.model_name, input_json, request.latency_tier),
+                )
+
+            # Repeated conversations come from the response cache
+            response_data, cache_status = await response_cache.get_or_call(
+                "generate-steps",
+                request.model_name,
+                request.model_dump(exclude={"model_name"}),
+                call,
+            )
+        if cache_status:
+            response.headers["X-Cache"] = cache_status
         
         # Parse the function call response and format according to API specification
         # The response_data should be a function call args object from Gemini
@@ -92,26 +152,7 @@ async def generate_steps_endpoint(request: StepsRequest):
                 )
         elif isinstance(response_data, dict):
             # Handle case where response_data is a dict
-            if "next_step" in response_data:
-                return StepResponse(
-                    type="step",
-                    next_step=response_data["next_step"]
-                )
-            elif "marks" in response_data:
-                remarks = response_data.get("remarks", [])
-                remarks_list = remarks if remarks else None
-                
-                return FinalAnswerResponse(
-                    type="final_answer",
-                    marks=response_data["marks"],
-                    tip=response_data.get("tip", ""),
-                    remarks=remarks_list
-                )
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Invalid response format from steps generation service: missing required fields"
-                )
+            return _dict_to_response(response_data)
         else:
             # Try to access attributes directly
             try:
@@ -187,4 +228,26 @@ async def generate_steps_endpoint(request: StepsRequest):
             raise HTTPException(
                 status_code=500,
                 detail=f"Internal server error: Steps generation failed ({error_type})"
-            )
\ No newline at end of file
+            )
+
+
+@router.post("/generate-steps/stream")
+async def generate_steps_stream_endpoint(request: StepsRequest):
+    """
+    Streaming variant of /generate-steps (Server-Sent Events).
+    
+    Emits `delta` events with the `next_step` (or final `tip`) text as it is
+    generated, then a `result` event containing a StepResponse or
+    FinalAnswerResponse (or an `error` event).
+    
+    Args:
+        request: StepsRequest containing model_name, question, and optional conversation_history
+        
+    Returns:
+        text/event-stream response
+    """
+    events = generate_steps_stream(
+        request.model_name, _steps_input(request), request.latency_tier,
+        request.session_id, request.student_answer, request.start_session,
+    )
+    return sse_response(events, _dict_to_response, "Steps generation")
@@ -5,12 +5,27 @@ This module contains endpoints for the Studio feature.
 """
 
 from fastapi import APIRouter, HTTPException
-from src.api.models import StudioRequest, StudioResponse
-from src.studio.main import generate
+from src.api.models import StudioDraftResponse, StudioRequest, StudioResponse
+from src.api.streaming import sse_response
+from src.studio.main import generate, generate_stream
+from src.studio.sessions import studio_sessions
 
 router = APIRouter(prefix="/api/v1", tags=["studio"])
 
 
+def _studio_input(request: StudioRequest) -> dict:
+    input_data = {
+        "user_input": request.user_input,
+        "history": [item.model_dump() for item in request.history],
+    }
+    
+    if request.file:
+        input_data["file"] = request.file.model_dump()
+    if request.session_id:
+        input_data["session_id"] = request.session_id
+    return input_data
+
+
 @router.post("/studio/generate", response_model=StudioResponse)
 async def generate_studio_response(request: StudioRequest):
     """
@@ -24,16 +39,10 @@ async def generate_studio_response(request: StudioRequest):
     """
     try:
         # Prepare input data for the generate function
-        input_data = {
-            "user_input": request.user_input,
-            "history": [item.model_dump() for item in request.history],
-        }
-        
-        if request.file:
-            input_data["file"] = request.file.model_dump()
+        input_data = _studio_input(request)
             
         # Call the generate function
-        response = generate(model=request.model_name, input_data=input_data)
+        response = await generate(model=request.model_name, input_data=input_data)
         
         # Map response to StudioResponse
         return StudioResponse(**response)
@@ -43,3 +52,50 @@ async def generate_studio_response(request: StudioRequest):
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
+
+
+@router.post("/studio/generate/stream")
+async def generate_studio_response_stream(request: StudioRequest):
+    """
+    Streaming variant of /studio/generate (Server-Sent Events).
+    
+    Emits `delta` events with the conversation message as it is generated;
+    for a cartridge, a `meta` event and then one `level` event per validated
+    curriculum level. Ends with a `result` event containing a StudioResponse
+    (or an `error` event).
+    
+    Args:
+        request: StudioRequest object containing user input, history, and optional file.
+        
+    Returns:
+        text/event-stream response
+    """
+    events = generate_stream(model=request.model_name, input_data=_studio_input(request))
+    return sse_response(events, lambda data: StudioResponse(**data), "Studio generation")
+
+
+@router.get("/studio/sessions/{session_id}/draft", response_model=StudioDraftResponse)
+async def get_studio_draft(session_id: str):
+    """
+    Return the cartridge generated so far in a Studio session.
+    
+    Levels are saved as they stream, so a client that lost the stream can
+    recover the partial cartridge. `complete` is true once the whole
+    cartridge has been generated.
+    
+    Args:
+        session_id: The session_id issued in a Studio response (or `session` stream event)
+        
+    Returns:
+        StudioDraftResponse object
+        
+    Raises:
+        HTTPException: 404 if the session has no draft (or it expired)
+    """
+    draft = await studio_sessions.get_draft(session_id)
+    if draft is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No cartridge draft for this session"
+        )
+    return StudioDraftResponse(session_id=session_id, **draft)
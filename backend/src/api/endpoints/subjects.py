@@ -4,6 +4,7 @@ Subject API endpoints.
 This module contains endpoints for fetching and creating subjects.
 """
 
+import asyncio
 from typing import List
 from fastapi import APIRouter, HTTPException, Query
 from src.api.models import Subject, SubjectCreate
@@ -32,7 +33,7 @@ async def get_subjects(user_id: str = Query(..., description="User ID to fetch s
         HTTPException: For various error conditions (400, 500)
     """
     try:
-        subjects = fetch_cartridge(user_id)
+        subjects = await asyncio.to_thread(fetch_cartridge, user_id)
         return subjects
     except Exception as e:
         error_message = str(e)
@@ -70,7 +71,7 @@ async def create_subject(subject: SubjectCreate):
         module_json = subject.model_dump()
         
         # Insert into database
-        inserted_row, subject_id = insert_module(module_json)
+        inserted_row, subject_id = await asyncio.to_thread(insert_module, module_json)
         
         return {
             "subject_id": subject_id,
@@ -6,7 +6,23 @@ and response validation.
 """
 
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+from src.llm.tiers import latency_tiers
+
+# Most items one /grade-answers request may carry
+GRADING_BATCH_MAX_ITEMS = 50
+
+
+class LatencyTierRequest(BaseModel):
+    """Optional `latency_tier` ("fast", "balanced", "deep"); the endpoint's default tier when omitted."""
+    latency_tier: Optional[str] = None
+
+    @field_validator("latency_tier")
+    @classmethod
+    def _known_tier(cls, tier):
+        if tier is not None and tier not in latency_tiers.names:
+            raise ValueError(f"latency_tier must be one of {latency_tiers.names}")
+        return tier
 
 
 # Task 2.1: Request models for question generation endpoint
@@ -17,7 +33,7 @@ class PreviousQuestion(BaseModel):
     remarks: List[str]
 
 
-class QuestionRequest(BaseModel):
+class QuestionRequest(LatencyTierRequest):
     """Request model for question generation endpoint."""
     model_name: str
     user_id: str
@@ -33,12 +49,17 @@ class ConversationStep(BaseModel):
     student_answer: str
 
 
-class StepsRequest(BaseModel):
+class StepsRequest(LatencyTierRequest):
     """Request model for steps generation endpoint."""
     model_name: str
     question: str
     conversation_history: Optional[List[ConversationStep]] = None
     student_answer: Optional[str] = None
+    # Id issued in an earlier StepResponse; while the server-side session is live and has served
+    # len(conversation_history) steps, only student_answer is sent to the model. Unknown ids get a new one
+    session_id: Optional[str] = None
+    # Ask the server to keep this conversation; the response carries its session_id
+    start_session: bool = False
 
 
 # Task 2.3: Response models for API outputs
@@ -46,12 +67,15 @@ class QuestionResponse(BaseModel):
     """Response model for question generation endpoint."""
     question: str
     level: int
+    model_used: Optional[str] = None
 
 
 class StepResponse(BaseModel):
     """Response model for intermediate step in steps generation."""
     type: str = "step"
     next_step: str
+    model_used: Optional[str] = None
+    session_id: Optional[str] = None
 
 
 class FinalAnswerResponse(BaseModel):
@@ -60,6 +84,8 @@ class FinalAnswerResponse(BaseModel):
     marks: int
     tip: str
     remarks: Optional[List[str]]
+    model_used: Optional[str] = None
+    session_id: Optional[str] = None
 
 
 class ErrorResponse(BaseModel):
@@ -100,7 +126,7 @@ class Subject(BaseModel):
 
 
 # Task 4: Request/Response models for grading endpoint
-class GradingRequest(BaseModel):
+class GradingRequest(LatencyTierRequest):
     """Request model for grading endpoint."""
     model_name: str
     question: str
@@ -112,6 +138,39 @@ class GradingResponse(BaseModel):
     marks: int
     correction: str
     remarks: List[str]
+    model_used: Optional[str] = None
+
+
+class GradingBatchItem(BaseModel):
+    question: str
+    student_answer: str
+
+
+class GradingBatchRequest(LatencyTierRequest):
+    """Request model for the batch grading endpoint."""
+    model_name: str
+    items: List[GradingBatchItem] = Field(min_length=1, max_length=GRADING_BATCH_MAX_ITEMS)
+
+
+class GradingBatchItemResult(BaseModel):
+    """Result for one item: `result` on success, `error` if that item could not be graded."""
+    index: int
+    result: Optional[GradingResponse] = None
+    error: Optional[str] = None
+
+
+class GradingBatchStats(BaseModel):
+    items: int
+    failed: int
+    model_calls: int
+    seconds: float
+    items_per_second: float
+
+
+class GradingBatchResponse(BaseModel):
+    """Response model for the batch grading endpoint."""
+    results: List[GradingBatchItemResult]
+    stats: GradingBatchStats
 
 
 # Task 5: Request/Response models for Studio endpoint
@@ -131,6 +190,9 @@ class StudioRequest(BaseModel):
     user_input: Optional[str] = None
     history: List[StudioHistoryItem] = []
     file: Optional[StudioFile] = None
+    # Id issued in an earlier StudioResponse; while the session is live and has len(history)
+    # exchanges, only user_input (and a new file) is added to its turns. Unknown ids get a new one
+    session_id: Optional[str] = None
 
 
 class StudioResponse(BaseModel):
@@ -138,4 +200,14 @@ class StudioResponse(BaseModel):
     tool: Optional[str] = None
     args: Optional[dict] = None
     text: Optional[str] = None
-    error: Optional[str] = None
\ No newline at end of file
+    error: Optional[str] = None
+    model_used: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class StudioDraftResponse(BaseModel):
+    """Cartridge generated so far in a Studio session (levels arrive one at a time when streaming)."""
+    session_id: str
+    meta: Optional[dict] = None
+    curriculum: List[SubjectCurriculumItem] = []
+    complete: bool = False
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Server-Sent Events helpers for the streaming endpoints.
+
+Each stream emits `delta` events with partial text while the model is
+generating, then a single `result` event carrying the same response model
+as the non-streaming endpoint, or an `error` event (ErrorResponse).
+"""
+
+import json
+from typing import Any, AsyncIterator, Callable, Dict
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from src.api.models import ErrorResponse
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(
+    events: AsyncIterator[Dict[str, Any]],
+    to_result: Callable[[Dict[str, Any]], BaseModel],
+    action: str,
+) -> StreamingResponse:
+    """
+    Wrap a generator event stream as an SSE response.
+
+    Args:
+        events: Async iterator of {"event": "delta" | "result", ...} dicts
+        to_result: Maps the final result data onto the endpoint's response model
+        action: Human readable name used in error details (e.g. "Grading")
+    """
+    async def body():
+        try:
+            async for event in events:
+                name = event["event"]
+                if name == "result":
+                    yield sse_event("result", to_result(event["data"]).model_dump())
+                else:
+                    yield sse_event(name, {k: v for k, v in event.items() if k != "event"})
+        except HTTPException as e:
+            error = ErrorResponse(error=f"HTTP{e.status_code}Error", detail=str(e.detail))
+            yield sse_event("error", error.model_dump())
+        except Exception as e:
+            error = ErrorResponse(
+                error=type(e).__name__,
+                detail=f"Internal server error: {action} failed ({type(e).__name__})",
+            )
+            yield sse_event("error", error.model_dump())
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
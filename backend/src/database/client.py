@@ -0,0 +1,71 @@
+"""
+Shared Supabase client for the data-access modules.
+
+One client (and one bounded httpx connection pool) is created lazily on first
+use or at app startup and injected into SolanceMemory, get_subject_details,
+fetch_cartridge and insert_module, instead of each module opening its own
+client at import time.
+"""
+
+import os
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upper bound on sockets held open to Supabase by this process
+SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", 20))
+SUPABASE_KEEPALIVE_CONNECTIONS = int(os.environ.get("SUPABASE_KEEPALIVE_CONNECTIONS", 10))
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 30))
+
+_client: Client = None
+_http_client: httpx.Client = None
+_lock = threading.Lock()
+
+
+def get_supabase() -> Client:
+    """Return the process-wide Supabase client, creating it on first use."""
+    global _client, _http_client
+
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is None:
+            url: str = os.environ.get("SUPABASE_URL")
+            key: str = os.environ.get("SUPABASE_KEY")
+
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_POOL_SIZE,
+                    max_keepalive_connections=SUPABASE_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=SUPABASE_TIMEOUT,
+            )
+            _client = create_client(
+                url,
+                key,
+                options=ClientOptions(
+                    httpx_client=_http_client,
+                    postgrest_client_timeout=SUPABASE_TIMEOUT,
+                ),
+            )
+        return _client
+
+
+def close_supabase():
+    """Close the shared connection pool. Called from the FastAPI lifespan on shutdown."""
+    global _client, _http_client
+
+    with _lock:
+        http_client = _http_client
+        _client = None
+        _http_client = None
+
+    if http_client is not None:
+        try:
+            http_client.close()
+        except Exception as e:
+            print(f"❌ Error closing Supabase client: {e}")
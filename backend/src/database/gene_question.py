@@ -1,16 +1,31 @@
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 from postgrest.exceptions import APIError
+from src.database.client import get_supabase
+from src.utils.ttl_cache import TTLCache
 
 load_dotenv()
 
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+# Cartridges almost never change after insert_module, so the question hot path
+# serves them from memory. Entries are dropped explicitly on insert/update.
+CARTRIDGE_CACHE_SIZE = int(os.environ.get("CARTRIDGE_CACHE_SIZE", 256))
+CARTRIDGE_CACHE_TTL = float(os.environ.get("CARTRIDGE_CACHE_TTL", 600))
+cartridge_cache = TTLCache(maxsize=CARTRIDGE_CACHE_SIZE, ttl=CARTRIDGE_CACHE_TTL)
 
 
-def get_subject_details(subject_id: str):
+def invalidate_subject_details(subject_id: str = None):
+    """
+    Drop a cached cartridge after it is inserted or updated.
+    With no subject_id the whole cache is cleared.
+    """
+    if subject_id is None:
+        cartridge_cache.clear()
+    else:
+        cartridge_cache.invalidate(subject_id)
+
+
+def get_subject_details(subject_id: str, client: Client = None, use_cache: bool = True):
     """
     Fetch a single module from subject-cartridge by subject_id.
 
@@ -22,7 +37,17 @@ def get_subject_details(subject_id: str):
     }
     
     Returns None if subject_id is not found.
+    Uses the shared Supabase client unless `client` is given.
+
+    Results are served from `cartridge_cache` when possible; the returned
+    dict is shared between callers and must not be mutated.
     """
+    if use_cache:
+        cached = cartridge_cache.get(subject_id)
+        if cached is not None:
+            return cached
+
+    supabase = client or get_supabase()
     try:
         response = (
             supabase.table("subject-cartridge")
@@ -47,7 +72,8 @@ def get_subject_details(subject_id: str):
             "description": meta.get("description"),
             "curriculum": curriculum            # pass through exactly as stored
         }
-        
+
+        cartridge_cache.set(subject_id, result)
         return result
         
     except APIError as e:
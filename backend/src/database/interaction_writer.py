@@ -0,0 +1,189 @@
+"""
+Bounded background writer for user_interactions.
+
+Replaces the thread-per-save in SolanceMemory with one worker thread that
+drains a bounded queue, coalesces rows into bulk inserts, retries failed
+batches with exponential backoff and flushes on shutdown.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+from supabase import Client
+from dotenv import load_dotenv
+from src.database.client import get_supabase
+
+load_dotenv()
+
+INTERACTION_QUEUE_SIZE = int(os.environ.get("INTERACTION_QUEUE_SIZE", 1000))
+INTERACTION_BATCH_SIZE = int(os.environ.get("INTERACTION_BATCH_SIZE", 50))
+# How long the worker waits to fill a batch before writing what it has
+INTERACTION_FLUSH_INTERVAL = float(os.environ.get("INTERACTION_FLUSH_INTERVAL", 0.5))
+INTERACTION_MAX_RETRIES = int(os.environ.get("INTERACTION_MAX_RETRIES", 3))
+
+_STOP = object()
+
+
+class InteractionWriter:
+    def __init__(
+        self,
+        table_name: str = "user_interactions",
+        client: Client = None,
+        maxsize: int = INTERACTION_QUEUE_SIZE,
+        batch_size: int = INTERACTION_BATCH_SIZE,
+        flush_interval: float = INTERACTION_FLUSH_INTERVAL,
+        max_retries: int = INTERACTION_MAX_RETRIES,
+        on_failure: Callable[[Dict[str, Any]], None] = None,
+    ):
+        """
+        Args:
+            table_name: Table the rows are inserted into
+            client: Supabase client (defaults to the shared one)
+            on_failure: Called with each row that was dropped or could not be written
+        """
+        self.table_name = table_name
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.on_failure = on_failure
+
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+        # Counters are bumped from the submitting threads and the worker
+        self._stats_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retried = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the worker thread (idempotent; also done lazily on first submit)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="interaction-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Queue a row for insertion. Never blocks, since it is called from the
+        event loop: when the queue is full the row is dropped.
+
+        Returns:
+            True if the row was queued, False if it was dropped
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._count(dropped=1)
+            print(f"❌ [Background Error] Interaction queue full, dropping row for user {row.get('user_id')}")
+            self._notify_failure([row])
+            return False
+
+        self._count(enqueued=1)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the worker."""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print("❌ [Background Error] Interaction queue still full at shutdown")
+            return
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_maxsize": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "batches": self.batches,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+    def _count(self, **deltas: int):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stopping:
+                # Drain whatever was queued behind the stop marker
+                leftover = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        leftover.append(item)
+                for i in range(0, len(leftover), self.batch_size):
+                    self._write(leftover[i:i + self.batch_size])
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        client = self.client or get_supabase()
+        delay = 0.2
+        for attempt in range(self.max_retries + 1):
+            try:
+                client.table(self.table_name).insert(batch).execute()
+                self._count(written=len(batch), batches=1)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count(failed=len(batch))
+                    print(f"❌ [Background Error] Failed to save {len(batch)} interaction(s): {e}")
+                    self._notify_failure(batch)
+                    return
+                self._count(retried=1)
+                time.sleep(delay)
+                delay *= 2
+
+    def _notify_failure(self, rows: List[Dict[str, Any]]):
+        if self.on_failure is None:
+            return
+        for row in rows:
+            try:
+                self.on_failure(row)
+            except Exception as e:
+                print(f"❌ [Background Error] Interaction failure hook raised: {e}")
@@ -0,0 +1,90 @@
+"""
+Pre-generated questions, keyed by (subject_id, level, concept).
+
+Rows are written in bulk by the offline batch runner
+(src/question_generation/batch_runner.py) and by the online top-ups of thin
+buckets, and served by src/question_generation/bank.py. Each row's question_id is a hash
+of the subject and the question text, so re-running or resuming a job never
+stores the same question twice.
+
+Table "question_bank":
+    question_id  text primary key
+    subject_id   text
+    level        int
+    concept      text
+    question     text
+    model        text
+    created_at   timestamptz default now()
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, List
+from supabase import Client
+from dotenv import load_dotenv
+from src.database.client import get_supabase
+
+load_dotenv()
+
+QUESTION_BANK_TABLE = os.environ.get("QUESTION_BANK_TABLE", "question_bank")
+QUESTION_BANK_INSERT_CHUNK = int(os.environ.get("QUESTION_BANK_INSERT_CHUNK", 500))
+
+
+def question_id(subject_id: str, question: str) -> str:
+    """Stable id for a question; whitespace and case differences don't count."""
+    text = " ".join(question.split()).lower()
+    return hashlib.sha256(f"{subject_id}\n{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def insert_questions(rows: List[Dict[str, Any]], client: Client = None, table_name: str = QUESTION_BANK_TABLE) -> int:
+    """
+    Upsert questions into the bank, QUESTION_BANK_INSERT_CHUNK rows per request.
+
+    Args:
+        rows: Dicts with subject_id, level, concept, question and model;
+              question_id is filled in when missing
+
+    Returns:
+        Number of rows sent. Questions already in the bank are skipped by the database.
+    """
+    supabase = client or get_supabase()
+
+    unique = {}
+    for row in rows:
+        row = dict(row)
+        row.setdefault("question_id", question_id(row["subject_id"], row["question"]))
+        unique[row["question_id"]] = row
+    rows = list(unique.values())
+
+    for start in range(0, len(rows), QUESTION_BANK_INSERT_CHUNK):
+        chunk = rows[start:start + QUESTION_BANK_INSERT_CHUNK]
+        (
+            supabase.table(table_name)
+            .upsert(chunk, on_conflict="question_id", ignore_duplicates=True)
+            .execute()
+        )
+    return len(rows)
+
+
+def fetch_questions(subject_id: str, client: Client = None, table_name: str = QUESTION_BANK_TABLE) -> List[Dict[str, Any]]:
+    """
+    Every banked question for a subject, paged past PostgREST's row limit.
+
+    Returns:
+        [{"question_id", "level", "concept", "question"}, ...]
+    """
+    supabase = client or get_supabase()
+    rows = []
+    while True:
+        response = (
+            supabase.table(table_name)
+            .select("question_id, level, concept, question")
+            .eq("subject_id", subject_id)
+            .order("question_id")
+            .range(len(rows), len(rows) + QUESTION_BANK_INSERT_CHUNK - 1)
+            .execute()
+        )
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < QUESTION_BANK_INSERT_CHUNK:
+            return rows
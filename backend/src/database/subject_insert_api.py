@@ -1,29 +1,29 @@
-import os
 import random
 import string
 import time
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
+from src.database.client import get_supabase
+from src.database.gene_question import invalidate_subject_details
 
 load_dotenv()
 
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-
 
 def generate_subject_id():
     """6-char lower-alphanumeric ID (letters+digits)."""
     return ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
 
 
-def insert_module(module_json: dict, table_name: str = "subject-cartridge", max_attempts: int = 5):
+def insert_module(module_json: dict, table_name: str = "subject-cartridge", max_attempts: int = 5, client: Client = None):
     """
     Insert module_json into Supabase table `table_name`.
+    Uses the shared Supabase client unless `client` is given.
 
     Returns: (inserted_row, subject_id)
     Raises: Exception with clear error on failure.
     """
+    supabase = client or get_supabase()
+
     if "meta" not in module_json:
         raise ValueError("module_json must contain a 'meta' object")
 
@@ -72,7 +72,10 @@ def insert_module(module_json: dict, table_name: str = "subject-cartridge", max_
             # other DB error — raise with details
             raise Exception(f"Supabase insert error: {response.error}")
 
-        # success: return first inserted row (response.data is usually a list)
+        # success: make sure no stale cartridge is served for this subject_id
+        invalidate_subject_details(subject_id)
+
+        # return first inserted row (response.data is usually a list)
         data = getattr(response, "data", None)
         if isinstance(data, list) and len(data) > 0:
             return data[0], subject_id
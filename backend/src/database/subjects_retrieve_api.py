@@ -1,15 +1,11 @@
-import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
+from src.database.client import get_supabase
 
 load_dotenv()
 
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
 
-
-def fetch_cartridge(user_id: str):
+def fetch_cartridge(user_id: str, client: Client = None):
     """
     Fetch modules from 'subject-cartridge' where:
         - payload.meta.public == true
@@ -24,7 +20,10 @@ def fetch_cartridge(user_id: str):
           "description": "...",
           "curriculum_concepts": ["...", "..."]
         }
+
+    Uses the shared Supabase client unless `client` is given.
     """
+    supabase = client or get_supabase()
 
     # Step 1: Fetch all matching rows using OR filters
     # Supabase requires two separate filters combined using .or()
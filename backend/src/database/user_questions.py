@@ -1,35 +1,55 @@
+import atexit
 import os
-import threading
-from supabase import create_client, Client
+from supabase import Client
 from typing import List, Dict, Any
 from dotenv import load_dotenv
+from src.database.client import get_supabase
+from src.database.interaction_writer import InteractionWriter
+from src.utils.ttl_cache import TTLCache
 
 load_dotenv()
 
-# Initialize Supabase
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+# Per-(user_id, subject_id) history, kept write-through by save_interaction so
+# consecutive questions in a study session don't re-query user_interactions.
+HISTORY_CACHE_SIZE = int(os.environ.get("HISTORY_CACHE_SIZE", 1024))
+HISTORY_CACHE_TTL = float(os.environ.get("HISTORY_CACHE_TTL", 1800))
+history_cache = TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=HISTORY_CACHE_TTL)
+
+
+def _invalidate_history(row: Dict[str, Any]):
+    # The cached history now has a row the DB doesn't; force a re-read
+    history_cache.invalidate((row.get("user_id"), row.get("subject_id")))
+
+
+# Single shared writer for all interaction saves; flushed on shutdown
+interaction_writer = InteractionWriter(on_failure=_invalidate_history)
+atexit.register(interaction_writer.close)
+
 
 class SolanceMemory:
-    def __init__(self, user_id: str, subject_id: str):
+    def __init__(self, user_id: str, subject_id: str, client: Client = None):
         self.user_id = user_id
         self.subject_id = subject_id
+        # Shared, pooled client unless one is injected
+        self.client = client or get_supabase()
 
-    def _background_save(self, data: Dict[str, Any]):
-        """
-        Internal function to perform the actual network request.
-        This runs in a separate thread.
-        """
-        try:
-            supabase.table("user_interactions").insert(data).execute()
-        except Exception as e:
-            # You might want to log this to a file instead of print in production
-            print(f"❌ [Background Error] Failed to save interaction: {e}")
+    @property
+    def _cache_key(self):
+        return (self.user_id, self.subject_id)
+
+    def _cache_append(self, interaction: Dict[str, Any]):
+        """Write-through: extend a warm session's cached history (cold sessions are left cold)."""
+        entry = history_cache.get(self._cache_key)
+        if entry is None:
+            return
+
+        interactions, fetched_limit = entry
+        interactions = (interactions + [interaction])[-fetched_limit:]
+        history_cache.set(self._cache_key, (interactions, fetched_limit))
 
     def save_interaction(self, question: str, score: int, remarks: List[str]):
         """
-        Starts a background thread to save data.
+        Queues the row on the shared background writer, which batches inserts.
         Returns IMMEDIATELY, does not block the main flow.
         """
         data = {
@@ -40,20 +60,26 @@ class SolanceMemory:
             "remarks": remarks
         }
 
-        # Create a thread that targets the _background_save function
-        # daemon=False ensures the data saves even if the main script finishes quickly
-        save_thread = threading.Thread(target=self._background_save, args=(data,))
-        save_thread.start()
-        
+        self._cache_append({"question": question, "score": score, "remarks": remarks})
+        interaction_writer.submit(data)
+
 
     def get_history_for_llm(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Retrieves history. 
         NOTE: This remains BLOCKING because the LLM *needs* this data 
         before it can generate the next question.
+        Warm sessions are served from `history_cache`; only cold ones hit the DB.
         """
+        entry = history_cache.get(self._cache_key)
+        if entry is not None:
+            interactions, fetched_limit = entry
+            # Usable if we fetched at least as many rows, or the DB had fewer than we asked for
+            if fetched_limit >= limit or len(interactions) < fetched_limit:
+                return [dict(item) for item in interactions[-limit:]]
+
         try:
-            response = supabase.table("user_interactions")\
+            response = self.client.table("user_interactions")\
                 .select("question, score, remarks")\
                 .eq("user_id", self.user_id)\
                 .eq("subject_id", self.subject_id)\
@@ -61,18 +87,36 @@ class SolanceMemory:
                 .limit(limit)\
                 .execute()
 
-            interactions = response.data
-
-            if not interactions:
-                return []
-
+            interactions = response.data or []
             interactions.reverse()
+
+            history_cache.set(self._cache_key, ([dict(item) for item in interactions], limit))
             return interactions
 
         except Exception as e:
             print(f"❌ Error fetching history: {e}")
             return []
 
+    def get_answered_questions(self, limit: int = 5000) -> List[str]:
+        """
+        Text of every question this student has answered in the subject (most
+        recent `limit`), so the question bank can skip them. Not cached here;
+        the bank keeps its own per-student set.
+        """
+        try:
+            response = self.client.table("user_interactions")\
+                .select("question")\
+                .eq("user_id", self.user_id)\
+                .eq("subject_id", self.subject_id)\
+                .order("created_at", desc=True)\
+                .limit(limit)\
+                .execute()
+            return [row["question"] for row in response.data or [] if row.get("question")]
+
+        except Exception as e:
+            print(f"❌ Error fetching answered questions: {e}")
+            return []
+
 # --- TEST SCENARIO ---
 
 # import time
@@ -0,0 +1,3 @@
+"""
+Shared Gemini infrastructure used by the generator modules.
+"""
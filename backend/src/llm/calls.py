@@ -0,0 +1,291 @@
+"""
+Single entry point for Gemini generate_content calls.
+
+All generators call the model through generate_content() /
+generate_content_stream() here instead of the client directly, so every
+call is admitted by the governor (rate limits, adaptive concurrency,
+priorities) and policies that apply to all calls live in one place:
+
+    - retries: transient failures (429, 5xx, timeouts, dropped
+      connections) are retried with full-jitter exponential backoff,
+      bounded by attempts and total elapsed time. generate_content has no
+      side effects, so retrying is always safe; streams are only retried
+      before their first chunk.
+    - hedging (opt-in per call and via GEMINI_HEDGING): if a call is still
+      running after the p95 latency of recent calls with the same label and
+      model, a second identical request is fired and whichever finishes
+      first wins.
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import httpx
+from google import genai
+from google.genai import errors, types
+from dotenv import load_dotenv
+from src.llm.clients import get_client
+from src.llm.governor import Priority, governor
+
+load_dotenv()
+
+GEMINI_RETRY_MAX_ATTEMPTS = int(os.environ.get("GEMINI_RETRY_MAX_ATTEMPTS", 3))
+GEMINI_RETRY_BASE_DELAY = float(os.environ.get("GEMINI_RETRY_BASE_DELAY", 0.5))
+GEMINI_RETRY_MAX_DELAY = float(os.environ.get("GEMINI_RETRY_MAX_DELAY", 8))
+# No retry is started once this many seconds have passed since the first attempt
+GEMINI_RETRY_MAX_ELAPSED = float(os.environ.get("GEMINI_RETRY_MAX_ELAPSED", 60))
+
+GEMINI_HEDGING = os.environ.get("GEMINI_HEDGING", "false").lower() in ("1", "true", "yes")
+GEMINI_HEDGE_PERCENTILE = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", 0.95))
+# Latency samples needed per label before hedging kicks in
+GEMINI_HEDGE_MIN_SAMPLES = int(os.environ.get("GEMINI_HEDGE_MIN_SAMPLES", 20))
+GEMINI_HEDGE_MIN_DELAY = float(os.environ.get("GEMINI_HEDGE_MIN_DELAY", 1))
+GEMINI_LATENCY_WINDOW = int(os.environ.get("GEMINI_LATENCY_WINDOW", 200))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Output tokens assumed per call on top of the thinking budget, until usage_metadata is known
+GEMINI_OUTPUT_TOKEN_ESTIMATE = int(os.environ.get("GEMINI_OUTPUT_TOKEN_ESTIMATE", 1024))
+# Thinking tokens assumed for models configured with a thinking level instead of a budget
+GEMINI_THINKING_TOKEN_ESTIMATE = int(os.environ.get("GEMINI_THINKING_TOKEN_ESTIMATE", 8000))
+
+CHARS_PER_TOKEN = 4
+
+
+def _text_length(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, types.Part):
+        return len(value.text or "")
+    if isinstance(value, types.Content):
+        return sum(_text_length(part) for part in value.parts or [])
+    if isinstance(value, (list, tuple)):
+        return sum(_text_length(item) for item in value)
+    return 0
+
+
+def estimate_tokens(contents: Any, config: types.GenerateContentConfig) -> int:
+    """Rough upper estimate of a call's total tokens, charged to the TPM bucket up front."""
+    prompt_chars = _text_length(contents) + _text_length(config.system_instruction)
+
+    thinking = config.thinking_config
+    if thinking is None:
+        thinking_tokens = 0
+    elif thinking.thinking_budget is not None:
+        thinking_tokens = max(thinking.thinking_budget, 0)
+    else:
+        thinking_tokens = GEMINI_THINKING_TOKEN_ESTIMATE
+
+    return prompt_chars // CHARS_PER_TOKEN + thinking_tokens + GEMINI_OUTPUT_TOKEN_ESTIMATE
+
+
+def _tokens_used(response: types.GenerateContentResponse) -> Optional[int]:
+    usage = response.usage_metadata
+    return usage.total_token_count if usage is not None else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = GEMINI_RETRY_MAX_ATTEMPTS,
+        base_delay: float = GEMINI_RETRY_BASE_DELAY,
+        max_delay: float = GEMINI_RETRY_MAX_DELAY,
+        max_elapsed: float = GEMINI_RETRY_MAX_ELAPSED,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+
+    def delay(self, attempt: int) -> float:
+        """Full-jitter backoff before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def next_delay(self, attempt: int, started: float, error: BaseException) -> Optional[float]:
+        """Seconds to sleep before another attempt, or None to give up and re-raise."""
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        delay = self.delay(attempt)
+        if time.monotonic() - started + delay > self.max_elapsed:
+            return None
+        return delay
+
+
+class LatencyTracker:
+    """
+    Rolling window of call durations per (label, model), used to pick the
+    hedge delay. Kept per model so a routing fallback to a faster or slower
+    model doesn't skew the other model's delay.
+    """
+
+    def __init__(self, window: int = GEMINI_LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(self, label: str, model: str, seconds: float):
+        self._samples.setdefault((label, model), deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, label: str, model: str, q: float) -> Optional[float]:
+        samples = self._samples.get((label, model))
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def hedge_delay(self, label: str, model: str) -> Optional[float]:
+        samples = self._samples.get((label, model))
+        if samples is None or len(samples) < GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        return max(GEMINI_HEDGE_MIN_DELAY, self.percentile(label, model, GEMINI_HEDGE_PERCENTILE))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            f"{label}:{model}": {
+                "samples": len(samples),
+                "p50": round(self.percentile(label, model, 0.5), 3),
+                "p95": round(self.percentile(label, model, 0.95), 3),
+            }
+            for (label, model), samples in self._samples.items()
+        }
+
+
+retry_policy = RetryPolicy()
+latencies = LatencyTracker()
+_counters = {"retries": 0, "hedges": 0, "hedge_wins": 0}
+
+
+async def _hedged(label: str, model: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+    """Run `attempt()`; if it outlives the hedge delay, race it against a second one."""
+    delay = latencies.hedge_delay(label, model)
+    primary = asyncio.ensure_future(attempt())
+    if delay is None:
+        return await primary
+
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        _counters["hedges"] += 1
+        hedge = asyncio.ensure_future(attempt())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        _counters["hedge_wins"] += 1
+                    return task.result()
+        # Both failed; surface the primary's error
+        return primary.result()
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def generate_content(
+    model: str,
+    contents: Any,
+    config: types.GenerateContentConfig,
+    priority: Priority = Priority.NORMAL,
+    client: genai.Client = None,
+    label: str = None,
+    hedge: bool = False,
+) -> types.GenerateContentResponse:
+    """
+    client.aio.models.generate_content() behind the governor, with retries.
+
+    Args:
+        priority: Queue priority (INTERACTIVE for steps/grading, BACKGROUND for prefetching)
+        client: Defaults to the shared client from get_client()
+        label: Groups latency samples for hedging per model (e.g. "steps"); defaults to the model
+        hedge: Allow a hedged second request when GEMINI_HEDGING is on
+    """
+    client = client or get_client()
+    label = label or model
+    tokens = estimate_tokens(contents, config)
+
+    async def attempt():
+        started = time.monotonic()
+        async with governor.slot(model, tokens, priority) as slot:
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            )
+            slot.tokens_used = _tokens_used(response)
+        latencies.record(label, model, time.monotonic() - started)
+        return response
+
+    hedged = hedge and GEMINI_HEDGING and priority != Priority.BACKGROUND
+    started = time.monotonic()
+    attempt_number = 1
+    while True:
+        try:
+            return await (_hedged(label, model, attempt) if hedged else attempt())
+        except Exception as e:
+            delay = retry_policy.next_delay(attempt_number, started, e)
+            if delay is None:
+                raise
+            _counters["retries"] += 1
+            print(f"❌ {label} call failed ({e}); retry {attempt_number} in {delay:.2f}s")
+            attempt_number += 1
+            await asyncio.sleep(delay)
+
+
+async def generate_content_stream(
+    model: str,
+    contents: Any,
+    config: types.GenerateContentConfig,
+    priority: Priority = Priority.NORMAL,
+    client: genai.Client = None,
+    label: str = None,
+) -> AsyncIterator[types.GenerateContentResponse]:
+    """
+    Streaming counterpart of generate_content(); the slot is held until the
+    stream ends. Failures are retried only until the first chunk is yielded.
+    """
+    client = client or get_client()
+    tokens = estimate_tokens(contents, config)
+    started = time.monotonic()
+    attempt_number = 1
+    while True:
+        yielded = False
+        try:
+            async with governor.slot(model, tokens, priority) as slot:
+                stream = await client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+                async for chunk in stream:
+                    # The final chunk carries the totals
+                    slot.tokens_used = _tokens_used(chunk) or slot.tokens_used
+                    yielded = True
+                    yield chunk
+            return
+        except Exception as e:
+            delay = None if yielded else retry_policy.next_delay(attempt_number, started, e)
+            if delay is None:
+                raise
+            _counters["retries"] += 1
+            print(f"❌ {label or model} stream failed ({e}); retry {attempt_number} in {delay:.2f}s")
+            attempt_number += 1
+            await asyncio.sleep(delay)
+
+
+def stats() -> Dict[str, Any]:
+    return {**_counters, "hedging": GEMINI_HEDGING, "latency": latencies.stats()}
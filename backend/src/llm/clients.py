@@ -0,0 +1,81 @@
+"""
+Process-wide Gemini client registry.
+
+Every generator used to build a fresh genai.Client per request, which threw
+away the HTTP connection pool and paid a new TCP + TLS handshake on every
+call. Clients are now created once per API key, share keep-alive httpx pools
+and are closed from the FastAPI lifespan on shutdown.
+"""
+
+import os
+import threading
+import httpx
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool configuration (override via environment)
+GEMINI_POOL_SIZE = int(os.environ.get("GEMINI_POOL_SIZE", 100))
+GEMINI_KEEPALIVE_CONNECTIONS = int(os.environ.get("GEMINI_KEEPALIVE_CONNECTIONS", 20))
+GEMINI_KEEPALIVE_EXPIRY = float(os.environ.get("GEMINI_KEEPALIVE_EXPIRY", 120))
+# Thinking models can take minutes; only the connect phase is kept short
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 600))
+
+_clients = {}
+# api_key -> (httpx.Client, httpx.AsyncClient); genai.Client doesn't close pools it was handed
+_pools = {}
+_lock = threading.Lock()
+
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=GEMINI_POOL_SIZE,
+        max_keepalive_connections=GEMINI_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _pool_timeout():
+    return httpx.Timeout(GEMINI_TIMEOUT, connect=10.0)
+
+
+def get_client(api_key: str = None) -> genai.Client:
+    """
+    Return the shared client for `api_key` (defaults to GOOGLE_API_KEY),
+    creating it on first use.
+    """
+    api_key = api_key or os.environ.get("GOOGLE_API_KEY")
+
+    client = _clients.get(api_key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            http = httpx.Client(limits=_pool_limits(), timeout=_pool_timeout())
+            async_http = httpx.AsyncClient(limits=_pool_limits(), timeout=_pool_timeout())
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(httpx_client=http, httpx_async_client=async_http),
+            )
+            _clients[api_key] = client
+            _pools[api_key] = (http, async_http)
+        return client
+
+
+async def close_clients():
+    """Close every pooled client. Called from the FastAPI lifespan on shutdown."""
+    with _lock:
+        pools = list(_pools.values())
+        _clients.clear()
+        _pools.clear()
+
+    for http, async_http in pools:
+        try:
+            await async_http.aclose()
+            http.close()
+        except Exception as e:
+            print(f"❌ Error closing Gemini client: {e}")
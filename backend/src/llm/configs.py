@@ -0,0 +1,116 @@
+"""
+Registry of pre-built GenerateContentConfig objects.
+
+Each generator registers a builder per config name ("steps", "grading-stream",
+...). The nested Tool / FunctionDeclaration / Schema trees and ThinkingConfig
+are built and validated once per (name, model, latency tier) and then
+shared, so the request path only does a dict lookup. Shared configs must never be mutated;
+use config.model_copy(update=...) for per-request fields.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable
+from google.genai import types
+from dotenv import load_dotenv
+from src.llm.tiers import latency_tiers
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+# Models whose configs are built at startup instead of on first use
+GEMINI_WARM_MODELS = [
+    m.strip()
+    for m in os.environ.get(
+        "GEMINI_WARM_MODELS", "gemini-2.5-flash,gemini-2.5-pro,gemini-3-pro-preview"
+    ).split(",")
+    if m.strip()
+]
+# Built configs kept; model names come from clients, so the map is bounded
+GEMINI_CONFIG_CACHE_SIZE = int(os.environ.get("GEMINI_CONFIG_CACHE_SIZE", 512))
+
+
+class ConfigRegistry:
+    def __init__(self, maxsize: int = GEMINI_CONFIG_CACHE_SIZE):
+        self._builders: Dict[str, Callable[..., types.GenerateContentConfig]] = {}
+        self._tiered = set()
+        # (name, model, tier) -> config, least recently used evicted first
+        self._configs = TTLCache(maxsize=maxsize, ttl=0)
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable[..., types.GenerateContentConfig], tiered: bool = False):
+        """
+        Register a config builder under `name`.
+
+        Args:
+            builder: `builder(model) -> GenerateContentConfig`, or `builder(model, tier)` if tiered
+            tiered: Whether the config depends on the latency tier (thinking budget)
+        """
+        self._builders[name] = builder
+        if tiered:
+            self._tiered.add(name)
+
+    def get(self, name: str, model: str, tier: str = None) -> types.GenerateContentConfig:
+        key = (name, model, tier)
+        config = self._configs.get(key)
+        if config is not None:
+            return config
+
+        with self._lock:
+            config = self._configs.get(key)
+            if config is None:
+                builder = self._builders[name]
+                config = builder(model, tier) if name in self._tiered else builder(model)
+                self._configs.set(key, config)
+            return config
+
+    def warm(self, models: Iterable[str] = None):
+        """Build every registered config (every tier) for `models` (defaults to GEMINI_WARM_MODELS)."""
+        for model in models or GEMINI_WARM_MODELS:
+            for name in list(self._builders):
+                if name in self._tiered:
+                    for tier in latency_tiers.names:
+                        self.get(name, model, tier)
+                else:
+                    self.get(name, model)
+
+    def clear(self):
+        with self._lock:
+            self._configs.clear()
+
+    def stats(self):
+        return {
+            "builders": sorted(self._builders),
+            "configs": len(self._configs),
+        }
+
+
+config_registry = ConfigRegistry()
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: rebuilding configs per request vs. registry lookups
+    import src.steps_generation.main  # noqa: F401  (registers builders)
+    import src.solo_mode.main  # noqa: F401
+    import src.studio.main  # noqa: F401
+    import src.question_generation.main  # noqa: F401
+    # Under `python -m` this file is __main__; the generators registered on the imported module
+    from src.llm.configs import config_registry
+
+    iterations = 2000
+    model = "gemini-2.5-flash"
+    for name, builder in sorted(config_registry._builders.items()):
+        args = (model, "deep") if name in config_registry._tiered else (model,)
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            builder(*args)
+        built = (time.perf_counter() - start_time) / iterations
+
+        config_registry.get(name, *args)
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            config_registry.get(name, *args)
+        cached = (time.perf_counter() - start_time) / iterations
+
+        print(f"{name:<16} build {built * 1e6:8.1f} us   registry {cached * 1e6:6.2f} us")
@@ -0,0 +1,215 @@
+"""
+Gemini explicit context caching for the large, static system prompts.
+
+The steps, grading and studio prompts (and the cartridge-specific question
+prompt) are identical across requests, so their system instruction and tool
+declarations are uploaded once as a provider-side CachedContent and later
+requests only reference it by name.
+
+Modes (GEMINI_CONTEXT_CACHE):
+    provider - create/refresh real caches via client.aio.caches (default)
+    local    - in-memory stand-in for tests; tracks entries but sends the
+               prompt inline, so no provider calls are made
+    off      - disabled, configs are returned unchanged
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, Dict, Optional
+from google.genai import types
+from dotenv import load_dotenv
+from src.llm.clients import get_client
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+GEMINI_CONTEXT_CACHE = os.environ.get("GEMINI_CONTEXT_CACHE", "provider").lower()
+GEMINI_CONTEXT_CACHE_TTL = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", 3600))
+# Refresh (extend) a cache this many seconds before it would expire
+GEMINI_CONTEXT_CACHE_REFRESH_MARGIN = int(os.environ.get("GEMINI_CONTEXT_CACHE_REFRESH_MARGIN", 300))
+GEMINI_CONTEXT_CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CONTEXT_CACHE_MAX_ENTRIES", 256))
+# After a failed create (e.g. prompt below the model's minimum cacheable size) retry no sooner than this
+GEMINI_CONTEXT_CACHE_RETRY_AFTER = int(os.environ.get("GEMINI_CONTEXT_CACHE_RETRY_AFTER", 600))
+
+
+class ContextCache:
+    def __init__(
+        self,
+        mode: str = GEMINI_CONTEXT_CACHE,
+        ttl: int = GEMINI_CONTEXT_CACHE_TTL,
+        refresh_margin: int = GEMINI_CONTEXT_CACHE_REFRESH_MARGIN,
+        max_entries: int = GEMINI_CONTEXT_CACHE_MAX_ENTRIES,
+        retry_after: int = GEMINI_CONTEXT_CACHE_RETRY_AFTER,
+    ):
+        self.mode = mode
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self.retry_after = retry_after
+
+        # digest -> {"name", "model", "label", "expires_at"}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # digest -> True while creation is not retried (expires after retry_after)
+        self._failed = TTLCache(maxsize=max_entries, ttl=retry_after)
+        # digest -> asyncio.Lock; an evicted lock at worst lets two requests create the same cache
+        self._locks = TTLCache(maxsize=max_entries, ttl=0)
+        # (label, model) -> digest, for registry configs whose prompt never changes
+        self._static_digests = TTLCache(maxsize=max_entries, ttl=0)
+
+        self.hits = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    async def apply(
+        self, model: str, config: types.GenerateContentConfig, label: str = None, static: bool = False
+    ) -> types.GenerateContentConfig:
+        """
+        Return `config` with its system_instruction and tools replaced by a
+        reference to a cached content, or `config` unchanged when caching is
+        off, unavailable for this prompt, or running in local mode.
+
+        Pass static=True when (label, model) always maps to the same prompt
+        (registry configs) so the prompt hash is computed only once.
+        """
+        if self.mode == "off" or not (config.system_instruction or config.tools):
+            return config
+
+        if static:
+            digest = self._static_digests.get((label, model))
+            if digest is None:
+                digest = self._digest(model, config)
+                self._static_digests.set((label, model), digest)
+        else:
+            digest = self._digest(model, config)
+        name = await self._get_or_create(model, digest, config, label)
+        if name is None or self.mode == "local":
+            return config
+
+        return config.model_copy(
+            update={"system_instruction": None, "tools": None, "cached_content": name}
+        )
+
+    async def aclose(self):
+        """Delete provider caches created by this process. Called from the FastAPI lifespan."""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        if self.mode != "provider":
+            return
+
+        for entry in entries:
+            try:
+                await get_client().aio.caches.delete(name=entry["name"])
+            except Exception as e:
+                print(f"❌ Error deleting context cache {entry['name']}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "creates": self.creates,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+    @staticmethod
+    def _digest(model: str, config: types.GenerateContentConfig) -> str:
+        static_part = config.model_dump_json(
+            include={"system_instruction", "tools"}, exclude_none=True
+        )
+        return hashlib.sha256(f"{model}\n{static_part}".encode("utf-8")).hexdigest()
+
+    async def _get_or_create(
+        self, model: str, digest: str, config: types.GenerateContentConfig, label: Optional[str]
+    ) -> Optional[str]:
+        now = time.monotonic()
+        entry = self._entries.get(digest)
+        if entry is not None and entry["expires_at"] - now > self.refresh_margin:
+            self.hits += 1
+            return entry["name"]
+
+        if self._failed.get(digest):
+            return None
+
+        lock = self._locks.get(digest)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks.set(digest, lock)
+        async with lock:
+            # Another request may have created/refreshed it while we waited
+            now = time.monotonic()
+            entry = self._entries.get(digest)
+            if entry is not None and entry["expires_at"] - now > self.refresh_margin:
+                self.hits += 1
+                return entry["name"]
+
+            if entry is not None and entry["expires_at"] > now:
+                if await self._refresh(entry):
+                    return entry["name"]
+
+            return await self._create(model, digest, config, label)
+
+    async def _create(
+        self, model: str, digest: str, config: types.GenerateContentConfig, label: Optional[str]
+    ) -> Optional[str]:
+        try:
+            if self.mode == "local":
+                name = f"local/{digest[:16]}"
+            else:
+                cache = await get_client().aio.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=config.system_instruction,
+                        tools=config.tools,
+                        ttl=f"{self.ttl}s",
+                        display_name=label,
+                    ),
+                )
+                name = cache.name
+        except Exception as e:
+            # Usually the prompt is below the model's minimum cacheable size;
+            # fall back to inline prompts and don't retry for a while.
+            self.failures += 1
+            if self.retry_after > 0:
+                self._failed.set(digest, True)
+            print(f"❌ Context cache unavailable for {label or model}: {e}")
+            return None
+
+        self.creates += 1
+        self._failed.invalidate(digest)
+        self._entries[digest] = {
+            "name": name,
+            "model": model,
+            "label": label,
+            "expires_at": time.monotonic() + self.ttl,
+        }
+        self._evict()
+        return name
+
+    async def _refresh(self, entry: Dict[str, Any]) -> bool:
+        try:
+            if self.mode == "provider":
+                await get_client().aio.caches.update(
+                    name=entry["name"],
+                    config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"),
+                )
+        except Exception as e:
+            print(f"❌ Error refreshing context cache {entry['name']}: {e}")
+            return False
+
+        entry["expires_at"] = time.monotonic() + self.ttl
+        self.refreshes += 1
+        return True
+
+    def _evict(self):
+        # Forget the entries closest to expiry; the provider drops them on its own TTL
+        while len(self._entries) > self.max_entries:
+            digest = min(self._entries, key=lambda d: self._entries[d]["expires_at"])
+            del self._entries[digest]
+            self._locks.invalidate(digest)
+
+
+context_cache = ContextCache()
@@ -0,0 +1,294 @@
+"""
+Upstream rate-limit governor for Gemini calls.
+
+Every model call acquires a slot from the governor for its model first.
+Per model it enforces:
+
+    - token buckets for requests/minute and tokens/minute (estimated up
+      front, reconciled with usage_metadata afterwards)
+    - an adaptive concurrency window: +1/window per success, halved on a
+      429 (AIMD), so we settle just below the provider's real limit. With
+      no max_concurrency configured the window is unlimited until the
+      model's first 429, which opens it at half the calls then in flight
+    - a priority queue with deadlines: interactive requests are admitted
+      before normal and background (prefetch) work, and a request that
+      can't be admitted before its deadline fails with RateLimitTimeout
+      instead of piling up
+
+Per-model quotas come from GEMINI_RATE_LIMITS, e.g.
+    {"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}}
+with GEMINI_DEFAULT_RPM / GEMINI_DEFAULT_TPM for the rest (0 = unlimited).
+
+Model names come from clients, so at most GEMINI_GOVERNOR_MAX_MODELS
+governors are kept; the least recently used idle one is dropped first.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+from google.genai import errors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GEMINI_RATE_LIMITS = json.loads(os.environ.get("GEMINI_RATE_LIMITS", "{}"))
+GEMINI_DEFAULT_RPM = float(os.environ.get("GEMINI_DEFAULT_RPM", 0))
+GEMINI_DEFAULT_TPM = float(os.environ.get("GEMINI_DEFAULT_TPM", 0))
+# 0 = no cap until the provider answers 429
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", 0))
+GEMINI_MIN_CONCURRENCY = int(os.environ.get("GEMINI_MIN_CONCURRENCY", 1))
+# Seconds a request may wait in the queue before failing
+GEMINI_QUEUE_TIMEOUT = float(os.environ.get("GEMINI_QUEUE_TIMEOUT", 30))
+# After a 429 the window is not shrunk again for this many seconds (one decrease per congestion event)
+GEMINI_BACKOFF_COOLDOWN = float(os.environ.get("GEMINI_BACKOFF_COOLDOWN", 2))
+GEMINI_GOVERNOR_MAX_MODELS = int(os.environ.get("GEMINI_GOVERNOR_MAX_MODELS", 64))
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call could not be admitted before its queue deadline."""
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return isinstance(error, errors.APIError) and error.code == 429
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        """
+        Args:
+            per_minute: Capacity and refill per minute (<= 0 means unlimited)
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        # Requests larger than the bucket only wait for a full bucket
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self._refill()
+            self.tokens -= amount
+
+    def drain(self):
+        if not self.unlimited:
+            self.tokens = min(self.tokens, 0.0)
+            self._updated = time.monotonic()
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens")
+
+    def __init__(self, future: asyncio.Future, tokens: int):
+        self.future = future
+        self.tokens = tokens
+
+
+class Slot:
+    """Admission to make one call; set `tokens_used` from usage_metadata when known."""
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.tokens_used: Optional[int] = None
+
+
+class ModelGovernor:
+    def __init__(
+        self,
+        model: str,
+        rpm: float,
+        tpm: float,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        min_concurrency: int = GEMINI_MIN_CONCURRENCY,
+    ):
+        self.model = model
+        # <= 0: unlimited until the first 429 opens the AIMD window
+        self.max_concurrency = float(max_concurrency) if max_concurrency > 0 else math.inf
+        self.min_concurrency = min_concurrency
+        self.limit = self.max_concurrency
+        self.active = 0
+
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = 0.0
+
+        self.admitted = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: Priority, timeout: float):
+        await self._acquire(tokens, priority, timeout)
+        slot = Slot(tokens)
+        error = None
+        try:
+            yield slot
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._release(slot, error)
+
+    async def _acquire(self, tokens: int, priority: Priority, timeout: float):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (int(priority), next(self._seq), _Waiter(future, tokens)))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Admitted in the same tick we timed out or were cancelled; hand the slot back
+                self.active -= 1
+            self._dispatch()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise RateLimitTimeout(
+                    f"Rate limit: {self.model} request not admitted within {timeout:g}s"
+                ) from None
+            raise
+
+    def _release(self, slot: Slot, error: Optional[BaseException]):
+        self.active -= 1
+        if slot.tokens_used is not None:
+            # Reconcile the estimate: charge overruns, refund what wasn't used
+            self._tokens.take(slot.tokens_used - slot.estimated_tokens)
+
+        now = time.monotonic()
+        if error is not None and is_rate_limited(error):
+            self.rate_limited += 1
+            self._requests.drain()
+            if now - self._last_decrease >= GEMINI_BACKOFF_COOLDOWN:
+                # An unlimited window starts from the calls in flight when throttled
+                window = self.limit if math.isfinite(self.limit) else self.active + 1
+                self.limit = max(self.min_concurrency, window / 2)
+                self._last_decrease = now
+        elif error is None and math.isfinite(self.limit):
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():
+                # Timed out or cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self.active + 1 > self.limit:
+                return
+
+            wait = max(self._requests.wait_time(1), self._tokens.wait_time(waiter.tokens))
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(waiter.tokens)
+            self.active += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not any(not w.future.done() for _, _, w in self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            # None while unlimited
+            "concurrency_limit": round(self.limit, 2) if math.isfinite(self.limit) else None,
+            "active": self.active,
+            "queued": sum(1 for _, _, w in self._queue if not w.future.done()),
+            "admitted": self.admitted,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class Governor:
+    def __init__(self, limits: Dict[str, Dict[str, float]] = None, max_models: int = GEMINI_GOVERNOR_MAX_MODELS):
+        self.limits = GEMINI_RATE_LIMITS if limits is None else limits
+        self.max_models = max_models
+        # model -> governor, least recently used first
+        self._models: "OrderedDict[str, ModelGovernor]" = OrderedDict()
+
+    def for_model(self, model: str) -> ModelGovernor:
+        governor = self._models.get(model)
+        if governor is not None:
+            self._models.move_to_end(model)
+            return governor
+
+        # Make room first, so the governor handed out below is never the one evicted
+        self._evict(self.max_models - 1)
+        limits = self.limits.get(model, {})
+        governor = self._models[model] = ModelGovernor(
+            model,
+            rpm=limits.get("rpm", GEMINI_DEFAULT_RPM),
+            tpm=limits.get("tpm", GEMINI_DEFAULT_TPM),
+            max_concurrency=limits.get("max_concurrency", GEMINI_MAX_CONCURRENCY),
+        )
+        return governor
+
+    def _evict(self, keep: int):
+        # Drop idle governors, least recently used first, down to `keep`. Ones
+        # with calls in flight or queued are kept, so the map can briefly
+        # exceed max_models under a burst of distinct names
+        for name in list(self._models):
+            if len(self._models) <= keep:
+                return
+            if self._models[name].idle:
+                del self._models[name]
+
+    def slot(self, model: str, tokens: int, priority: Priority = Priority.NORMAL, timeout: float = None):
+        """
+        Async context manager admitting one call to `model`.
+
+        Args:
+            tokens: Estimated total tokens for the call (charged to the TPM bucket)
+            priority: Queue priority; lower values are admitted first
+            timeout: Seconds to wait for admission (defaults to GEMINI_QUEUE_TIMEOUT)
+        """
+        return self.for_model(model).slot(tokens, priority, GEMINI_QUEUE_TIMEOUT if timeout is None else timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: governor.stats() for model, governor in self._models.items()}
+
+
+governor = Governor()
@@ -0,0 +1,138 @@
+"""
+Content-addressed cache of model responses for grading and step generation.
+
+The same (question, student_answer) pairs and step conversation prefixes
+are sent by many students, so their results are cached by a hash of the
+endpoint, model and normalized input. Opt-in, since it makes the (otherwise
+temperature=1) responses repeat for identical inputs.
+
+Modes (RESPONSE_CACHE):
+    off    - disabled (default)
+    memory - in-process LRU with TTL
+    sqlite - in-process LRU in front of an on-disk SQLite table
+             (RESPONSE_CACHE_PATH), shared across restarts and workers
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from src.utils.sqlite_store import SQLiteStore
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "off").lower()
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 4096))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 86400))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+RESPONSE_CACHE_DB_MAX_ROWS = int(os.environ.get("RESPONSE_CACHE_DB_MAX_ROWS", 100000))
+# Expired and excess rows are pruned once every this many writes, not on each one
+RESPONSE_CACHE_PRUNE_EVERY = int(os.environ.get("RESPONSE_CACHE_PRUNE_EVERY", 500))
+
+_WHITESPACE = re.compile(r"\s+")
+_SPACED_SYMBOL = re.compile(r"\s*([=+\-*/^()<>,])\s*")
+
+
+def normalize(value: Any) -> Any:
+    """
+    Normalize request input so trivially different answers share a key.
+
+    Strings are trimmed, whitespace runs collapsed, and spaces around
+    operators removed ("x = 3" and "x=3" match). Case is kept, since it can
+    be significant in answers.
+    """
+    if isinstance(value, str):
+        text = _WHITESPACE.sub(" ", value.strip())
+        return _SPACED_SYMBOL.sub(r"\1", text)
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        mode: str = RESPONSE_CACHE,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        path: str = RESPONSE_CACHE_PATH,
+        db_max_rows: int = RESPONSE_CACHE_DB_MAX_ROWS,
+        prune_every: int = RESPONSE_CACHE_PRUNE_EVERY,
+    ):
+        self.mode = mode
+
+        # key -> JSON text, so callers never share (and mutate) one dict
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._db = SQLiteStore(
+            path, ["response_cache"], ttl, db_max_rows, prune_every=prune_every, label="response cache"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("memory", "sqlite")
+
+    @staticmethod
+    def key(namespace: str, model: str, payload: Any) -> str:
+        canonical = json.dumps(normalize(payload), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(f"{namespace}\n{model}\n{canonical}".encode("utf-8")).hexdigest()
+
+    async def get_or_call(
+        self, namespace: str, model: str, payload: Any, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Return the cached response for this input, or call `fn()` and cache its result.
+
+        Args:
+            namespace: Endpoint name, e.g. "grade-answer"
+            model: Model name the response was generated with
+            payload: The input the response depends on (normalized before hashing)
+            fn: Zero-argument coroutine function producing the response dict
+
+        Returns:
+            (response, "HIT" | "MISS"), or (response, None) when caching is off
+        """
+        if not self.enabled:
+            return await fn(), None
+
+        key = self.key(namespace, model, payload)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached, "HIT"
+
+        result = await fn()
+        # Only complete structured results; e.g. a missing function call comes back as None
+        if isinstance(result, dict):
+            await self.set(key, result)
+        return result, "MISS"
+
+    async def get(self, key: str) -> Optional[Any]:
+        text = self._memory.get(key)
+        if text is None and self.mode == "sqlite":
+            text = await asyncio.to_thread(self._db.get, "response_cache", key)
+            if text is not None:
+                self._memory.set(key, text)
+        return json.loads(text) if text is not None else None
+
+    async def set(self, key: str, value: Any):
+        text = json.dumps(value, ensure_ascii=False)
+        self._memory.set(key, text)
+        if self.mode == "sqlite":
+            await asyncio.to_thread(self._db.set, "response_cache", key, text)
+
+    def close(self):
+        self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"mode": self.mode, "memory": self._memory.stats()}
+        if self.mode == "sqlite":
+            stats["sqlite"] = self._db.stats()
+        return stats
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,223 @@
+"""
+Server-side model routing with fallback chains.
+
+Clients pick `model_name`, but when that model is slow or overloaded the
+request falls back along a per-endpoint chain (e.g. gemini-3-pro-preview ->
+gemini-2.5-pro -> gemini-2.5-flash) so the student still gets an answer in
+bounded time. A model is abandoned for the next one in its chain when:
+
+    - it does not answer within the endpoint's `timeout`
+    - it fails with a 5xx / 429 / transport error after retries, or the
+      governor could not admit the call in time
+    - its rolling p95 latency for this endpoint is above `latency_slo`
+      (skipped up front; samples expire after `slo_window` seconds so the
+      model is tried again later)
+
+The last model in a chain always runs without a fallback timeout. The
+model that actually answered is recorded on the Route and reported in
+the API responses as `model_used`.
+
+The table is DEFAULT_ROUTES merged with GEMINI_ROUTES (JSON), per label:
+    {"default": {"chains": {...}, "timeout": 90, "latency_slo": 60},
+     "steps": {"timeout": 45}}
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import httpx
+from google.genai import errors, types
+from dotenv import load_dotenv
+from src.llm.calls import generate_content, generate_content_stream
+from src.llm.governor import RateLimitTimeout
+
+load_dotenv()
+
+DEFAULT_ROUTES = {
+    "default": {
+        "chains": {
+            "gemini-3-pro-preview": ["gemini-2.5-pro", "gemini-2.5-flash"],
+            "gemini-2.5-pro": ["gemini-2.5-flash"],
+        },
+        # Seconds a non-final model in the chain gets before falling back
+        "timeout": 90,
+        # Skip a model whose rolling p95 latency (seconds) is above this
+        "latency_slo": 60,
+        "slo_window": 300,
+        "slo_min_samples": 10,
+    },
+    # Interactive endpoints get tighter budgets
+    "steps": {"timeout": 45, "latency_slo": 30},
+    "grading": {"timeout": 45, "latency_slo": 30},
+}
+
+GEMINI_ROUTES = json.loads(os.environ.get("GEMINI_ROUTES", "{}"))
+
+ConfigFor = Callable[[str], Awaitable[types.GenerateContentConfig]]
+
+
+def is_fallback_error(error: BaseException) -> bool:
+    """Errors another model may not have: overload, server errors, timeouts."""
+    if isinstance(error, (asyncio.TimeoutError, RateLimitTimeout, httpx.TransportError)):
+        return True
+    return isinstance(error, errors.APIError) and (error.code == 429 or error.code >= 500)
+
+
+class RoutingTable:
+    def __init__(self, routes: Dict[str, Dict[str, Any]] = None):
+        routes = routes if routes is not None else GEMINI_ROUTES
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        for label in set(DEFAULT_ROUTES) | set(routes):
+            self._routes[label] = {**DEFAULT_ROUTES.get(label, {}), **routes.get(label, {})}
+
+        # (label, model) -> deque of (monotonic time, seconds)
+        self._latencies: Dict[Tuple[str, str], Deque[Tuple[float, float]]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def policy(self, label: str) -> Dict[str, Any]:
+        return {**self._routes["default"], **self._routes.get(label, {})}
+
+    def chain(self, label: str, model: str) -> List[str]:
+        fallbacks = self.policy(label)["chains"].get(model, [])
+        return [model] + [m for m in fallbacks if m != model]
+
+    def record(self, label: str, model: str, seconds: float):
+        self._latencies.setdefault((label, model), deque(maxlen=200)).append((time.monotonic(), seconds))
+
+    def p95(self, label: str, model: str) -> Optional[float]:
+        policy = self.policy(label)
+        samples = self._latencies.get((label, model))
+        if not samples:
+            return None
+        cutoff = time.monotonic() - policy["slo_window"]
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        if len(samples) < policy["slo_min_samples"]:
+            return None
+        ordered = sorted(seconds for _, seconds in samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def over_slo(self, label: str, model: str) -> bool:
+        p95 = self.p95(label, model)
+        return p95 is not None and p95 > self.policy(label)["latency_slo"]
+
+    def count(self, label: str, event: str):
+        counters = self._counters.setdefault(label, {"calls": 0, "fallbacks": 0, "slo_skips": 0})
+        counters[event] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "counters": self._counters,
+            "p95": {
+                f"{label}:{model}": round(p95, 3)
+                for label, model in list(self._latencies)
+                if (p95 := self.p95(label, model)) is not None
+            },
+        }
+
+
+routing_table = RoutingTable()
+
+
+class Route:
+    """
+    One routed request. `model` starts as the requested model and ends up as
+    the model that produced the response.
+    """
+
+    def __init__(self, label: str, requested_model: str, table: RoutingTable = None):
+        self.label = label
+        self.requested_model = requested_model
+        self.model = requested_model
+        self.table = table or routing_table
+
+    def candidates(self) -> List[Tuple[str, Optional[float]]]:
+        """(model, timeout) pairs to try, with models over their latency SLO skipped."""
+        chain = self.table.chain(self.label, self.requested_model)
+        timeout = self.table.policy(self.label)["timeout"]
+
+        candidates = []
+        for index, model in enumerate(chain):
+            last = index == len(chain) - 1
+            if not last and self.table.over_slo(self.label, model):
+                self.table.count(self.label, "slo_skips")
+                continue
+            candidates.append((model, None if last else timeout))
+        return candidates
+
+    def _fell_back(self, model: str, error: BaseException):
+        self.table.count(self.label, "fallbacks")
+        print(f"❌ {self.label}: {model} failed ({type(error).__name__}: {error}); falling back")
+
+
+async def generate(route: Route, contents: Any, config_for: ConfigFor, **call_kwargs) -> types.GenerateContentResponse:
+    """
+    generate_content() along the route's fallback chain.
+
+    Args:
+        route: Route for this request; route.model is set to the model that answered
+        config_for: `await config_for(model)` -> GenerateContentConfig for that model
+        call_kwargs: Passed to calls.generate_content (priority, hedge, ...)
+    """
+    route.table.count(route.label, "calls")
+    candidates = route.candidates()
+    for index, (model, timeout) in enumerate(candidates):
+        started = time.monotonic()
+        try:
+            config = await config_for(model)
+            response = await asyncio.wait_for(
+                generate_content(model=model, contents=contents, config=config, **call_kwargs),
+                timeout,
+            )
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                route.table.record(route.label, model, time.monotonic() - started)
+            if index == len(candidates) - 1 or not is_fallback_error(e):
+                raise
+            route._fell_back(model, e)
+            continue
+
+        route.table.record(route.label, model, time.monotonic() - started)
+        route.model = model
+        return response
+
+
+async def generate_stream(
+    route: Route, contents: Any, config_for: ConfigFor, **call_kwargs
+) -> AsyncIterator[types.GenerateContentResponse]:
+    """
+    generate_content_stream() along the route's fallback chain. A model is
+    only abandoned before its first chunk (the timeout applies to that
+    first chunk); once text has been streamed the model is kept.
+    """
+    route.table.count(route.label, "calls")
+    candidates = route.candidates()
+    for index, (model, timeout) in enumerate(candidates):
+        started = time.monotonic()
+        stream = None
+        try:
+            config = await config_for(model)
+            stream = generate_content_stream(model=model, contents=contents, config=config, **call_kwargs)
+            first = await asyncio.wait_for(stream.__anext__(), timeout)
+        except StopAsyncIteration:
+            route.model = model
+            return
+        except Exception as e:
+            if stream is not None:
+                await stream.aclose()
+            if isinstance(e, asyncio.TimeoutError):
+                route.table.record(route.label, model, time.monotonic() - started)
+            if index == len(candidates) - 1 or not is_fallback_error(e):
+                raise
+            route._fell_back(model, e)
+            continue
+
+        route.model = model
+        yield first
+        async for chunk in stream:
+            yield chunk
+        route.table.record(route.label, model, time.monotonic() - started)
+        return
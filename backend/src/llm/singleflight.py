@@ -0,0 +1,91 @@
+"""
+Single-flight coalescing of identical in-flight model calls.
+
+Double-clicks and frontend retries often send the same request while the
+first one is still running. Calls are keyed by a canonical hash of
+(endpoint, request body); while a call for a key is in flight, later callers
+await the same upstream task and receive its result (or its exception)
+instead of starting another generate_content call.
+
+The upstream call runs as its own task, so a caller disconnecting does not
+cancel it for the others.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def request_key(endpoint: str, body: Any) -> str:
+    """
+    Canonical hash of an endpoint and its request body.
+
+    Args:
+        endpoint: Route the request was made to, e.g. "/grade-answer"
+        body: Pydantic request model (including model_name) or JSON-serialisable data
+
+    Returns:
+        Hex digest that is equal for bodies with the same content regardless of key order
+    """
+    if hasattr(body, "model_dump"):
+        body = body.model_dump(mode="json")
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn()` once per key at a time and share its outcome.
+
+        Args:
+            key: Usually request_key(endpoint, request)
+            fn: Zero-argument coroutine function performing the upstream call
+
+        Returns:
+            The result of the (possibly shared) call; exceptions are re-raised to every caller
+        """
+        if not self.enabled:
+            return await fn()
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,185 @@
+"""
+Helpers for streaming structured (JSON-mode) Gemini responses.
+
+Function-call arguments arrive in one piece on the Gemini API, so the
+streaming paths ask for the same fields as a JSON response instead and
+parse the text incrementally as chunks arrive.
+"""
+
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from google.genai import types
+
+_CLOSERS = {"{": "}", "[": "]"}
+_PARTIAL_UNICODE_ESCAPE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+def parse_partial_json(text: str) -> Optional[Any]:
+    """
+    Best-effort parse of a JSON document that may be cut off mid-stream.
+
+    Open strings, arrays and objects are closed; a trailing key or value that
+    cannot be completed is dropped. Returns None if nothing usable parsed yet.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    stack: List[str] = []
+    # (prefix length, open containers) for every point the text can be cut at
+    cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            cut_points.append((i + 1, tuple(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+        elif ch == ",":
+            cut_points.append((i, tuple(stack)))
+
+    candidates = []
+    if in_string:
+        head = text[:-1] if escaped else text
+        head = _PARTIAL_UNICODE_ESCAPE.sub("", head)
+        candidates.append((head + '"', tuple(stack)))
+    else:
+        candidates.append((text, tuple(stack)))
+    for length, open_stack in reversed(cut_points):
+        candidates.append((text[:length], open_stack))
+
+    for head, open_stack in candidates:
+        closing = "".join(_CLOSERS[c] for c in reversed(open_stack))
+        try:
+            return json.loads(head.rstrip().rstrip(",") + closing)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+class JSONStreamParser:
+    """
+    Accumulates streamed JSON text and reports what changed per chunk.
+
+    Args:
+        text_fields: Top-level string fields whose growth is reported as deltas
+        array_fields: Top-level array fields whose items are reported once complete
+        value_fields: Top-level fields reported once their value is complete
+    """
+
+    def __init__(
+        self,
+        text_fields: Iterable[str] = (),
+        array_fields: Iterable[str] = (),
+        value_fields: Iterable[str] = (),
+    ):
+        self.text_fields = list(text_fields)
+        self.array_fields = list(array_fields)
+        self.value_fields = list(value_fields)
+        self.buffer = ""
+        self.value: Dict[str, Any] = {}
+        self._emitted: Dict[str, str] = {field: "" for field in self.text_fields}
+        self._items_emitted: Dict[str, int] = {field: 0 for field in self.array_fields}
+        self._fields_emitted: Set[str] = set()
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Add a chunk of text; returns (field, appended_text) for every text field that grew."""
+        self.buffer += chunk
+        parsed = parse_partial_json(self.buffer)
+        if not isinstance(parsed, dict):
+            return []
+        self.value = parsed
+
+        deltas = []
+        for field in self.text_fields:
+            current = parsed.get(field)
+            previous = self._emitted[field]
+            if isinstance(current, str) and len(current) > len(previous) and current.startswith(previous):
+                deltas.append((field, current[len(previous):]))
+                self._emitted[field] = current
+        return deltas
+
+    def completed(self, final: bool = False) -> List[Dict[str, Any]]:
+        """
+        Events for values completed since the last call:
+
+            {"event": "field", "field": <name>, "value": ...}  (value_fields)
+            {"event": "item", "field": <name>, "index": <i>, "value": ...}  (array_fields)
+
+        While streaming, a value counts as complete once the next one has
+        started (the partial parse closes a half-written last value, so it
+        can't be trusted yet). With final=True the rest are taken from the
+        complete document.
+        """
+        value = self.result() if final else self.value
+        keys = list(value)
+        events = []
+        for field in self.value_fields:
+            if field in self._fields_emitted or field not in value:
+                continue
+            if final or keys.index(field) < len(keys) - 1:
+                events.append({"event": "field", "field": field, "value": value[field]})
+                self._fields_emitted.add(field)
+
+        for field in self.array_fields:
+            current = value.get(field)
+            if not isinstance(current, list):
+                continue
+            done = len(current) if final else len(current) - 1
+            for index in range(self._items_emitted[field], done):
+                events.append({"event": "item", "field": field, "index": index, "value": current[index]})
+            self._items_emitted[field] = max(self._items_emitted[field], done)
+        return events
+
+    def result(self) -> Dict[str, Any]:
+        """Final parsed object; raises json.JSONDecodeError if the stream ended malformed."""
+        return json.loads(self.buffer)
+
+
+async def stream_json(
+    stream: AsyncIterator[types.GenerateContentResponse],
+    text_fields: Iterable[str] = (),
+    array_fields: Iterable[str] = (),
+    value_fields: Iterable[str] = (),
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Turn a JSON-mode generate_content_stream into events:
+
+        {"event": "delta", "field": <name>, "text": <appended text>}
+        {"event": "field", "field": <name>, "value": <complete value>}
+        {"event": "item", "field": <name>, "index": <i>, "value": <complete array item>}
+        {"event": "result", "data": <complete parsed object>}
+
+    Thought parts (when thinking summaries are enabled) are skipped.
+    """
+    parser = JSONStreamParser(text_fields, array_fields, value_fields)
+    async for chunk in stream:
+        if not chunk.candidates or not chunk.candidates[0].content:
+            continue
+        for part in chunk.candidates[0].content.parts or []:
+            if not part.text or part.thought:
+                continue
+            for field, text in parser.feed(part.text):
+                yield {"event": "delta", "field": field, "text": text}
+            for event in parser.completed():
+                yield event
+
+    for event in parser.completed(final=True):
+        yield event
+    yield {"event": "result", "data": parser.result()}
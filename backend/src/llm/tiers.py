@@ -0,0 +1,62 @@
+"""
+Latency tiers: how much reasoning (and which model) a call gets.
+
+A single next-step hint needs far less thinking than curriculum-level
+question selection, so each endpoint has a default tier and requests may
+pick one explicitly (`latency_tier`). Tiers map to a thinking budget (or a
+thinking level for models that take one) and optionally swap the requested
+model, e.g. "fast" sends pro requests to flash.
+
+Loaded from latency_tiers.json next to this file, or LATENCY_TIERS_PATH.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+from google.genai import types
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LATENCY_TIERS_PATH = os.environ.get(
+    "LATENCY_TIERS_PATH", os.path.join(os.path.dirname(__file__), "latency_tiers.json")
+)
+
+
+class LatencyTiers:
+    def __init__(self, path: str = LATENCY_TIERS_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            config: Dict[str, Any] = json.load(f)
+
+        self.tiers: Dict[str, Dict[str, Any]] = config["tiers"]
+        self.endpoints: Dict[str, str] = config.get("endpoints", {})
+        self.default_tier: str = config.get("default_tier", "deep")
+        self.thinking_level_models = set(config.get("thinking_level_models", []))
+
+        for tier in [self.default_tier, *self.endpoints.values()]:
+            if tier not in self.tiers:
+                raise ValueError(f"Unknown latency tier '{tier}' in {path}")
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.tiers)
+
+    def resolve(self, endpoint: str, tier: Optional[str] = None) -> str:
+        """The requested tier, else the endpoint's default, else the global default."""
+        tier = tier or self.endpoints.get(endpoint, self.default_tier)
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown latency tier '{tier}'")
+        return tier
+
+    def model_for(self, tier: str, model: str) -> str:
+        """Model to call for `model` requested at `tier` (unchanged unless the tier remaps it)."""
+        return self.tiers[tier].get("models", {}).get(model, model)
+
+    def thinking_config(self, tier: str, model: str) -> types.ThinkingConfig:
+        spec = self.tiers[tier]
+        if model in self.thinking_level_models:
+            return types.ThinkingConfig(thinking_level=spec["thinking_level"])
+        return types.ThinkingConfig(thinking_budget=spec["thinking_budget"])
+
+
+latency_tiers = LatencyTiers()
@@ -0,0 +1,303 @@
+"""
+Serving questions from the pre-generated question bank.
+
+The bank (src/database/question_bank.py, filled by batch_runner) holds
+questions keyed by (subject_id, level, concept). Each subject's rows are
+loaded once into an in-memory index, level -> concept -> [(question_id,
+question)], and each student gets a set of question_ids they have already
+answered (from user_interactions) or been served. A question request then
+predicts the next level with the same rules as the prompt's adaptive logic
+(prefetch.predict_next_level) and picks a random unseen question at that
+level, choosing the concept first so concepts are covered evenly.
+
+Only when the level has no unseen question left for the student, the level
+is unknown (e.g. the last question came from the model and its level was
+lost) or it is outside the curriculum does the caller fall back to the
+model. A subject with nothing banked skips the student's answered-questions
+query altogether. Buckets running thin for a student are topped up in the
+background: the model writes QUESTION_BANK_TOPUP_COUNT new questions for
+the concept, which are stored in the bank and added to the index.
+"""
+
+import asyncio
+import os
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from src.database.question_bank import fetch_questions, insert_questions, question_id
+from src.database.user_questions import SolanceMemory
+from src.question_generation.prefetch import predict_next_level
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+QUESTION_BANK_ENABLED = os.environ.get("QUESTION_BANK_ENABLED", "false").lower() in ("1", "true", "yes")
+QUESTION_BANK_INDEX_SIZE = int(os.environ.get("QUESTION_BANK_INDEX_SIZE", 256))
+QUESTION_BANK_INDEX_TTL = float(os.environ.get("QUESTION_BANK_INDEX_TTL", 600))
+QUESTION_BANK_SEEN_SIZE = int(os.environ.get("QUESTION_BANK_SEEN_SIZE", 4096))
+QUESTION_BANK_SEEN_TTL = float(os.environ.get("QUESTION_BANK_SEEN_TTL", 1800))
+# Answered questions loaded per student to exclude from the bank
+QUESTION_BANK_SEEN_LIMIT = int(os.environ.get("QUESTION_BANK_SEEN_LIMIT", 5000))
+# A concept with fewer unseen questions than this for the student is topped up
+QUESTION_BANK_MIN_UNSEEN = int(os.environ.get("QUESTION_BANK_MIN_UNSEEN", 3))
+QUESTION_BANK_TOPUP_COUNT = int(os.environ.get("QUESTION_BANK_TOPUP_COUNT", 5))
+# Upper bound on background top-up calls in flight across all students
+QUESTION_BANK_TOPUP_CONCURRENCY = int(os.environ.get("QUESTION_BANK_TOPUP_CONCURRENCY", 2))
+
+MODEL_USED = "question-bank"
+
+
+class QuestionBank:
+    def __init__(
+        self,
+        enabled: bool = QUESTION_BANK_ENABLED,
+        index_size: int = QUESTION_BANK_INDEX_SIZE,
+        index_ttl: float = QUESTION_BANK_INDEX_TTL,
+        seen_size: int = QUESTION_BANK_SEEN_SIZE,
+        seen_ttl: float = QUESTION_BANK_SEEN_TTL,
+        seen_limit: int = QUESTION_BANK_SEEN_LIMIT,
+        min_unseen: int = QUESTION_BANK_MIN_UNSEEN,
+        topup_count: int = QUESTION_BANK_TOPUP_COUNT,
+        concurrency: int = QUESTION_BANK_TOPUP_CONCURRENCY,
+    ):
+        self.enabled = enabled
+        self.seen_limit = seen_limit
+        self.min_unseen = min_unseen
+        self.topup_count = topup_count
+        self.concurrency = concurrency
+
+        # subject_id -> {"levels": {level: {concept: [(question_id, question), ...]}},
+        #                "level_of": {question_id: level}, "loaded": bool}
+        self._index = TTLCache(maxsize=index_size, ttl=index_ttl)
+        # (user_id, subject_id) -> {question_id, ...} answered or served
+        self._seen = TTLCache(maxsize=seen_size, ttl=seen_ttl)
+        # (user_id, subject_id) -> {"question": last served question, "level": its level}
+        self._served = TTLCache(maxsize=seen_size, ttl=seen_ttl)
+        self._inflight = set()
+        self._tasks = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.topups = 0
+        self.topped_up = 0
+        self.failures = 0
+        self.load_errors = 0
+
+    def index(self, subject_id: str) -> Dict[str, Any]:
+        """
+        The subject's index, loaded from the bank on first use. Blocking; run
+        it with the other context loaders.
+
+        A failed load is cached as an empty index, so a missing table costs
+        one query per QUESTION_BANK_INDEX_TTL rather than one per request.
+        """
+        index = self._index.get(subject_id)
+        if index is not None:
+            return index
+
+        index = {"levels": {}, "level_of": {}, "loaded": True}
+        try:
+            rows = fetch_questions(subject_id)
+        except Exception as e:
+            self.load_errors += 1
+            print(f"❌ Error loading question bank for {subject_id}: {e}")
+            rows = []
+            # Top-ups would fail to store too
+            index["loaded"] = False
+
+        for row in rows:
+            self._add(index, int(row["level"]), row["concept"], row["question_id"], row["question"])
+        self._index.set(subject_id, index)
+        return index
+
+    def load(self, memory: SolanceMemory) -> Tuple[Dict[str, Any], Set[str]]:
+        """
+        (index, seen) for a question request; a context loader. The seen set
+        is only loaded when the subject has banked questions; otherwise it is
+        an empty set that isn't kept.
+        """
+        index = self.index(memory.subject_id)
+        if not index["levels"]:
+            return index, set()
+        return index, self.seen(memory)
+
+    def seen(self, memory: SolanceMemory) -> Set[str]:
+        """
+        question_ids the student has answered or been served. Blocking; loaded
+        from user_interactions once per session and kept up to date by served().
+        """
+        key = (memory.user_id, memory.subject_id)
+        seen = self._seen.get(key)
+        if seen is not None:
+            return seen
+
+        seen = {
+            question_id(memory.subject_id, question)
+            for question in memory.get_answered_questions(self.seen_limit)
+        }
+        self._seen.set(key, seen)
+        return seen
+
+    def next_level(
+        self,
+        user_id: str,
+        subject_id: str,
+        answered: Dict[str, Any],
+        history: List[Dict[str, Any]],
+        index: Dict[str, Any],
+        max_level: Optional[int] = None,
+    ) -> Optional[int]:
+        """
+        The level the generator would pick next, or None if it can't be known here.
+
+        Args:
+            answered: The input_json the student just submitted ({} for a new session)
+            history: Interactions including `answered`
+            max_level: Number of levels in the cartridge's curriculum, if known
+        """
+        if answered and answered.get("question"):
+            level = self._level_of(user_id, subject_id, answered, index)
+            return predict_next_level(level, history, max_level) if level is not None else None
+
+        if not history:
+            return 1
+        # Resuming a session: the prompt would continue from the last answer
+        level = self._level_of(user_id, subject_id, history[-1], index)
+        return predict_next_level(level, history, max_level) if level is not None else None
+
+    def take(self, subject_id: str, level: int, index: Dict[str, Any], seen: Set[str]) -> Optional[Dict[str, Any]]:
+        """
+        A random question at `level` the student hasn't seen.
+
+        Returns:
+            {"question", "level", "concept"}, or None to fall back to the model
+        """
+        unseen = {
+            concept: [item for item in items if item[0] not in seen]
+            for concept, items in index["levels"].get(level, {}).items()
+        }
+        unseen = {concept: items for concept, items in unseen.items() if items}
+        if not unseen:
+            self.misses += 1
+            return None
+
+        concept = random.choice(list(unseen))
+        qid, question = random.choice(unseen[concept])
+        seen.add(qid)
+        self.hits += 1
+        return {"question": question, "level": level, "concept": concept}
+
+    def served(self, user_id: str, subject_id: str, question: str, level: int, seen: Optional[Set[str]] = None):
+        """Record the question just returned, from whichever source, so its level is known when it's answered."""
+        self._served.set((user_id, subject_id), {"question": question, "level": level})
+        if seen is not None:
+            seen.add(question_id(subject_id, question))
+
+    def top_up(
+        self,
+        subject_id: str,
+        level: int,
+        concepts: List[str],
+        index: Dict[str, Any],
+        seen: Set[str],
+        generate: Callable[[str, int], Awaitable[List[str]]],
+    ):
+        """
+        Add questions in the background to the concepts at `level` that are
+        running thin for this student.
+
+        Args:
+            concepts: The level's concepts from the cartridge
+            generate: `generate(concept, count) -> [question, ...]`
+        """
+        if not self.enabled or self.topup_count <= 0 or not index["loaded"]:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        buckets = index["levels"].get(level, {})
+        for concept in concepts:
+            unseen = sum(1 for qid, _ in buckets.get(concept, []) if qid not in seen)
+            key = (subject_id, level, concept)
+            if unseen >= self.min_unseen or key in self._inflight:
+                continue
+            self._inflight.add(key)
+            task = asyncio.create_task(self._top_up(key, generate))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _top_up(self, key, generate: Callable[[str, int], Awaitable[List[str]]]):
+        subject_id, level, concept = key
+        try:
+            async with self._semaphore:
+                questions = await generate(concept, self.topup_count)
+            rows = [
+                {
+                    "subject_id": subject_id,
+                    "level": level,
+                    "concept": concept,
+                    "question": question,
+                    "question_id": question_id(subject_id, question),
+                    "model": MODEL_USED,
+                }
+                for question in questions
+            ]
+            await asyncio.to_thread(insert_questions, rows)
+
+            # Students already in a session see them without waiting for a reload
+            index = self._index.get(subject_id)
+            if index is not None:
+                for row in rows:
+                    self._add(index, level, concept, row["question_id"], row["question"])
+            self.topups += 1
+            self.topped_up += len(rows)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            print(f"❌ Error topping up question bank for level {level} ({concept}): {e}")
+        finally:
+            self._inflight.discard(key)
+
+    def _level_of(self, user_id: str, subject_id: str, entry: Dict[str, Any], index: Dict[str, Any]) -> Optional[int]:
+        served = self._served.get((user_id, subject_id))
+        if served and served["question"] == entry.get("question"):
+            return served["level"]
+        try:
+            return int(entry["level"])
+        except (KeyError, TypeError, ValueError):
+            return index["level_of"].get(question_id(subject_id, entry.get("question") or ""))
+
+    @staticmethod
+    def _add(index: Dict[str, Any], level: int, concept: str, qid: str, question: str):
+        if qid in index["level_of"]:
+            return
+        index["level_of"][qid] = level
+        index["levels"].setdefault(level, {}).setdefault(concept, []).append((qid, question))
+
+    async def aclose(self):
+        """Cancel outstanding top-ups. Called from the FastAPI lifespan."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "subjects": len(self._index),
+            "students": len(self._seen),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "inflight_topups": len(self._inflight),
+            "topups": self.topups,
+            "topped_up": self.topped_up,
+            "failures": self.failures,
+            "load_errors": self.load_errors,
+        }
+
+
+question_bank = QuestionBank()
@@ -0,0 +1,498 @@
+"""
+Offline question-bank generation through the Gemini batch API.
+
+Filling a bank for a new cartridge through /generate-question means thousands
+of interactive calls. This runner builds one request per (level, concept) of
+the cartridge, each asking for `--per-concept` distinct questions with the
+same system prompt as the online path (question_generator_prompt), submits
+them as one batch job and writes the results to the question_bank table
+(src/database/question_bank.py). Batch jobs are billed at a discount and
+aren't subject to the interactive rate limits.
+
+Usage:
+    python -m src.question_generation.batch_runner --subject-id wtle4d --levels 1-3,5 --per-concept 20
+
+Progress is kept in a JSON job-state file (QUESTION_BATCH_DIR/<subject_id>.json
+unless --state is given) that is rewritten after every step, so re-running
+the same command after a crash picks up the submitted job instead of
+submitting a new one. Failed requests are resubmitted in a new job, up to
+QUESTION_BATCH_MAX_ATTEMPTS times each.
+
+Backends (QUESTION_BATCH_BACKEND or --backend):
+    gemini - client.batches with inline requests (default)
+    local  - file-backed stand-in: requests and results are JSONL files in
+             QUESTION_BATCH_DIR and each request is answered with a normal
+             generate_content call; tests pass their own `respond`
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+from src.database.gene_question import get_subject_details
+from src.database.question_bank import insert_questions
+from src.llm.clients import get_client
+from src.llm.configs import config_registry
+from src.llm.tiers import latency_tiers
+from src.question_generation.question_prompt import question_generator_prompt, question_bank_message
+
+load_dotenv()
+
+QUESTION_BATCH_BACKEND = os.environ.get("QUESTION_BATCH_BACKEND", "gemini").lower()
+QUESTION_BATCH_MODEL = os.environ.get("QUESTION_BATCH_MODEL", "gemini-2.5-flash")
+QUESTION_BATCH_DIR = os.environ.get("QUESTION_BATCH_DIR", "question_batches")
+QUESTION_BATCH_POLL_SECONDS = float(os.environ.get("QUESTION_BATCH_POLL_SECONDS", 30))
+QUESTION_BATCH_MAX_ATTEMPTS = int(os.environ.get("QUESTION_BATCH_MAX_ATTEMPTS", 3))
+
+_SUCCEEDED = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+_FAILED = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+def _build_bank_config(model, tier):
+    return types.GenerateContentConfig(
+        thinking_config=latency_tiers.thinking_config(tier, model),
+        response_mime_type="application/json",
+        response_schema=genai.types.Schema(
+            type=genai.types.Type.OBJECT,
+            required=["questions"],
+            properties={
+                "questions": genai.types.Schema(
+                    type=genai.types.Type.ARRAY,
+                    items=genai.types.Schema(
+                        type=genai.types.Type.OBJECT,
+                        required=["question", "level"],
+                        properties={
+                            "question": genai.types.Schema(type=genai.types.Type.STRING),
+                            "level": genai.types.Schema(type=genai.types.Type.INTEGER),
+                        },
+                    ),
+                ),
+            },
+        ),
+    )
+
+
+config_registry.register("question-bank", _build_bank_config, tiered=True)
+
+
+def parse_levels(text: str, max_level: int) -> List[int]:
+    """
+    "1-3,5" -> [1, 2, 3, 5]. "all" (or an empty string) is every level of the cartridge.
+
+    Raises:
+        ValueError: For malformed ranges or levels outside 1..max_level
+    """
+    if not text or text.strip().lower() == "all":
+        return list(range(1, max_level + 1))
+
+    levels = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        low, high = int(low), int(high or low)
+        if low < 1 or high > max_level or low > high:
+            raise ValueError(f"Level range '{part}' is outside 1-{max_level}")
+        levels.update(range(low, high + 1))
+    return sorted(levels)
+
+
+def level_concepts(cartridge: Dict[str, Any], level: int) -> List[str]:
+    """The bank's concepts for a level; a level without concepts is one bucket named after it."""
+    item = cartridge["curriculum"][level - 1]
+    return item.get("concepts") or [item.get("name") or f"Level {level}"]
+
+
+def plan_requests(cartridge: Dict[str, Any], levels: List[int], per_concept: int) -> Dict[str, Dict[str, Any]]:
+    """
+    One request per (level, concept). A level without concepts gets a single
+    request for its name.
+
+    Returns:
+        key -> request state, keys like "L2:C0"
+    """
+    requests = {}
+    for level in levels:
+        for index, concept in enumerate(level_concepts(cartridge, level)):
+            requests[f"L{level}:C{index}"] = {
+                "level": level,
+                "concept": concept,
+                "count": per_concept,
+                "status": "pending",
+                "attempts": 0,
+                "job": None,
+                "questions": [],
+                "error": None,
+            }
+    return requests
+
+
+def build_request(cartridge: Dict[str, Any], request: Dict[str, Any], model: str, tier: str):
+    """(contents, config) for one planned request."""
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(
+                    text=question_bank_message(request["level"], request["concept"], request["count"])
+                ),
+            ],
+        ),
+    ]
+    config = config_registry.get("question-bank", model, tier).model_copy(
+        update={
+            "system_instruction": [
+                types.Part.from_text(text=question_generator_prompt(cartridge)),
+            ],
+        }
+    )
+    return contents, config
+
+
+def parse_questions(text: str, request: Dict[str, Any]) -> List[str]:
+    """
+    Questions from one response, deduplicated and capped at the requested count.
+
+    Raises:
+        ValueError: If the response isn't the expected JSON
+    """
+    data = json.loads(text)
+    questions = []
+    for item in data["questions"]:
+        question = (item.get("question") or "").strip() if isinstance(item, dict) else ""
+        if question and question not in questions:
+            questions.append(question)
+    return questions[:request["count"]]
+
+
+class GeminiBatchBackend:
+    """Inline batch jobs on the Gemini API. Responses come back in request order."""
+
+    name = "gemini"
+
+    def __init__(self, client=None):
+        self.client = client or get_client()
+
+    def submit(self, model: str, keys: List[str], requests: List[tuple], display_name: str) -> str:
+        job = self.client.batches.create(
+            model=model,
+            src=[
+                types.InlinedRequest(contents=contents, config=config)
+                for contents, config in requests
+            ],
+            config=types.CreateBatchJobConfig(display_name=display_name),
+        )
+        return job.name
+
+    def poll(self, job_name: str, keys: List[str], model: str) -> Dict[str, Any]:
+        """
+        Returns:
+            {"state": "running" | "succeeded" | "failed", "done": int, "total": int,
+             "error": str | None, "results": {key: {"text": str} | {"error": str}}}
+        """
+        job = self.client.batches.get(name=job_name)
+        state = job.state.name if job.state is not None else "JOB_STATE_UNSPECIFIED"
+        stats = job.completion_stats
+        done = ((stats.successful_count or 0) + (stats.failed_count or 0)) if stats else 0
+        poll = {"state": "running", "done": done, "total": len(keys), "error": None, "results": {}}
+
+        if state in _FAILED:
+            poll["state"] = "failed"
+            poll["error"] = job.error.message if job.error and job.error.message else state
+            return poll
+        if state not in _SUCCEEDED:
+            return poll
+
+        poll["state"] = "succeeded"
+        responses = job.dest.inlined_responses if job.dest and job.dest.inlined_responses else []
+        for key, item in zip(keys, responses):
+            if item.error is not None or item.response is None:
+                message = item.error.message if item.error is not None else None
+                poll["results"][key] = {"error": message or "empty response"}
+            else:
+                poll["results"][key] = {"text": item.response.text or ""}
+        poll["done"] = len(poll["results"])
+        return poll
+
+
+class LocalBatchBackend:
+    """
+    File-backed stand-in for the batch API.
+
+    A job is <dir>/<job>.requests.jsonl; answers are appended to
+    <dir>/<job>.results.jsonl as they're produced, so a poll after a crash
+    only answers what is still missing.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = QUESTION_BATCH_DIR, respond: Optional[Callable] = None):
+        """
+        Args:
+            respond: (model, contents, config) -> response text; defaults to
+                     a synchronous generate_content call
+        """
+        self.directory = directory
+        self.respond = respond or self._generate
+
+    def submit(self, model: str, keys: List[str], requests: List[tuple], display_name: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        job_name = f"local-{uuid.uuid4().hex[:12]}"
+        with open(self._path(job_name, "requests"), "w", encoding="utf-8") as f:
+            for key, (contents, config) in zip(keys, requests):
+                f.write(json.dumps({
+                    "key": key,
+                    "contents": [content.model_dump(mode="json", exclude_none=True) for content in contents],
+                    "config": config.model_dump(mode="json", exclude_none=True),
+                }, ensure_ascii=False) + "\n")
+        return job_name
+
+    def poll(self, job_name: str, keys: List[str], model: str) -> Dict[str, Any]:
+        results = {line["key"]: line for line in self._read(job_name, "results")}
+        with open(self._path(job_name, "results"), "a", encoding="utf-8") as out:
+            for line in self._read(job_name, "requests"):
+                if line["key"] in results:
+                    continue
+                contents = [types.Content.model_validate(content) for content in line["contents"]]
+                config = types.GenerateContentConfig.model_validate(line["config"])
+                try:
+                    result = {"key": line["key"], "text": self.respond(model, contents, config)}
+                except Exception as e:
+                    result = {"key": line["key"], "error": str(e)}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                results[line["key"]] = result
+
+        return {
+            "state": "succeeded",
+            "done": len(results),
+            "total": len(keys),
+            "error": None,
+            "results": {
+                key: {k: v for k, v in result.items() if k != "key"}
+                for key, result in results.items()
+            },
+        }
+
+    def _generate(self, model, contents, config):
+        return get_client().models.generate_content(model=model, contents=contents, config=config).text
+
+    def _path(self, job_name: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{job_name}.{kind}.jsonl")
+
+    def _read(self, job_name: str, kind: str) -> List[Dict[str, Any]]:
+        path = self._path(job_name, kind)
+        if not os.path.exists(path):
+            return []
+        lines = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    lines.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a crash; the request is answered again
+                    continue
+        return lines
+
+
+def load_state(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: Dict[str, Any]):
+    """Write the job state atomically so a crash never leaves a half-written file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def new_state(subject_id, model, tier, backend, levels, per_concept, cartridge) -> Dict[str, Any]:
+    return {
+        "subject_id": subject_id,
+        "model": model,
+        "tier": tier,
+        "backend": backend,
+        "levels": levels,
+        "per_concept": per_concept,
+        "created_at": time.time(),
+        "requests": plan_requests(cartridge, levels, per_concept),
+        "jobs": {},
+    }
+
+
+def progress(state: Dict[str, Any]) -> Dict[str, int]:
+    counts = {"requests": len(state["requests"]), "questions": 0}
+    for request in state["requests"].values():
+        counts[request["status"]] = counts.get(request["status"], 0) + 1
+        counts["questions"] += request.get("written", 0)
+    return counts
+
+
+def _submit(state, backend, cartridge, keys):
+    requests = [
+        build_request(cartridge, state["requests"][key], state["model"], state["tier"])
+        for key in keys
+    ]
+    job_name = backend.submit(
+        state["model"], keys, requests, display_name=f"question-bank-{state['subject_id']}",
+    )
+    for key in keys:
+        request = state["requests"][key]
+        request.update(status="submitted", job=job_name, error=None)
+        request["attempts"] += 1
+    state["jobs"][job_name] = {"keys": keys, "state": "running", "submitted_at": time.time()}
+    print(f"Submitted batch job {job_name} with {len(keys)} requests")
+
+
+def _collect(state, job_name, poll):
+    job = state["jobs"][job_name]
+    for key in job["keys"]:
+        request = state["requests"][key]
+        if request["status"] != "submitted" or request["job"] != job_name:
+            continue
+        result = poll["results"].get(key) or {"error": poll["error"] or "no response"}
+        if "error" in result:
+            request.update(status="failed", error=result["error"])
+            continue
+        try:
+            request.update(status="done", questions=parse_questions(result["text"], request))
+        except (ValueError, KeyError, TypeError) as e:
+            request.update(status="failed", error=f"Unparseable response: {e}")
+    job["state"] = poll["state"]
+
+
+def _write(state, writer):
+    """Insert finished requests' questions into the bank, one request at a time."""
+    for request in state["requests"].values():
+        if request["status"] != "done":
+            continue
+        rows = [
+            {
+                "subject_id": state["subject_id"],
+                "level": request["level"],
+                "concept": request["concept"],
+                "question": question,
+                "model": state["model"],
+            }
+            for question in request["questions"]
+        ]
+        # A crash between the insert and the state save re-inserts on resume;
+        # question_id makes that a no-op
+        writer(rows)
+        request.update(status="written", written=len(rows), questions=[])
+
+
+def run(
+    state_path: str,
+    backend,
+    cartridge: Dict[str, Any],
+    writer: Callable[[List[Dict[str, Any]]], Any] = insert_questions,
+    poll_seconds: float = QUESTION_BATCH_POLL_SECONDS,
+    max_attempts: int = QUESTION_BATCH_MAX_ATTEMPTS,
+) -> Dict[str, Any]:
+    """
+    Drive a job state file to completion: submit pending requests, poll
+    running jobs, write finished questions and resubmit failures.
+
+    Returns:
+        The final state
+    """
+    state = load_state(state_path)
+    # Questions collected before a crash but not yet written
+    _write(state, writer)
+    save_state(state_path, state)
+
+    while True:
+        running = [name for name, job in state["jobs"].items() if job["state"] == "running"]
+
+        if not running:
+            retry = [
+                key for key, request in state["requests"].items()
+                if request["status"] == "pending"
+                or (request["status"] == "failed" and request["attempts"] < max_attempts)
+            ]
+            if not retry:
+                break
+            _submit(state, backend, cartridge, retry)
+            save_state(state_path, state)
+            continue
+
+        for job_name in running:
+            poll = backend.poll(job_name, state["jobs"][job_name]["keys"], state["model"])
+            print(f"Batch job {job_name}: {poll['state']} ({poll['done']}/{poll['total']})")
+            if poll["state"] == "running":
+                continue
+            _collect(state, job_name, poll)
+            save_state(state_path, state)
+            _write(state, writer)
+            save_state(state_path, state)
+            print(f"Progress: {progress(state)}")
+
+        if any(job["state"] == "running" for job in state["jobs"].values()):
+            time.sleep(poll_seconds)
+
+    return state
+
+
+def _backend(name: str):
+    if name == "local":
+        return LocalBatchBackend()
+    if name == "gemini":
+        return GeminiBatchBackend()
+    raise ValueError(f"Unknown batch backend '{name}' (use gemini or local)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a question bank for a cartridge with a batch job.")
+    parser.add_argument("--subject-id", required=True)
+    parser.add_argument("--levels", default="all", help='Level ranges, e.g. "1-3,5" (default: all)')
+    parser.add_argument("--per-concept", type=int, default=10, help="Questions per (level, concept)")
+    parser.add_argument("--model", default=QUESTION_BATCH_MODEL)
+    parser.add_argument("--tier", default=None, help="Latency tier for the thinking budget (default: the question tier)")
+    parser.add_argument("--backend", default=QUESTION_BATCH_BACKEND, choices=["gemini", "local"])
+    parser.add_argument("--state", default=None, help="Job state file (default: QUESTION_BATCH_DIR/<subject_id>.json)")
+    args = parser.parse_args(argv)
+
+    cartridge = get_subject_details(args.subject_id)
+    if not cartridge or not cartridge.get("curriculum"):
+        raise SystemExit(f"❌ No cartridge with a curriculum found for subject_id '{args.subject_id}'")
+
+    state_path = args.state or os.path.join(QUESTION_BATCH_DIR, f"{args.subject_id}.json")
+    state = load_state(state_path)
+    if state is None:
+        tier = latency_tiers.resolve("question", args.tier)
+        levels = parse_levels(args.levels, len(cartridge["curriculum"]))
+        state = new_state(
+            args.subject_id, latency_tiers.model_for(tier, args.model), tier,
+            args.backend, levels, args.per_concept, cartridge,
+        )
+        save_state(state_path, state)
+        print(f"Planned {len(state['requests'])} requests for levels {levels} -> {state_path}")
+    else:
+        if state["subject_id"] != args.subject_id:
+            raise SystemExit(f"❌ {state_path} belongs to subject '{state['subject_id']}'")
+        print(f"Resuming {state_path}: {progress(state)}")
+
+    start_time = time.time()
+    state = run(state_path, _backend(state["backend"]), cartridge)
+    print(f"Finished in {time.time() - start_time:.1f}s: {progress(state)}")
+    for key, request in state["requests"].items():
+        if request["status"] == "failed":
+            print(f"❌ {key} ({request['concept']}) failed after {request['attempts']} attempts: {request['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,199 @@
+import asyncio
 import base64
+import json
 import os
+from functools import partial
 from google import genai
 from google.genai import types
-from src.question_generation.question_prompt import question_generator_prompt
+from src.question_generation.question_prompt import question_generator_prompt, question_history_message
 from dotenv import load_dotenv
+from src.llm.configs import config_registry
+from src.llm.context_cache import context_cache
+from src.llm.governor import Priority
+from src.llm.routing import Route, generate as generate_routed
+from src.llm.tiers import latency_tiers
 import time
 from src.database.user_questions import SolanceMemory
 from src.database.gene_question import get_subject_details        
+from src.question_generation.prefetch import question_pool
+from src.question_generation.bank import MODEL_USED as BANK_MODEL_USED, question_bank
+from src.question_generation.batch_runner import build_request, level_concepts, parse_questions
 
 
 load_dotenv()
 
-def generate(model, input_json, user_id, subject_id):
+
+def _build_config(model, tier):
+    return types.GenerateContentConfig(
+        thinking_config= latency_tiers.thinking_config(tier, model),
+        response_mime_type="application/json",
+        response_schema=genai.types.Schema(
+            type = genai.types.Type.OBJECT,
+            required = ["question", "level"],
+            properties = {
+                "question": genai.types.Schema(
+                    type = genai.types.Type.STRING,
+                ),
+                "level": genai.types.Schema(
+                    type = genai.types.Type.INTEGER,
+                ),
+            },
+        ),
+    )
+
+
+config_registry.register("question", _build_config, tiered=True)
+
+
+async def load_context(sources):
+    """
+    Run independent, blocking context loaders concurrently.
+
+    Args:
+        sources: Dict of name -> zero-argument callable (e.g. a Supabase query)
+
+    Returns:
+        Dict of name -> result, so pre-model latency is the slowest loader
+        rather than the sum of all of them. Add new context sources here.
+    """
+    names = list(sources)
+    results = await asyncio.gather(
+        *(asyncio.to_thread(loader) for loader in sources.values())
+    )
+    return dict(zip(names, results))
+
+
+async def _generate_live(model, tier, cartridge, history, input_json, subject_id, target_level=None, priority=Priority.NORMAL):
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=question_history_message(history, input_json, target_level)),
+            ],
+        ),
+    ]
+
+    async def config_for(model):
+        # Shared base config (thinking + schema); only the system prompt is per subject
+        generate_content_config = config_registry.get("question", model, tier).model_copy(
+            update={
+                # Cartridge-only system prompt: identical for every student of a subject
+                "system_instruction": [
+                    types.Part.from_text(text=question_generator_prompt(cartridge)),
+                ],
+            }
+        )
+        return await context_cache.apply(model, generate_content_config, label=f"question:{subject_id}")
+
+    # Falls back along the routing table's chain if the model is slow or overloaded
+    route = Route("question", model)
+    response = await generate_routed(
+        route,
+        contents,
+        config_for,
+        priority=priority,
+        label="question",
+        # Prefetches run at BACKGROUND priority, which is never hedged
+        hedge=True,
+    )
+    response_data = json.loads(response.candidates[0].content.parts[0].text)
+    response_data["model_used"] = route.model
+    return json.dumps(response_data)
+
+
+async def _generate_bank_questions(model, tier, cartridge, subject_id, level, concept, count):
+    """Write `count` new bank questions for one concept (a background top-up)."""
+    request = {"level": level, "concept": concept, "count": count}
+    contents, _ = build_request(cartridge, request, model, tier)
+
+    async def config_for(model):
+        _, generate_content_config = build_request(cartridge, request, model, tier)
+        return await context_cache.apply(model, generate_content_config, label=f"question-bank:{subject_id}")
+
+    response = await generate_routed(
+        Route("question", model),
+        contents,
+        config_for,
+        priority=Priority.BACKGROUND,
+        label="question-bank",
+    )
+    return parse_questions(response.candidates[0].content.parts[0].text, request)
+
+
+def _take_banked(model, tier, cartridge, history, input_json, user_id, subject_id, index, seen):
+    """
+    Serve an unseen question from the bank at the predicted level, topping up
+    the level's thin concepts in the background.
+
+    Returns:
+        Response JSON text, or None to generate with the model
+    """
+    max_level = _max_level(cartridge)
+    if max_level is None:
+        return None
+    level = question_bank.next_level(user_id, subject_id, input_json, history, index, max_level)
+    if level is None or not 1 <= level <= max_level:
+        return None
+
+    banked = question_bank.take(subject_id, level, index, seen)
+    question_bank.top_up(
+        subject_id, level, level_concepts(cartridge, level), index, seen,
+        lambda concept, count: _generate_bank_questions(model, tier, cartridge, subject_id, level, concept, count),
+    )
+    if banked is None:
+        return None
+    return json.dumps({"question": banked["question"], "level": banked["level"], "model_used": BANK_MODEL_USED})
+
+
+def _max_level(cartridge):
+    """Number of curriculum levels, or None if the cartridge is missing one."""
+    return len((cartridge or {}).get("curriculum") or []) or None
+
+
+def _schedule_prefetch(model, tier, cartridge, history, subject_id, user_id, response_text):
+    """Speculatively generate the questions that may follow the one just served."""
+    try:
+        served = json.loads(response_text)
+        question, level = served["question"], int(served["level"])
+    except (ValueError, KeyError, TypeError):
+        return
+
+    pending = {"question": question, "level": level}
+    pending_history = history + [pending]
+    question_pool.schedule(
+        user_id, subject_id, f"{model}:{tier}", question, level,
+        lambda target_level: _generate_live(
+            model, tier, cartridge, pending_history, pending, subject_id,
+            target_level=target_level, priority=Priority.BACKGROUND,
+        ),
+        max_level=_max_level(cartridge),
+    )
+
+
+def _record_served(user_id, subject_id, response_text, seen):
+    try:
+        served = json.loads(response_text)
+        question_bank.served(user_id, subject_id, served["question"], int(served["level"]), seen)
+    except (ValueError, KeyError, TypeError):
+        return
+
+
+async def generate(model, input_json, user_id, subject_id, tier=None):
     print("USER ID", user_id)
+    tier = latency_tiers.resolve("question", tier)
+    model = latency_tiers.model_for(tier, model)
 
     memory = SolanceMemory(user_id, subject_id) 
-    history = memory.get_history_for_llm()
-    
+    sources = {
+        "history": memory.get_history_for_llm,
+        "cartridge": partial(get_subject_details, subject_id),
+    }
+    if question_bank.enabled:
+        sources["bank"] = partial(question_bank.load, memory)
+    context = await load_context(sources)
+    history = context["history"]
+    cartridge = context["cartridge"]
+
     if input_json and isinstance(input_json, dict) and 'question' in input_json:
         # Map marks/score if needed
         score = input_json.get('marks', input_json.get('score', 0))
@@ -28,67 +205,36 @@ def generate(model, input_json, user_id, subject_id):
         )
         history.append(input_json)
 
-    cartridge = get_subject_details(subject_id) 
-
-    
     print(f"Question generator input: {input_json} {history}")
 
-    client = genai.Client(
-        api_key=os.environ.get("GOOGLE_API_KEY"),
-    )
-
-    model = model
-    contents = [
-        types.Content(
-            role="user",
-            parts=[
-                types.Part.from_text(text=str(input_json)),
-            ],
-        ),
-    ]
-    thinking_config = None
-    if model == "gemini-3-pro-preview":
-        thinking_config = types.ThinkingConfig(
-            thinkingLevel= "HIGH"
+    response_text = None
+    if question_bank.enabled:
+        index, seen = context["bank"]
+        response_text = _take_banked(model, tier, cartridge, history, input_json, user_id, subject_id, index, seen)
 
+    if response_text is not None:
+        print("Question served from question bank " + response_text)
+    else:
+        # Pooled questions are kept per model and tier
+        response_text = question_pool.take(
+            user_id, subject_id, f"{model}:{tier}", input_json, history, _max_level(cartridge),
         )
-    else: 
-        thinking_config = types.ThinkingConfig(
-            thinking_budget=8000
-            )
-    
-    generate_content_config = types.GenerateContentConfig(
-        thinking_config= thinking_config,
-        response_mime_type="application/json",
-        response_schema=genai.types.Schema(
-            type = genai.types.Type.OBJECT,
-            required = ["question", "level"],
-            properties = {
-                "question": genai.types.Schema(
-                    type = genai.types.Type.STRING,
-                ),
-                "level": genai.types.Schema(
-                    type = genai.types.Type.INTEGER,
-                ),
-            },
-        ),
-        system_instruction=[
-            types.Part.from_text(text=question_generator_prompt(cartridge, history)),
-        ],
-    )
+        if response_text is not None:
+            print("Question served from prefetch pool " + response_text)
+        else:
+            response_text = await _generate_live(model, tier, cartridge, history, input_json, subject_id)
+            print("Question generator output " + response_text)
+        # The bank had nothing for this point of the session; get ahead of the student
+        _schedule_prefetch(model, tier, cartridge, history, subject_id, user_id, response_text)
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
-    )
-    print("Question generator output " + response.candidates[0].content.parts[0].text)
-    return response.candidates[0].content.parts[0].text
+    if question_bank.enabled:
+        _record_served(user_id, subject_id, response_text, seen)
+    return response_text
 
 
 if __name__ == "__main__":
     start_time = time.time()
-    a = generate(model="gemini-2.5-flash", input_json={}, user_id="a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11", subject_id="wtle4d")
+    a = asyncio.run(generate(model="gemini-2.5-flash", input_json={}, user_id="a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11", subject_id="wtle4d"))
     print(a)
     end_time = time.time()
     print(end_time - start_time)
@@ -0,0 +1,222 @@
+"""
+Speculative question prefetching.
+
+After a question is served, the likely next questions (the served level and
+its neighbours) are generated in the background and parked in a bounded pool
+keyed by (user_id, subject_id, model, level). When the student answers, the
+next level is predicted with the same rules the prompt's adaptive logic uses;
+if a pooled question for that level exists it is returned immediately,
+otherwise the caller falls back to live generation.
+
+Each pooled question remembers which served question it follows, so a
+question generated for an older point in the session is never served.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+# Opt-in: every question served live costs one background generation per offset
+QUESTION_PREFETCH_ENABLED = os.environ.get("QUESTION_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+# Levels to prefetch relative to the served question's level, most likely first
+QUESTION_PREFETCH_OFFSETS = [
+    int(offset) for offset in os.environ.get("QUESTION_PREFETCH_OFFSETS", "0,1,-1").split(",") if offset.strip()
+]
+QUESTION_PREFETCH_POOL_SIZE = int(os.environ.get("QUESTION_PREFETCH_POOL_SIZE", 2048))
+QUESTION_PREFETCH_TTL = float(os.environ.get("QUESTION_PREFETCH_TTL", 1800))
+# Upper bound on background Gemini calls in flight across all students
+QUESTION_PREFETCH_CONCURRENCY = int(os.environ.get("QUESTION_PREFETCH_CONCURRENCY", 4))
+
+LEVEL_UP_MARKS = 8
+LEVEL_DOWN_MARKS = 5
+
+
+def _marks(entry: Dict[str, Any]) -> Optional[int]:
+    marks = entry.get("marks", entry.get("score"))
+    try:
+        return int(marks)
+    except (TypeError, ValueError):
+        return None
+
+
+def clamp_level(level: int, max_level: Optional[int] = None) -> int:
+    """Keep a level within 1..max_level (no upper bound when max_level is None)."""
+    level = max(1, level)
+    return min(level, max_level) if max_level else level
+
+
+def predict_next_level(level: int, history: List[Dict[str, Any]], max_level: Optional[int] = None) -> int:
+    """
+    Predict the level the generator will pick next, mirroring <adaptive_logic>.
+
+    Args:
+        level: Level of the question the student just answered
+        history: Interactions oldest first, ending with that answer
+        max_level: Number of levels in the cartridge's curriculum, if known
+
+    Returns:
+        Level up on marks >= 8, down after two consecutive marks <= 5
+        (never below 1 or above max_level), otherwise the same level.
+    """
+    last = _marks(history[-1]) if history else None
+    if last is None:
+        return clamp_level(level, max_level)
+    if last >= LEVEL_UP_MARKS:
+        return clamp_level(level + 1, max_level)
+
+    previous = _marks(history[-2]) if len(history) > 1 else None
+    if last <= LEVEL_DOWN_MARKS and previous is not None and previous <= LEVEL_DOWN_MARKS:
+        return clamp_level(level - 1, max_level)
+    return clamp_level(level, max_level)
+
+
+class QuestionPool:
+    def __init__(
+        self,
+        enabled: bool = QUESTION_PREFETCH_ENABLED,
+        offsets: Iterable[int] = QUESTION_PREFETCH_OFFSETS,
+        maxsize: int = QUESTION_PREFETCH_POOL_SIZE,
+        ttl: float = QUESTION_PREFETCH_TTL,
+        concurrency: int = QUESTION_PREFETCH_CONCURRENCY,
+    ):
+        self.enabled = enabled
+        self.offsets = list(offsets)
+        self.concurrency = concurrency
+
+        # (user_id, subject_id, model, level) -> {"after": served question, "text": response JSON}
+        self._pool = TTLCache(maxsize=maxsize, ttl=ttl)
+        # (user_id, subject_id, model) -> {"question": last served question, "level": its level}
+        self._served = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = set()
+        self._tasks = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.failures = 0
+
+    def take(
+        self,
+        user_id: str,
+        subject_id: str,
+        model: str,
+        answered: Dict[str, Any],
+        history: List[Dict[str, Any]],
+        max_level: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Pop the pooled question for the predicted next level.
+
+        Args:
+            answered: The input_json the student just submitted ({} for a new session)
+            history: Interactions including `answered`
+            max_level: Number of levels in the cartridge's curriculum
+
+        Returns:
+            The pooled response JSON text, or None to generate live
+        """
+        if not self.enabled:
+            return None
+
+        served = self._served.get((user_id, subject_id, model))
+        if not served or not answered or answered.get("question") != served["question"]:
+            self.misses += 1
+            return None
+
+        level = predict_next_level(served["level"], history, max_level)
+        key = (user_id, subject_id, model, level)
+        entry = self._pool.get(key)
+        if entry is None or entry["after"] != served["question"]:
+            self.misses += 1
+            return None
+
+        self._pool.invalidate(key)
+        self.hits += 1
+        return entry["text"]
+
+    def schedule(
+        self,
+        user_id: str,
+        subject_id: str,
+        model: str,
+        question: str,
+        level: int,
+        generate: Callable[[int], Awaitable[str]],
+        max_level: Optional[int] = None,
+    ):
+        """
+        Record the question just served and prefetch its likely successors.
+
+        Args:
+            question: The question text returned to the student
+            level: Its level
+            generate: `generate(target_level) -> response JSON text`, bound to the
+                session's history with `question` as the pending entry
+            max_level: Number of levels in the cartridge's curriculum; no
+                       question is prefetched for a level past it
+        """
+        if not self.enabled:
+            return
+
+        self._served.set((user_id, subject_id, model), {"question": question, "level": level})
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        for target in dict.fromkeys(clamp_level(level + offset, max_level) for offset in self.offsets):
+            key = (user_id, subject_id, model, target)
+            if (key, question) in self._inflight:
+                continue
+            self._inflight.add((key, question))
+            task = asyncio.create_task(self._prefetch(key, question, target, generate))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _prefetch(self, key, question: str, level: int, generate: Callable[[int], Awaitable[str]]):
+        try:
+            async with self._semaphore:
+                if not self._is_current(key, question):
+                    return
+                text = await generate(level)
+            self.prefetched += 1
+            # A newer question may have been served while this one was generating
+            if self._is_current(key, question):
+                self._pool.set(key, {"after": question, "text": text})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            print(f"❌ Error prefetching question for level {level}: {e}")
+        finally:
+            self._inflight.discard((key, question))
+
+    def _is_current(self, key, question: str) -> bool:
+        served = self._served.get(key[:3])
+        return bool(served) and served["question"] == question
+
+    async def aclose(self):
+        """Cancel outstanding prefetches. Called from the FastAPI lifespan."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "pooled": len(self._pool),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "prefetched": self.prefetched,
+            "failures": self.failures,
+        }
+
+
+question_pool = QuestionPool()
@@ -1,5 +1,15 @@
 
-def question_generator_prompt(cartridge, history):
+HISTORY_IN_USER_MESSAGE = "Provided in the user message inside the <history> tags."
+
+
+def question_generator_prompt(cartridge, history=HISTORY_IN_USER_MESSAGE):
+    """
+    Build the question generator system prompt.
+
+    When `history` is omitted the prompt only depends on the cartridge, so it
+    can be context-cached per subject; pass the history with
+    question_history_message() in the user turn instead.
+    """
     return f"""
 <system_role>
 You are Solance, an adaptive, subject-agnostic teaching engine. 
@@ -104,3 +114,47 @@ Right: "Find the value of x in the equation: 2x + 4 = 10"
 Based on the `cartridge` and `history`, generate the next adaptive question now.
 </task>
 """
+
+
+def question_history_message(history, input_json, target_level=None):
+    """
+    Build the user turn for the question generator.
+
+    Pass `target_level` to pin the level instead of letting <adaptive_logic>
+    pick it (used when prefetching questions before the student answers).
+    """
+    message = f"""<history>
+
+{history}
+
+</history>
+
+{input_json}"""
+    if target_level is not None:
+        message += f"""
+
+<target_level>
+The student has not answered the last question yet. Ignore <adaptive_logic> and generate the next question at Level {target_level} (Index {target_level - 1} of `cartridge.curriculum`), with "level": {target_level}.
+</target_level>"""
+    return message
+
+
+def question_bank_message(level, concept, count):
+    """
+    Build the user turn for offline question-bank generation (see batch_runner).
+
+    There is no student: the model writes `count` distinct questions for one
+    concept at a pinned level instead of picking the next adaptive question.
+    """
+    return f"""<history>
+
+[]
+
+</history>
+
+<question_bank>
+You are filling a question bank, not tutoring a student. Ignore <adaptive_logic>.
+Write {count} distinct questions at Level {level} (Index {level - 1} of `cartridge.curriculum`) that each test the concept "{concept}".
+Vary the numbers, contexts and wording so no two questions can be answered the same way.
+Return {{"questions": [{{"question": "...", "level": {level}}}, ...]}} with exactly {count} items.
+</question_bank>"""
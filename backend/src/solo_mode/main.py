@@ -1,25 +1,46 @@
+import asyncio
 import base64
+import json
 import os
+from functools import partial
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from .solo_mode_prompt import grading_prompt
+from src.llm.configs import config_registry
+from src.llm.context_cache import context_cache
+from src.llm.governor import Priority
+from src.llm.routing import Route, generate as generate_routed, generate_stream as generate_routed_stream
+from src.llm.streaming import stream_json
+from src.llm.tiers import latency_tiers
+from src.utils.algebra import check_answer
+from .solo_mode_prompt import batch_grading_addendum, grading_prompt
 import time
 
 
 load_dotenv()
 
+# Local algebra checking of answers (src/utils/algebra.py):
+#   off      - always grade with the model
+#   advisory - pass the local check to the model as evidence; the model decides the marks (default)
+#   verdict  - decide correctness locally when the answer can be checked exactly: correct
+#              answers get 10, wrong ones never do; the model writes the correction and remarks
+#   local    - additionally grade correct answers without a model call
+SYMBOLIC_GRADER = os.environ.get("SYMBOLIC_GRADER", "advisory").lower()
 
-def generate(model, input):
-    print("Steps generator input " + input)
-    print("Model " + model)
+# /grade-answers: items graded per model call, and chunks graded at once per batch
+GRADING_BATCH_CHUNK_SIZE = int(os.environ.get("GRADING_BATCH_CHUNK_SIZE", 10))
+GRADING_BATCH_CONCURRENCY = int(os.environ.get("GRADING_BATCH_CONCURRENCY", 4))
 
-    client = genai.Client(
-        api_key=os.environ.get("GOOGLE_API_KEY"),
-    )
+# checked: verdict decided locally; unchecked: left to the model; local: answered without a model call
+_symbolic_counts = {"checked": 0, "unchecked": 0, "local": 0}
 
-    model = model
-    contents = [
+
+def symbolic_stats():
+    return {"mode": SYMBOLIC_GRADER, **_symbolic_counts}
+
+
+def _contents(input):
+    return [
         types.Content(
             role="user",
             parts=[
@@ -27,30 +48,92 @@ def generate(model, input):
             ],
         ),
     ]
+
+
+def _grading_schema():
+    return genai.types.Schema(
+        type = genai.types.Type.OBJECT,
+        required = ["marks", "correction", "remarks"],
+        properties = {
+            "marks": genai.types.Schema(
+                type = genai.types.Type.INTEGER,
+                description = "Score out of 10",
+            ),
+            "correction": genai.types.Schema(
+                type = genai.types.Type.STRING,
+                description = "A closing insight, memory aid, or correction with the correct answer. ALWAYS populated. Use markdown and LaTeX.",
+            ),
+            "remarks": genai.types.Schema(
+                type = genai.types.Type.ARRAY,
+                description = "Short phrases for adaptive difficulty adjustment",
+                items = genai.types.Schema(
+                    type = genai.types.Type.STRING,
+                ),
+            ),
+        },
+    )
+
+
+def _build_config(model, tier):
     tools = [
         types.Tool(
             function_declarations=[
                 types.FunctionDeclaration(
                     name="grading_result",
                     description="The grading result for the student's answer",
+                    parameters=_grading_schema(),
+                ),
+            ])
+    ]
+
+    return types.GenerateContentConfig(
+        thinkingConfig = latency_tiers.thinking_config(tier, model),
+        tools=tools,
+        system_instruction=[
+            types.Part.from_text(text= grading_prompt),
+        ],
+        temperature=1
+    )
+
+
+def _build_stream_config(model, tier):
+    return types.GenerateContentConfig(
+        thinkingConfig = latency_tiers.thinking_config(tier, model),
+        response_mime_type="application/json",
+        # marks first so the verdict arrives before the explanation
+        response_schema=_grading_schema().model_copy(
+            update={"property_ordering": ["marks", "correction", "remarks"]}
+        ),
+        system_instruction=[
+            types.Part.from_text(text= grading_prompt),
+        ],
+        temperature=1
+    )
+
+
+def _build_batch_config(model, tier):
+    item = _grading_schema().model_copy(deep=True)
+    item.required = ["index"] + item.required
+    item.properties = {
+        "index": genai.types.Schema(
+            type = genai.types.Type.INTEGER,
+            description = "The index of the graded item",
+        ),
+        **item.properties,
+    }
+    tools = [
+        types.Tool(
+            function_declarations=[
+                types.FunctionDeclaration(
+                    name="grading_results",
+                    description="The grading results for every item, one per item",
                     parameters=genai.types.Schema(
                         type = genai.types.Type.OBJECT,
-                        required = ["marks", "correction", "remarks"],
+                        required = ["results"],
                         properties = {
-                            "marks": genai.types.Schema(
-                                type = genai.types.Type.INTEGER,
-                                description = "Score out of 10",
-                            ),
-                            "correction": genai.types.Schema(
-                                type = genai.types.Type.STRING,
-                                description = "A closing insight, memory aid, or correction with the correct answer. ALWAYS populated. Use markdown and LaTeX.",
-                            ),
-                            "remarks": genai.types.Schema(
+                            "results": genai.types.Schema(
                                 type = genai.types.Type.ARRAY,
-                                description = "Short phrases for adaptive difficulty adjustment",
-                                items = genai.types.Schema(
-                                    type = genai.types.Type.STRING,
-                                ),
+                                items = item,
                             ),
                         },
                     ),
@@ -58,33 +141,252 @@ def generate(model, input):
             ])
     ]
 
-    thinking_config = None
-    if model == "gemini-3-pro-preview":
-        thinking_config = types.ThinkingConfig(
-            thinkingLevel= "HIGH"
-        )
-    else: 
-        thinking_config = types.ThinkingConfig(
-            thinking_budget=8000
-            )
-
-    generate_content_config = types.GenerateContentConfig(
-        thinkingConfig = thinking_config,
+    return types.GenerateContentConfig(
+        thinkingConfig = latency_tiers.thinking_config(tier, model),
         tools=tools,
         system_instruction=[
-            types.Part.from_text(text= grading_prompt),
+            types.Part.from_text(text= grading_prompt + batch_grading_addendum),
         ],
         temperature=1
     )
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
 
+config_registry.register("grading", _build_config, tiered=True)
+config_registry.register("grading-stream", _build_stream_config, tiered=True)
+config_registry.register("grading-batch", _build_batch_config, tiered=True)
+
+
+async def _cached_config(name, tier, model):
+    return await context_cache.apply(model, config_registry.get(name, model, tier), label=name, static=True)
+
+
+def _verdict(input):
+    """
+    Check the answer locally.
+
+    Returns:
+        (verdict, model_input): verdict is {"correct", "expected_answer"} or
+        None when the answer can't be checked exactly; model_input is the
+        input with the verdict attached for the model to explain
+    """
+    if SYMBOLIC_GRADER == "off":
+        return None, input
+    try:
+        data = json.loads(input)
+        verdict = check_answer(str(data["question"]), str(data["student_answer"]))
+    except (ValueError, KeyError, TypeError):
+        verdict = None
+    if verdict is None:
+        _symbolic_counts["unchecked"] += 1
+        return None, input
+    _symbolic_counts["checked"] += 1
+    return verdict, json.dumps({**data, "verified_answer": verdict})
+
+
+def _local_result(verdict):
+    """Complete grading result for an answer verified correct, without a model call."""
+    _symbolic_counts["local"] += 1
+    return {
+        "marks": 10,
+        "correction": f"**Correct!** $${verdict['expected_answer']}$$ is right.",
+        "remarks": ["Perfect execution", "Ready for harder challenges"],
+        "model_used": "symbolic",
+    }
+
+
+def _apply_verdict(result, verdict):
+    """
+    Outside advisory mode the verified verdict decides full marks; the model's
+    text, and its partial credit for a wrong answer, are kept.
+    """
+    if verdict is None or SYMBOLIC_GRADER == "advisory" or not isinstance(result.get("marks"), (int, float)):
+        return result
+    result["marks"] = 10 if verdict["correct"] else min(int(result["marks"]), 9)
+    return result
+
+
+async def generate(model, input, tier=None):
+    print("Steps generator input " + input)
+    print("Model " + model)
+
+    verdict, input = _verdict(input)
+    if verdict is not None and verdict["correct"] and SYMBOLIC_GRADER == "local":
+        return _local_result(verdict)
+
+    model = model
+    contents = _contents(input)
+
+    tier = latency_tiers.resolve("grading", tier)
+    # Falls back along the routing table's chain if the model is slow or overloaded
+    route = Route("grading", latency_tiers.model_for(tier, model))
+    response = await generate_routed(
+        route,
+        contents,
+        partial(_cached_config, "grading", tier),
+        priority=Priority.INTERACTIVE,
+        label="grading",
+        hedge=True,
     )
 
-    return response.candidates[0].content.parts[0].function_call.args
+    result = {**response.candidates[0].content.parts[0].function_call.args, "model_used": route.model}
+    return _apply_verdict(result, verdict)
+
+
+async def generate_stream(model, input, tier=None):
+    """
+    Streaming variant of generate().
+
+    Asks for the grading result as JSON (the prompt already specifies the
+    same fields) and yields {"event": "delta", "field": "correction", ...}
+    events as the correction text arrives, then {"event": "result", ...}
+    with the same dict generate() returns.
+
+    When the answer can be checked locally, a
+    {"event": "verdict", "correct": ..., "marks": ..., "expected_answer": ...}
+    event comes first, before the model is called (marks is None until the
+    model has graded the answer, except for a correct answer outside
+    advisory mode).
+    """
+    print("Grading stream input " + input)
+    print("Model " + model)
+
+    verdict, input = _verdict(input)
+    if verdict is not None:
+        marks = 10 if verdict["correct"] and SYMBOLIC_GRADER != "advisory" else None
+        yield {"event": "verdict", "marks": marks, **verdict}
+        if verdict["correct"] and SYMBOLIC_GRADER == "local":
+            yield {"event": "result", "data": _local_result(verdict)}
+            return
+
+    tier = latency_tiers.resolve("grading", tier)
+    route = Route("grading", latency_tiers.model_for(tier, model))
+    stream = generate_routed_stream(
+        route,
+        _contents(input),
+        partial(_cached_config, "grading-stream", tier),
+        priority=Priority.INTERACTIVE,
+        label="grading-stream",
+    )
+
+    async for event in stream_json(stream, text_fields=["correction"]):
+        if event["event"] == "result":
+            event["data"]["model_used"] = route.model
+            _apply_verdict(event["data"], verdict)
+        yield event
+
+# Totals over all batches, for /metrics
+_batch_counts = {"batches": 0, "items": 0, "failed_items": 0, "model_calls": 0, "seconds": 0.0}
+
+
+def batch_stats():
+    seconds = _batch_counts["seconds"]
+    return {
+        **_batch_counts,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(_batch_counts["items"] / seconds, 2) if seconds else 0.0,
+    }
+
+
+async def _grade_chunk(route_model, tier, chunk):
+    """
+    Grade (index, model_input, verdict) items in one model call.
+
+    Returns:
+        {index: result dict}; items the model left out are missing
+    """
+    items = [{"index": index, **json.loads(model_input)} for index, model_input, _ in chunk]
+    route = Route("grading", route_model)
+    response = await generate_routed(
+        route,
+        _contents(json.dumps({"items": items})),
+        partial(_cached_config, "grading-batch", tier),
+        label="grading-batch",
+    )
+    function_call = response.candidates[0].content.parts[0].function_call
+    verdicts = {index: verdict for index, _, verdict in chunk}
+
+    graded = {}
+    for result in (function_call.args or {}).get("results") or []:
+        if not isinstance(result, dict) or not isinstance(result.get("index"), (int, float)):
+            continue
+        index = int(result["index"])
+        if index not in verdicts or index in graded:
+            continue
+        if not all(key in result for key in ("marks", "correction", "remarks")):
+            continue
+        result = {key: result[key] for key in ("marks", "correction", "remarks")}
+        graded[index] = _apply_verdict({**result, "model_used": route.model}, verdicts[index])
+    return graded
+
+
+async def generate_batch(model, items, tier=None):
+    """
+    Grade many (question, student_answer) pairs.
+
+    Answers the local algebra checker can settle are handled as in
+    generate(); the rest are packed GRADING_BATCH_CHUNK_SIZE to a model call
+    (one `grading_results` function call returning every item), with at most
+    GRADING_BATCH_CONCURRENCY calls in flight. A failed call or an item
+    missing from the model's output fails only those items.
+
+    Args:
+        items: List of {"question": str, "student_answer": str}
+
+    Returns:
+        {"results": [{"index", "result" | "error"}, ...] in item order,
+         "stats": {"items", "failed", "model_calls", "seconds", "items_per_second"}}
+    """
+    started = time.monotonic()
+    tier = latency_tiers.resolve("grading", tier)
+    route_model = latency_tiers.model_for(tier, model)
+
+    results = {}
+    pending = []
+    for index, item in enumerate(items):
+        verdict, model_input = _verdict(json.dumps(
+            {"question": item["question"], "student_answer": item["student_answer"]}
+        ))
+        if verdict is not None and verdict["correct"] and SYMBOLIC_GRADER == "local":
+            results[index] = {"result": _local_result(verdict)}
+        else:
+            pending.append((index, model_input, verdict))
+
+    chunks = [pending[i:i + GRADING_BATCH_CHUNK_SIZE] for i in range(0, len(pending), GRADING_BATCH_CHUNK_SIZE)]
+    semaphore = asyncio.Semaphore(GRADING_BATCH_CONCURRENCY)
+
+    async def grade(chunk):
+        async with semaphore:
+            try:
+                graded = await _grade_chunk(route_model, tier, chunk)
+            except Exception as e:
+                print(f"❌ Batch grading call failed for {len(chunk)} items: {type(e).__name__}: {e}")
+                graded, error = {}, f"Grading failed ({type(e).__name__})"
+            else:
+                error = "No grading result returned for this item"
+        for index, _, _ in chunk:
+            results[index] = {"result": graded[index]} if index in graded else {"error": error}
+
+    await asyncio.gather(*(grade(chunk) for chunk in chunks))
+
+    seconds = time.monotonic() - started
+    failed = sum(1 for outcome in results.values() if "error" in outcome)
+    _batch_counts["batches"] += 1
+    _batch_counts["items"] += len(items)
+    _batch_counts["failed_items"] += failed
+    _batch_counts["model_calls"] += len(chunks)
+    _batch_counts["seconds"] += seconds
+
+    return {
+        "results": [{"index": index, **results[index]} for index in range(len(items))],
+        "stats": {
+            "items": len(items),
+            "failed": failed,
+            "model_calls": len(chunks),
+            "seconds": round(seconds, 3),
+            "items_per_second": round(len(items) / seconds, 2) if seconds else 0.0,
+        },
+    }
+
 
 if __name__ == "__main__":
     q = """ {
@@ -94,7 +396,7 @@ if __name__ == "__main__":
 
     ques = "solve for x: 2x + 4 = 10"
     start_time = time.time()
-    a = generate(model="gemini-2.5-pro", input=q)
+    a = asyncio.run(generate(model="gemini-2.5-pro", input=q))
     print(a)
     end_time = time.time()
     print(f"Time taken: {end_time - start_time} seconds")
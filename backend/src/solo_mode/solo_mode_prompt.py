@@ -36,6 +36,14 @@ grading_prompt = """
     </principle>
 </grading_philosophy>
 
+<verified_answer>
+    The input may contain a `verified_answer` object produced by an exact algebra checker:
+    {"correct": true | false, "expected_answer": "x = 3"}
+    - Trust it: `expected_answer` is the correct answer, and `correct` says whether the student's final value matches it.
+    - If `correct` is true: the answer is right; award 10 marks unless it has the presentation issues described in the marking guidelines.
+    - If `correct` is false: do not award 10 marks. Give partial credit for the understanding shown, as for any other answer, and explain the error.
+</verified_answer>
+
 <marking_guidelines>
     <scale>
         **10 marks:** Perfect answer, demonstrates complete understanding.
@@ -184,3 +192,14 @@ grading_prompt = """
     6. Output raw JSON (no markdown code blocks)
 </task>
 """
+
+
+# Appended to grading_prompt for /grade-answers, where several answers are graded in one call
+batch_grading_addendum = """
+<batch_mode>
+The input is {"items": [{"index": 0, "question": ..., "student_answer": ...}, ...]}.
+Grade every item independently, exactly as you would grade it alone (including `verified_answer`
+when present), and return one result per item through `grading_results`, each carrying the
+item's `index`. Never skip an item and never let one item influence another's marks.
+</batch_mode>
+"""
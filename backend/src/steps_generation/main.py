@@ -1,25 +1,41 @@
+import asyncio
 import base64
+import json
 import os
+from functools import partial
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from .steps_prompt_generator import steps_generator_prompt
+from src.llm.configs import config_registry
+from src.llm.context_cache import context_cache
+from src.llm.governor import Priority
+from src.llm.routing import Route, generate as generate_routed, generate_stream as generate_routed_stream
+from src.llm.streaming import stream_json
+from src.llm.tiers import latency_tiers
+from src.utils.algebra import equivalent_answers
+from .sessions import step_sessions
+from .steps_prompt_generator import expected_answer_addendum, steps_generator_prompt
 import time
 
 
 load_dotenv()
 
+# In a session, generate the step that follows a correct answer while the student is still answering
+STEP_SPECULATION_ENABLED = os.environ.get("STEP_SPECULATION_ENABLED", "false").lower() == "true"
+# Seconds a verified answer waits for an unfinished speculative step before also asking the model
+STEP_SPECULATION_WAIT = float(os.environ.get("STEP_SPECULATION_WAIT", 0.5))
 
-def generate(model, input):
-    print("Steps generator input " + input)
-    print("Model " + model)
+# hits: answers verified correct and served the speculative step; misses: answers left to the model;
+# raced: speculative steps not ready in time, raced against an interactive call
+_speculation_counts = {"scheduled": 0, "hits": 0, "misses": 0, "raced": 0, "failed": 0}
+
+
+def speculation_stats():
+    return {"enabled": STEP_SPECULATION_ENABLED, **_speculation_counts}
 
-    client = genai.Client(
-        api_key=os.environ.get("GOOGLE_API_KEY"),
-    )
 
-    model = model
-    contents = [
+def _contents(input):
+    return [
         types.Content(
             role="user",
             parts=[
@@ -27,82 +43,349 @@ def generate(model, input):
             ],
         ),
     ]
+
+
+def _answer_turn(student_answer, previous_turn=None):
+    """
+    The student's reply to the model's last step. After a function call it is
+    sent as that call's function response; after a JSON (streamed) step as text.
+    """
+    calls = [part.function_call for part in (previous_turn.parts if previous_turn else []) if part.function_call]
+    if calls:
+        part = types.Part.from_function_response(
+            name=calls[0].name, response={"student_answer": student_answer}
+        )
+    else:
+        part = types.Part.from_text(text=json.dumps({"student_answer": student_answer}))
+    return types.Content(role="user", parts=[part])
+
+
+def _history_length(input):
+    return len(json.loads(input).get("conversation_history") or [])
+
+
+def _session_contents(kind, input, session_id, history, student_answer):
+    """
+    Prior session turns plus the new answer, or the full serialized input when
+    there is no live session matching the request's conversation_history.
+    """
+    if session_id and student_answer:
+        turns = step_sessions.get(session_id, kind, json.loads(input)["question"], history)
+        if turns:
+            return turns + [_answer_turn(student_answer, turns[-1])]
+    return _contents(input)
+
+
+def _step_schema():
+    properties = {
+        "next_step": genai.types.Schema(
+            type = genai.types.Type.STRING,
+            description = "The next instruction or question for the student",
+        ),
+    }
+    if STEP_SPECULATION_ENABLED:
+        # Only speculation uses it, so the model isn't asked for it otherwise
+        properties["expected_answer"] = genai.types.Schema(
+            type = genai.types.Type.STRING,
+            description = "Hidden from the student: the exact answer to this step (e.g. \"6\" or \"2x = 6\"), or empty if it has no single exact answer",
+        )
+    return genai.types.Schema(
+        type = genai.types.Type.OBJECT,
+        required = ["next_step"],
+        properties = properties,
+    )
+
+
+def _final_answer_schema():
+    return genai.types.Schema(
+        type = genai.types.Type.OBJECT,
+        required = ["marks", "tip", "remarks"],
+        properties = {
+            "marks": genai.types.Schema(
+                type = genai.types.Type.INTEGER,
+                description = "Score out of 10",
+            ),
+            "tip": genai.types.Schema(
+                type = genai.types.Type.STRING,
+                description = "A concise personalized tip or feedback for the student",
+            ),
+            "remarks": genai.types.Schema(
+                type = genai.types.Type.ARRAY,
+                description = "List of remarks made by the student, or empty array if no remarks",
+                items = genai.types.Schema(
+                    type = genai.types.Type.STRING,
+                ),
+            ),
+        },
+    )
+
+
+def _stream_schema():
+    """Both function schemas merged behind a `type` discriminator, as described in the prompt."""
+    step_properties = _step_schema().properties
+    return genai.types.Schema(
+        type = genai.types.Type.OBJECT,
+        required = ["type"],
+        property_ordering = ["type", *step_properties, "marks", "tip", "remarks"],
+        properties = {
+            "type": genai.types.Schema(
+                type = genai.types.Type.STRING,
+                enum = ["step", "final_answer"],
+            ),
+            **step_properties,
+            **_final_answer_schema().properties,
+        },
+    )
+
+
+def _system_prompt():
+    return steps_generator_prompt + (expected_answer_addendum if STEP_SPECULATION_ENABLED else "")
+
+
+def _build_config(model, tier):
     tools = [
         types.Tool(
             function_declarations=[
                 types.FunctionDeclaration(
                     name="step",
                     description="This includes the next atomic steps to solve questions",
-                    parameters=genai.types.Schema(
-                        type = genai.types.Type.OBJECT,
-                        required = ["next_step"],
-                        properties = {
-                            "next_step": genai.types.Schema(
-                                type = genai.types.Type.STRING,
-                                description = "The next instruction or question for the student",
-                            ),
-                        },
-                    ),
+                    parameters=_step_schema(),
                 ),
                 types.FunctionDeclaration(
                     name="final_answer",
                     description="This can only be used at the end of the solution to provide results",
-                    parameters=genai.types.Schema(
-                        type = genai.types.Type.OBJECT,
-                        required = ["marks", "tip", "remarks"],
-                        properties = {
-                            "marks": genai.types.Schema(
-                                type = genai.types.Type.INTEGER,
-                                description = "Score out of 10",
-                            ),
-                            "tip": genai.types.Schema(
-                                type = genai.types.Type.STRING,
-                                description = "A concise personalized tip or feedback for the student",
-                            ),
-                            "remarks": genai.types.Schema(
-                                type = genai.types.Type.ARRAY,
-                                description = "List of remarks made by the student, or empty array if no remarks",
-                                items = genai.types.Schema(
-                                    type = genai.types.Type.STRING,
-                                ),
-                            ),
-                        },
-                    ),
+                    parameters=_final_answer_schema(),
                 ),
             ])
     ]
 
-    thinking_config = None
-    if model == "gemini-3-pro-preview":
-        thinking_config = types.ThinkingConfig(
-            thinkingLevel= "HIGH"
-        )
-    else: 
-        thinking_config = types.ThinkingConfig(
-            thinking_budget=8000
-            )
-
-    generate_content_config = types.GenerateContentConfig(
-        thinkingConfig = thinking_config,
+    return types.GenerateContentConfig(
+        thinkingConfig = latency_tiers.thinking_config(tier, model),
         tools=tools,
         system_instruction=[
-            types.Part.from_text(text= steps_generator_prompt),
+            types.Part.from_text(text= _system_prompt()),
+        ],
+        temperature=1
+    )
+
+
+def _build_stream_config(model, tier):
+    return types.GenerateContentConfig(
+        thinkingConfig = latency_tiers.thinking_config(tier, model),
+        response_mime_type="application/json",
+        response_schema=_stream_schema(),
+        system_instruction=[
+            types.Part.from_text(text= _system_prompt()),
         ],
         temperature=1
     )
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
 
+config_registry.register("steps", _build_config, tiered=True)
+config_registry.register("steps-stream", _build_stream_config, tiered=True)
+
+
+async def _cached_config(name, tier, model):
+    return await context_cache.apply(model, config_registry.get(name, model, tier), label=name, static=True)
+
+
+def _step_turn(kind, response):
+    """(model turn kept in the session, step dict, is final answer) from a step response."""
+    content = response.candidates[0].content
+    if kind == "steps":
+        function_call = content.parts[0].function_call
+        return content, {**function_call.args}, function_call.name == "final_answer"
+    data = json.loads("".join(part.text for part in content.parts if part.text and not part.thought))
+    return _json_turn(data), data, data.get("type") == "final_answer"
+
+
+def _json_turn(data):
+    return types.Content(role="model", parts=[types.Part.from_text(text=json.dumps(data))])
+
+
+async def _call_step(kind, model, tier, contents, priority=Priority.INTERACTIVE):
+    """One non-streamed step call; returns (model turn, step dict, is final answer, model used)."""
+    # Falls back along the routing table's chain if the model is slow or overloaded
+    route = Route("steps", latency_tiers.model_for(tier, model))
+    response = await generate_routed(
+        route,
+        contents,
+        partial(_cached_config, kind, tier),
+        priority=priority,
+        label=kind,
+        hedge=True,
     )
+    return (*_step_turn(kind, response), route.model)
+
+
+def _speculation_done(task):
+    if not task.cancelled() and task.exception() is not None:
+        _speculation_counts["failed"] += 1
+        print(f"❌ Speculative step failed: {task.exception()}")
+
+
+def _finish_step(kind, model, tier, session_id, question, history, contents, turn, data, final):
+    """
+    Record a step in its session and, when the step has an exact expected
+    answer, start generating the step that follows that answer.
+
+    Args:
+        history: Length of the request's conversation_history; the step just
+            made is the session's `history + 1`th
+
+    Returns:
+        The step as the client sees it (without the hidden expected_answer)
+    """
+    data = dict(data)
+    expected = data.pop("expected_answer", None)
+    expected = expected.strip() if isinstance(expected, str) and expected.strip() else None
+    if not session_id:
+        return data
+    if final:
+        step_sessions.end(session_id, kind)
+        return data
+
+    contents = contents + [turn]
+    speculation = None
+    if expected and STEP_SPECULATION_ENABLED:
+        speculation = asyncio.create_task(_call_step(
+            kind, model, tier, contents + [_answer_turn(expected, turn)], Priority.BACKGROUND,
+        ))
+        speculation.add_done_callback(_speculation_done)
+        _speculation_counts["scheduled"] += 1
+    step_sessions.save(session_id, kind, question, history + 1, contents, expected, speculation)
+    return data
+
+
+async def _speculated_step(kind, model, tier, session_id, question, history, contents, student_answer):
+    """
+    The next step for a `student_answer` verified equal to the last step's
+    expected answer: the speculative step, or, if that is still queued or
+    running after STEP_SPECULATION_WAIT seconds, whichever of it and a normal
+    interactive call succeeds first. None when the model has to judge the
+    answer or the speculation failed.
+    """
+    if not (session_id and student_answer):
+        return None
+    session = step_sessions.session(session_id, kind, question, history)
+    if not session or session["speculation"] is None:
+        return None
+    if equivalent_answers(student_answer, session["expected"]) is not True:
+        _speculation_counts["misses"] += 1
+        return None
+
+    task = session["speculation"]
+    # asyncio.wait never cancels the task, so a disconnecting client doesn't throw the step away
+    await asyncio.wait({task}, timeout=STEP_SPECULATION_WAIT)
+    if not task.done():
+        # Background work can sit behind the governor's queue; don't let it hold up the student
+        _speculation_counts["raced"] += 1
+        return await _race(task, _call_step(kind, model, tier, contents))
+    if task.cancelled() or task.exception() is not None:
+        # A failure was already logged by _speculation_done
+        return None
+    _speculation_counts["hits"] += 1
+    return task.result()
+
+
+async def _race(speculation, call):
+    """The first successful step of the speculative task and an interactive call."""
+    call = asyncio.create_task(call)
+    pending = {speculation, call}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    if task is speculation:
+                        _speculation_counts["hits"] += 1
+                    return task.result()
+        # Both failed: surface the interactive call's error, as without speculation
+        return call.result()
+    finally:
+        call.cancel()
+
+
+async def generate(model, input, tier=None, session_id=None, student_answer=None, start_session=False):
+    """
+    Args:
+        input: Serialized request (question, conversation_history, student_answer)
+        session_id: Optional id of a step session issued in an earlier response; when live and
+            matching the length of conversation_history only `student_answer` is sent as a new turn,
+            and an answer matching the last step's expected answer gets the speculative next step
+        student_answer: The student's reply to the last step
+        start_session: Issue a session for this conversation (returned as `session_id`)
+    """
+    print("Steps generator input " + input)
+    print("Model " + model)
+
+    session_id = step_sessions.resolve(session_id, "steps", start_session)
+    question = json.loads(input)["question"]
+    history = _history_length(input)
+    contents = _session_contents("steps", input, session_id, history, student_answer)
+    tier = latency_tiers.resolve("steps", tier)
+
+    step = await _speculated_step("steps", model, tier, session_id, question, history, contents, student_answer)
+    if step is None:
+        step = await _call_step("steps", model, tier, contents)
+    turn, data, final, model_used = step
 
     print("=" * 20 + "Step generator output" + "=" * 20)
-    print(response.candidates[0].content.parts[0].function_call.args)
+    print(data)
+
+    data = _finish_step("steps", model, tier, session_id, question, history, contents, turn, data, final)
+    return {**data, "model_used": model_used, "session_id": session_id}
 
 
-    return response.candidates[0].content.parts[0].function_call.args
+async def generate_stream(model, input, tier=None, session_id=None, student_answer=None, start_session=False):
+    """
+    Streaming variant of generate().
+
+    Asks for the step as JSON (`{"type": "step" | "final_answer", ...}`, as
+    the prompt describes) and yields delta events for `next_step` / `tip`
+    as text arrives, then {"event": "result", "data": <dict>}. Sessions work
+    as in generate(), kept separately since their turns are JSON text; a
+    step from speculation (or the call raced against it) is sent as a single delta.
+    """
+    print("Steps stream input " + input)
+    print("Model " + model)
+
+    session_id = step_sessions.resolve(session_id, "steps-stream", start_session)
+    question = json.loads(input)["question"]
+    history = _history_length(input)
+    contents = _session_contents("steps-stream", input, session_id, history, student_answer)
+    tier = latency_tiers.resolve("steps", tier)
+
+    step = await _speculated_step(
+        "steps-stream", model, tier, session_id, question, history, contents, student_answer,
+    )
+    if step is not None:
+        turn, data, final, model_used = step
+        data = _finish_step("steps-stream", model, tier, session_id, question, history, contents, turn, data, final)
+        for field in ("next_step", "tip"):
+            if isinstance(data.get(field), str) and data[field]:
+                yield {"event": "delta", "field": field, "text": data[field]}
+        yield {"event": "result", "data": {**data, "model_used": model_used, "session_id": session_id}}
+        return
+
+    route = Route("steps", latency_tiers.model_for(tier, model))
+    stream = generate_routed_stream(
+        route,
+        contents,
+        partial(_cached_config, "steps-stream", tier),
+        priority=Priority.INTERACTIVE,
+        label="steps-stream",
+    )
+
+    async for event in stream_json(stream, text_fields=["next_step", "tip"]):
+        if event["event"] == "result":
+            data = event["data"]
+            data = _finish_step(
+                "steps-stream", model, tier, session_id, question, history, contents,
+                _json_turn(data), data, data.get("type") == "final_answer",
+            )
+            event["data"] = {**data, "model_used": route.model, "session_id": session_id}
+        yield event
 
 if __name__ == "__main__":
     q = """ {
@@ -123,7 +406,7 @@ if __name__ == "__main__":
 
     ques = "solve for x: 2x + 4 = 10"
     start_time = time.time()
-    a = generate(model="gemini-3-pro-preview", input=q)
+    a = asyncio.run(generate(model="gemini-3-pro-preview", input=q))
     print(a)
     end_time = time.time()
     print(f"Time taken: {end_time - start_time} seconds")
@@ -0,0 +1,122 @@
+"""
+Server-side step sessions.
+
+Without a session every /generate-steps request re-serializes the whole
+conversation into one user message, so prompt tokens grow with every step.
+With a session the structured turns (types.Content, including the model's
+function calls and thought signatures) are kept here and the next request
+only adds the student's new answer. The system prompt
+stays provider-cached (context_cache) and the stable turn prefix is
+eligible for Gemini's implicit prefix caching.
+
+Session ids are issued by the server (see resolve): a request asks for a
+session with start_session and gets its id back in the response. An id the
+store doesn't know is never adopted, so one client can't read or overwrite
+another's conversation by sending its id, or collide with it by choosing
+the same one.
+
+Sessions expire after STEP_SESSION_TTL seconds idle. Each session records
+how many steps it has served, and is only used while the request's
+conversation_history has exactly that many entries; an expired or unknown
+session, a retried request or an edited history is rebuilt from the
+request's conversation_history instead.
+
+A session also remembers the hidden expected answer to its last step and
+the speculative next step generated as if the student had answered it
+(see steps_generation.main), so a verified correct answer advances without
+waiting for the model.
+"""
+
+import asyncio
+import os
+import secrets
+from typing import Any, Dict, List, Optional
+from google.genai import types
+from dotenv import load_dotenv
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+STEP_SESSION_CACHE_SIZE = int(os.environ.get("STEP_SESSION_CACHE_SIZE", 2048))
+STEP_SESSION_TTL = float(os.environ.get("STEP_SESSION_TTL", 3600))
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(24)
+
+
+class StepSessionStore:
+    def __init__(self, maxsize: int = STEP_SESSION_CACHE_SIZE, ttl: float = STEP_SESSION_TTL):
+        # (session_id, kind) -> {"question": str, "turns": int, "contents": [types.Content, ...],
+        #                        "expected": str | None, "speculation": asyncio.Task | None}
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def resolve(self, session_id: Optional[str], kind: str, start: bool = False) -> Optional[str]:
+        """
+        The session id a request works under: `session_id` if it is live, a
+        newly issued id if the request asked for a session (sending an
+        unknown or expired id counts as asking), else None.
+        """
+        if session_id and self._sessions.get((session_id, kind)) is not None:
+            return session_id
+        if session_id or start:
+            return new_session_id()
+        return None
+
+    def get(self, session_id: str, kind: str, question: str, turns: int) -> Optional[List[types.Content]]:
+        """
+        Turns so far for a live session about `question`, or None to start over.
+
+        Args:
+            kind: "steps" (function calls) or "steps-stream" (JSON text); their turns aren't interchangeable
+            turns: Length of the request's conversation_history
+        """
+        session = self.session(session_id, kind, question, turns)
+        return list(session["contents"]) if session else None
+
+    def session(self, session_id: str, kind: str, question: str, turns: int) -> Optional[Dict[str, Any]]:
+        """The live session record (see __init__) if it matches the request's history, or None."""
+        session = self._sessions.get((session_id, kind))
+        if session is None or session["question"] != question or session["turns"] != turns:
+            return None
+        return session
+
+    def save(
+        self,
+        session_id: str,
+        kind: str,
+        question: str,
+        turns: int,
+        contents: List[types.Content],
+        expected: Optional[str] = None,
+        speculation: Optional[asyncio.Task] = None,
+    ):
+        """
+        Args:
+            turns: Steps served so far; the next request's conversation_history must have this many
+            expected: Hidden expected answer to the last step, if it has one
+            speculation: Task generating the step that follows a correct answer
+        """
+        self._cancel((session_id, kind))
+        self._sessions.set((session_id, kind), {
+            "question": question,
+            "turns": turns,
+            "contents": list(contents),
+            "expected": expected,
+            "speculation": speculation,
+        })
+
+    def end(self, session_id: str, kind: str):
+        self._cancel((session_id, kind))
+        self._sessions.invalidate((session_id, kind))
+
+    def _cancel(self, key):
+        session = self._sessions.get(key)
+        if session and session.get("speculation") is not None:
+            session["speculation"].cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._sessions.stats()
+
+
+step_sessions = StepSessionStore()
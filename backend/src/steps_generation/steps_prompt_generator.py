@@ -119,3 +119,13 @@ When user types ```:end``` immediately end the step generation and move to the f
     Process the input JSON. Identify if this is a math, logic, or humanities question. Determine the step. Output raw JSON.
 </task>
 """
+
+# Appended when STEP_SPECULATION_ENABLED: the step schema then has a hidden expected_answer
+expected_answer_addendum = """
+<expected_answer>
+With every step, also give `expected_answer`: the exact short answer a correct student reply to
+this step would contain, as a number, expression or equation (e.g. "6", "2x = 6", "x = 3").
+Leave it empty when the step has no single exact answer (explanations, open or wordy questions).
+It is never shown to the student.
+</expected_answer>
+"""
@@ -1,69 +1,206 @@
+import asyncio
 import base64
+import json
 import os
+from functools import partial
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from .studio_prompt import studio_prompt
+from src.llm.configs import config_registry
+from src.llm.context_cache import context_cache
+from src.llm.routing import Route, generate as generate_routed, generate_stream as generate_routed_stream
+from src.llm.streaming import stream_json
+from .sessions import new_session_id, studio_sessions
+from .studio_prompt import studio_prompt, studio_stream_addendum
+from pydantic import ValidationError
+from src.api.models import SubjectCurriculumItem
 import time
 
 load_dotenv()
 
-def generate(model, input_data):
-    """
-    Generates response for Studio.
-    
-    Args:
-        model: Model name
-        input_data: Dict containing:
-            - history: List of conversation steps
-            - user_input: Current user message
-            - file: Optional dict with 'uri' and 'mime_type'
-    """
-    print("Studio generator input", input_data)
-    print("Model", model)
-
-    client = genai.Client(
-        api_key=os.environ.get("GOOGLE_API_KEY"),
-    )
-
+def _history_contents(history):
     # Construct history
     contents = []
-    
-    # Add history if present
-    if "history" in input_data and input_data["history"]:
-        for item in input_data["history"]:
-            # User part
-            contents.append(types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=item.get("user", ""))]
-            ))
-            # Model part
-            contents.append(types.Content(
-                role="model",
-                parts=[types.Part.from_text(text=item.get("model", ""))]
-            ))
+    for item in history or []:
+        # User part
+        contents.append(types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=item.get("user", ""))]
+        ))
+        # Model part
+        contents.append(types.Content(
+            role="model",
+            parts=[types.Part.from_text(text=item.get("model", ""))]
+        ))
+    return contents
+
 
+def _user_turn(user_input, file_data=None):
     # Current user input parts
     current_parts = []
     
     # Add file if present
-    if "file" in input_data and input_data["file"]:
-        file_data = input_data["file"]
+    if file_data:
         current_parts.append(types.Part.from_uri(
             file_uri=file_data["uri"],
             mime_type=file_data["mime_type"]
         ))
     
     # Add text input
-    if "user_input" in input_data:
-        current_parts.append(types.Part.from_text(text=input_data["user_input"]))
+    if user_input is not None:
+        current_parts.append(types.Part.from_text(text=user_input))
         
-    contents.append(types.Content(
+    return types.Content(
         role="user",
         parts=current_parts
-    ))
+    )
+
+
+async def _contents(input_data):
+    """
+    The session for this request, its contents for this turn and the file
+    uris they reference.
+
+    An unknown or expired `session_id` is replaced by a newly issued one.
+    With a live session holding as many exchanges as `history` the stored
+    turns are reused and only the new user message is added; a file already
+    attached earlier in the session is not attached again. Otherwise the
+    turns are rebuilt from `history`.
+
+    Returns:
+        (session_id, contents, files)
+    """
+    history = input_data.get("history") or []
+    session_id = input_data.get("session_id")
+    session = await studio_sessions.get(session_id) if session_id else None
+    if session is None:
+        session_id = new_session_id()
+    if session is None or session["turns"] != len(history):
+        session = {"contents": _history_contents(history), "files": []}
+
+    file_data = input_data.get("file")
+    if file_data and file_data["uri"] in session["files"]:
+        file_data = None
+
+    contents = session["contents"] + [_user_turn(input_data.get("user_input"), file_data)]
+    files = session["files"] + ([file_data["uri"]] if file_data else [])
+    return session_id, contents, files
+
+
+def _model_turn(result):
+    """The reply as a text turn, the same form client-side history uses (None for errors)."""
+    if result.get("tool") == "conversation":
+        text = (result.get("args") or {}).get("message", "")
+    elif result.get("tool"):
+        text = json.dumps(result.get("args"), ensure_ascii=False)
+    elif result.get("text"):
+        text = result["text"]
+    else:
+        return None
+    return types.Content(role="model", parts=[types.Part.from_text(text=text)])
+
+
+async def _save_session(session_id, input_data, contents, files, result):
+    """Store the turns including the reply; returns the fields to add to the result."""
+    turn = _model_turn(result)
+    if turn is not None:
+        turns = len(input_data.get("history") or []) + 1
+        await studio_sessions.save(session_id, turns, contents + [turn], files)
+    if result.get("tool") == "cartridge_schema":
+        args = result.get("args") or {}
+        await studio_sessions.save_draft(session_id, {
+            "meta": args.get("meta"),
+            "curriculum": [
+                level for index, item in enumerate(args.get("curriculum") or [])
+                if (level := _validated_level(index, item)) is not None
+            ],
+            "complete": True,
+        })
+    return {"session_id": session_id}
+
+
+def _validated_level(index, item):
+    """A streamed curriculum level as a dict if it matches SubjectCurriculumItem, else None."""
+    try:
+        return SubjectCurriculumItem.model_validate(item).model_dump()
+    except ValidationError as e:
+        print(f"❌ Studio: curriculum level {index} is invalid ({e.error_count()} validation errors)")
+        return None
+
+
+def _cartridge_properties():
+    return {
+        "meta": genai.types.Schema(
+            type=genai.types.Type.OBJECT,
+            required=["subject", "display_name", "description", "language", "public"],
+            properties={
+                "subject": genai.types.Schema(type=genai.types.Type.STRING),
+                "display_name": genai.types.Schema(type=genai.types.Type.STRING),
+                "description": genai.types.Schema(type=genai.types.Type.STRING),
+                "language": genai.types.Schema(type=genai.types.Type.STRING),
+                "created_by": genai.types.Schema(type=genai.types.Type.STRING, description="UUID of the creator"),
+                "public": genai.types.Schema(type=genai.types.Type.BOOLEAN),
+            },
+        ),
+        "curriculum": genai.types.Schema(
+            type=genai.types.Type.ARRAY,
+            items=genai.types.Schema(
+                type=genai.types.Type.OBJECT,
+                required=["level", "name", "description", "concepts", "question_style"],
+                properties={
+                    "level": genai.types.Schema(type=genai.types.Type.INTEGER),
+                    "name": genai.types.Schema(type=genai.types.Type.STRING),
+                    "description": genai.types.Schema(type=genai.types.Type.STRING),
+                    "concepts": genai.types.Schema(
+                        type=genai.types.Type.ARRAY,
+                        items=genai.types.Schema(type=genai.types.Type.STRING)
+                    ),
+                    "question_style": genai.types.Schema(type=genai.types.Type.STRING),
+                },
+            ),
+        ),
+    }
+
+
+def _stream_schema():
+    """The conversation/cartridge_schema tool arguments behind a `tool` discriminator."""
+    return genai.types.Schema(
+        type=genai.types.Type.OBJECT,
+        required=["tool"],
+        property_ordering=["tool", "message", "meta", "curriculum"],
+        properties={
+            "tool": genai.types.Schema(
+                type=genai.types.Type.STRING,
+                enum=["conversation", "cartridge_schema"],
+            ),
+            "message": genai.types.Schema(
+                type=genai.types.Type.STRING,
+                description="The response message to the user.",
+            ),
+            **_cartridge_properties(),
+        },
+    )
+
+
+def _thinking_config(model):
+    if model == "gemini-2.0-flash-thinking-exp-1219":
+        return types.ThinkingConfig(
+            include_thoughts=True
+        )
+    return None
+
+
+def _stream_result(data):
+    """Map a streamed JSON reply onto the same shape generate() returns."""
+    tool = data.get("tool")
+    if tool == "cartridge_schema":
+        return {"tool": tool, "args": {"meta": data.get("meta"), "curriculum": data.get("curriculum", [])}}
+    if tool == "conversation":
+        return {"tool": tool, "args": {"message": data.get("message", "")}}
+    return {"error": "No valid content in response"}
 
-    # Define tools
+
+def _build_config(model):
     tools = [
         types.Tool(
             function_declarations=[
@@ -87,51 +224,15 @@ def generate(model, input_data):
                     parameters=genai.types.Schema(
                         type=genai.types.Type.OBJECT,
                         required=["meta", "curriculum"],
-                        properties={
-                            "meta": genai.types.Schema(
-                                type=genai.types.Type.OBJECT,
-                                required=["subject", "display_name", "description", "language", "public"],
-                                properties={
-                                    "subject": genai.types.Schema(type=genai.types.Type.STRING),
-                                    "display_name": genai.types.Schema(type=genai.types.Type.STRING),
-                                    "description": genai.types.Schema(type=genai.types.Type.STRING),
-                                    "language": genai.types.Schema(type=genai.types.Type.STRING),
-                                    "created_by": genai.types.Schema(type=genai.types.Type.STRING, description="UUID of the creator"),
-                                    "public": genai.types.Schema(type=genai.types.Type.BOOLEAN),
-                                },
-                            ),
-                            "curriculum": genai.types.Schema(
-                                type=genai.types.Type.ARRAY,
-                                items=genai.types.Schema(
-                                    type=genai.types.Type.OBJECT,
-                                    required=["level", "name", "description", "concepts", "question_style"],
-                                    properties={
-                                        "level": genai.types.Schema(type=genai.types.Type.INTEGER),
-                                        "name": genai.types.Schema(type=genai.types.Type.STRING),
-                                        "description": genai.types.Schema(type=genai.types.Type.STRING),
-                                        "concepts": genai.types.Schema(
-                                            type=genai.types.Type.ARRAY,
-                                            items=genai.types.Schema(type=genai.types.Type.STRING)
-                                        ),
-                                        "question_style": genai.types.Schema(type=genai.types.Type.STRING),
-                                    },
-                                ),
-                            ),
-                        },
+                        properties=_cartridge_properties(),
                     ),
                 ),
             ]
         )
     ]
 
-    thinking_config = None
-    if model == "gemini-2.0-flash-thinking-exp-1219":
-        thinking_config = types.ThinkingConfig(
-            include_thoughts=True
-        )
-    
-    generate_content_config = types.GenerateContentConfig(
-        thinking_config=thinking_config,
+    return types.GenerateContentConfig(
+        thinking_config=_thinking_config(model),
         tools=tools,
         system_instruction=[
             types.Part.from_text(text=studio_prompt),
@@ -139,12 +240,29 @@ def generate(model, input_data):
         temperature=1
     )
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
+
+def _build_stream_config(model):
+    return types.GenerateContentConfig(
+        thinking_config=_thinking_config(model),
+        response_mime_type="application/json",
+        response_schema=_stream_schema(),
+        system_instruction=[
+            types.Part.from_text(text=studio_prompt + studio_stream_addendum),
+        ],
+        temperature=1
     )
 
+
+config_registry.register("studio", _build_config)
+config_registry.register("studio-stream", _build_stream_config)
+
+
+async def _cached_config(name, model):
+    return await context_cache.apply(model, config_registry.get(name, model), label=name, static=True)
+
+
+def _response_dict(response):
+    """Map a generate_content response onto {"tool", "args"}, {"text"} or {"error"}."""
     print("=" * 20 + " Studio output " + "=" * 20)
     try:
         # Check if we have valid candidates
@@ -190,6 +308,92 @@ def generate(model, input_data):
         traceback.print_exc()
         return {"error": str(e)}
 
+
+async def generate(model, input_data):
+    """
+    Generates response for Studio.
+    
+    Args:
+        model: Model name
+        input_data: Dict containing:
+            - history: List of conversation steps
+            - user_input: Current user message
+            - file: Optional dict with 'uri' and 'mime_type'
+            - session_id: Optional id from an earlier response; reuses the
+              server-side turns instead of history while they match its length
+    """
+    print("Studio generator input", input_data)
+    print("Model", model)
+
+    session_id, contents, files = await _contents(input_data)
+
+    # Falls back along the routing table's chain if the model is slow or overloaded
+    route = Route("studio", model)
+    response = await generate_routed(
+        route,
+        contents,
+        partial(_cached_config, "studio"),
+        label="studio",
+    )
+
+    result = _response_dict(response)
+    session = await _save_session(session_id, input_data, contents, files, result)
+    return {**result, "model_used": route.model, **session}
+
+
+async def generate_stream(model, input_data):
+    """
+    Streaming variant of generate().
+
+    Tools are swapped for a JSON response (see studio_stream_addendum) so the
+    reply can be streamed: yields {"event": "session", "session_id": ...}
+    first, then {"event": "delta", "field": "message", "text": ...} events for a
+    conversation message, and for a cartridge
+    {"event": "meta", "meta": {...}} followed by one
+    {"event": "level", "index": i, "level": {...}} per curriculum level as
+    soon as it is complete and valid (SubjectCurriculumItem). Finally
+    {"event": "result", "data": <same dict generate() returns>}.
+
+    The levels received so far are kept as the session's cartridge draft
+    (see studio_sessions.get_draft).
+    """
+    print("Studio stream input", input_data)
+    print("Model", model)
+
+    draft = {"meta": None, "curriculum": [], "complete": False}
+
+    session_id, contents, files = await _contents(input_data)
+    # Sent before generating, so a client that loses the stream can still fetch the draft
+    yield {"event": "session", "session_id": session_id}
+    route = Route("studio", model)
+    stream = generate_routed_stream(
+        route,
+        contents,
+        partial(_cached_config, "studio-stream"),
+        label="studio-stream",
+    )
+
+    events = stream_json(stream, text_fields=["message"], array_fields=["curriculum"], value_fields=["meta"])
+    async for event in events:
+        if event["event"] == "field":
+            draft["meta"] = event["value"]
+            event = {"event": "meta", "meta": event["value"]}
+        elif event["event"] == "item":
+            level = _validated_level(event["index"], event["value"])
+            if level is None:
+                continue
+            draft["curriculum"].append(level)
+            event = {"event": "level", "index": event["index"], "level": level}
+        elif event["event"] == "result":
+            result = _stream_result(event["data"])
+            session = await _save_session(session_id, input_data, contents, files, result)
+            yield {"event": "result", "data": {**result, "model_used": route.model, **session}}
+            continue
+
+        if event["event"] in ("meta", "level"):
+            await studio_sessions.save_draft(session_id, draft)
+        yield event
+
 if __name__ == "__main__":
     # Test case
     test_input = {
@@ -199,7 +403,7 @@ if __name__ == "__main__":
     
     start_time = time.time()
     # Using a model that supports tools (flash or pro)
-    a = generate(model="gemini-2.0-flash-exp", input_data=test_input)
+    a = asyncio.run(generate(model="gemini-2.0-flash-exp", input_data=test_input))
     print(a)
     end_time = time.time()
     print(f"Time taken: {end_time - start_time} seconds")
@@ -0,0 +1,139 @@
+"""
+Server-side Studio sessions.
+
+Without a session every /studio/generate request carries the whole
+conversation in `history` (and usually the attached document again), and
+the server rebuilds the types.Content list from scratch. With a
+`session_id` the built turns are kept here: a request only adds the new
+user message, and a document is attached to the turn it was first sent
+with and never again for that session.
+
+Session ids are issued by the server (new_session_id) and returned with
+every Studio response. An id the store doesn't know is never adopted, so
+a session and its draft can only be reached by the caller it was issued
+to, not through an id someone else chose or guessed.
+
+The session also keeps the cartridge draft being streamed (meta and the
+curriculum levels completed so far), so a client that lost the stream can
+pick up what was already generated.
+
+Backends (STUDIO_SESSION_BACKEND):
+    memory - in-process LRU with an idle TTL (default)
+    sqlite - on-disk SQLite tables (STUDIO_SESSION_PATH, see
+             src/utils/sqlite_store.py), shared across restarts and workers;
+             only the STUDIO_SESSION_CACHE_SIZE most recently saved sessions
+             are kept
+
+A session records how many exchanges it holds and is only used while the
+request's history has exactly that many items. An expired or unknown
+session, a retried request or an edited history is rebuilt from the
+request's history.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+from typing import Any, Dict, List, Optional
+from google.genai import types
+from dotenv import load_dotenv
+from src.utils.sqlite_store import SQLiteStore
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+STUDIO_SESSION_BACKEND = os.environ.get("STUDIO_SESSION_BACKEND", "memory").lower()
+STUDIO_SESSION_CACHE_SIZE = int(os.environ.get("STUDIO_SESSION_CACHE_SIZE", 1024))
+STUDIO_SESSION_TTL = float(os.environ.get("STUDIO_SESSION_TTL", 7200))
+STUDIO_SESSION_PATH = os.environ.get("STUDIO_SESSION_PATH", "studio_sessions.sqlite3")
+# Writes between two prunes of the sqlite tables
+STUDIO_SESSION_PRUNE_EVERY = int(os.environ.get("STUDIO_SESSION_PRUNE_EVERY", 100))
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(24)
+
+
+class StudioSessionStore:
+    def __init__(
+        self,
+        backend: str = STUDIO_SESSION_BACKEND,
+        maxsize: int = STUDIO_SESSION_CACHE_SIZE,
+        ttl: float = STUDIO_SESSION_TTL,
+        path: str = STUDIO_SESSION_PATH,
+        prune_every: int = STUDIO_SESSION_PRUNE_EVERY,
+    ):
+        self.backend = backend
+
+        # session_id -> {"turns": int, "contents": [types.Content, ...], "files": [uri, ...]}
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        # session_id -> {"meta": dict | None, "curriculum": [dict, ...], "complete": bool}
+        self._drafts = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._db = SQLiteStore(
+            path, ["studio_sessions", "studio_drafts"], ttl, maxsize, prune_every=prune_every, label="studio session"
+        )
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The session's turns so far, or None if the id is unknown or expired.
+
+        Returns:
+            {"turns": exchanges so far, "contents": [types.Content, ...], "files": [file uris already attached]}
+        """
+        if self.backend == "sqlite":
+            text = await asyncio.to_thread(self._db.get, "studio_sessions", session_id)
+            if text is None:
+                return None
+            data = json.loads(text)
+            return {
+                "turns": data["turns"],
+                "contents": [types.Content.model_validate(content) for content in data["contents"]],
+                "files": data["files"],
+            }
+
+        session = self._memory.get(session_id)
+        if session is None:
+            return None
+        return {"turns": session["turns"], "contents": list(session["contents"]), "files": list(session["files"])}
+
+    async def save(self, session_id: str, turns: int, contents: List[types.Content], files: List[str]):
+        """
+        Args:
+            turns: Exchanges in `contents`; the next request's history must have this many items to reuse them
+        """
+        if self.backend == "sqlite":
+            text = json.dumps({
+                "turns": turns,
+                "contents": [content.model_dump(mode="json", exclude_none=True) for content in contents],
+                "files": list(files),
+            }, ensure_ascii=False)
+            await asyncio.to_thread(self._db.set, "studio_sessions", session_id, text)
+            return
+
+        self._memory.set(session_id, {"turns": turns, "contents": list(contents), "files": list(files)})
+
+    async def get_draft(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The session's cartridge draft: {"meta", "curriculum", "complete"}, or None."""
+        if self.backend == "sqlite":
+            text = await asyncio.to_thread(self._db.get, "studio_drafts", session_id)
+            return json.loads(text) if text is not None else None
+        draft = self._drafts.get(session_id)
+        return json.loads(draft) if draft is not None else None
+
+    async def save_draft(self, session_id: str, draft: Dict[str, Any]):
+        text = json.dumps(draft, ensure_ascii=False)
+        if self.backend == "sqlite":
+            await asyncio.to_thread(self._db.set, "studio_drafts", session_id, text)
+            return
+        self._drafts.set(session_id, text)
+
+    def close(self):
+        self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        if self.backend == "sqlite":
+            return {"backend": self.backend, **self._db.stats()}
+        return {"backend": self.backend, **self._memory.stats(), "drafts": len(self._drafts)}
+
+
+studio_sessions = StudioSessionStore()
@@ -58,4 +58,13 @@ How would you say in French: I have a pen?
 - `conversation`: Use this to ask questions or provide feedback to the user.
 - `cartridge_schema`: Use this ONLY when you are ready to create the final course structure.
 </tools>
-"""
\ No newline at end of file
+"""
+
+# Appended to studio_prompt on the streaming path, where tools are replaced by a JSON response
+studio_stream_addendum = """
+<output_mode>
+Tools are not available in this mode. Reply with a single JSON object instead:
+- To chat with the user (same as the `conversation` tool): {"tool": "conversation", "message": "..."}
+- To deliver the course (same as the `cartridge_schema` tool): {"tool": "cartridge_schema", "meta": {...}, "curriculum": [...]}
+</output_mode>
+"""
@@ -0,0 +1,128 @@
+import pytest
+from fractions import Fraction
+from src.utils.algebra import AlgebraError, check_answer, equivalent_answers, expected_answer, is_reduced, parse_expression
+
+
+@pytest.mark.parametrize("answer", ["3", "x = 3", "3 = x", "6/2", "The answer is 3", "$x=3$", "3.0"])
+def test_check_answer_accepts_equivalent_forms(answer):
+    assert check_answer("Solve for x: 2x + 4 = 10", answer) == {"correct": True, "expected_answer": "x = 3"}
+
+
+def test_check_answer_marks_wrong_values():
+    assert check_answer("Solve for x: 2x + 4 = 10", "x = 4") == {"correct": False, "expected_answer": "x = 3"}
+    assert check_answer("What is 3/4 + 1/2?", "1") == {"correct": False, "expected_answer": "5/4"}
+    assert check_answer("What is 3/4 + 1/2?", "1.25") == {"correct": True, "expected_answer": "5/4"}
+
+
+def test_check_answer_compares_simplified_expressions():
+    assert check_answer("Simplify: 2(x + 3) - x", "x + 6") == {"correct": True, "expected_answer": "x + 6"}
+    assert check_answer("Simplify: 2(x + 3) - x", "6 + x") == {"correct": True, "expected_answer": "x + 6"}
+    assert check_answer("Simplify: 2(x + 3) - x", "x + 5") == {"correct": False, "expected_answer": "x + 6"}
+
+
+def test_check_answer_accepts_finished_forms():
+    assert check_answer("Expand (x+1)^2", "2x + x^2 + 1") == {"correct": True, "expected_answer": "x^2 + 2x + 1"}
+    assert check_answer("What is 3/4 + 1/2?", "\\frac{5}{4}") == {"correct": True, "expected_answer": "5/4"}
+    assert check_answer("Simplify: x/2 + x", "3x/2") == {"correct": True, "expected_answer": "3/2x"}
+
+
+@pytest.mark.parametrize("question, answer", [
+    # The question echoed back
+    ("Simplify: 2(x + 3) - x", "2(x + 3) - x"),
+    ("Expand (x+1)^2", "(x+1)^2"),
+    ("What is 3/4 + 1/2?", "3/4 + 1/2"),
+    ("What is 2^10?", "2^10"),
+    ("What is (10-4)/2?", "(10-4)/2"),
+    # Unfinished working
+    ("Simplify: 2(x + 3) - x", "2x + 6 - x"),
+    ("What is 3/4 + 1/2?", "10/8"),
+])
+def test_check_answer_leaves_unevaluated_answers_to_the_model(question, answer):
+    assert check_answer(question, answer) is None
+
+
+@pytest.mark.parametrize("text, reduced", [
+    ("3", True), ("-5/4", True), ("1.25", True), ("x^2 + 2x + 1", True), ("-x/2 + 1", True),
+    ("6/2", False), ("2^10", False), ("x + x", False), ("2x + 3 + 1", False), ("x*x", False),
+])
+def test_is_reduced(text, reduced):
+    assert is_reduced(text) is reduced
+
+
+def test_check_answer_leaves_rounded_decimals_to_the_model():
+    # 1/3 rounded to two places is close enough that only the model can judge the credit
+    assert check_answer("Solve for x: 3x = 1", "0.33") is None
+    assert check_answer("Solve for x: 3x = 1", "x = 0.333") is None
+    # Not a rounding of 1/3 at the precision given
+    assert check_answer("Solve for x: 3x = 1", "0.4") == {"correct": False, "expected_answer": "x = 1/3"}
+
+
+@pytest.mark.parametrize("question, answer", [
+    # Unsupported questions
+    ("A train leaves at 3pm. When does it arrive?", "5pm"),
+    ("Solve for x: x^2 = 4", "2"),
+    ("Solve for y: 2x + 4 = 10", "3"),
+    # Working or prose instead of a final answer
+    ("Solve for x: 2x + 4 = 10", "2x = 6"),
+    ("Solve for x: 2x + 4 = 10", "it is three"),
+    ("Solve for x: 2x + 4 = 10", ""),
+    ("Solve for x: 2x + 4 = 10", "x"),
+])
+def test_check_answer_returns_none_when_it_cannot_judge(question, answer):
+    assert check_answer(question, answer) is None
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("x = 3", "3"),
+    ("3 = x", "x = 3"),
+    ("2x = 6", "6 = 2x"),
+    ("x*2 = 6", "2x = 6"),
+    ("4x = 12", "2x = 6"),
+    ("2 + 2x", "2x + 2"),
+])
+def test_equivalent_answers_match(answer, expected):
+    assert equivalent_answers(answer, expected) is True
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("4", "3"),
+    ("x = 4", "x = 3"),
+    ("2x = 7", "2x = 6"),
+    ("2x + 1", "2x + 2"),
+])
+def test_equivalent_answers_differ(answer, expected):
+    assert equivalent_answers(answer, expected) is False
+
+
+@pytest.mark.parametrize("answer, expected", [
+    # Rounded decimals
+    ("0.33", "1/3"),
+    ("0.667", "2/3"),
+    # Unfinished working, such as the step's question echoed back
+    ("6/2", "3"),
+    ("2(x + 1)", "2x + 2"),
+    ("2x = 10 - 4", "2x = 6"),
+    ("x = 6/2", "x = 3"),
+    # Different forms or variables
+    ("x = 3", "2x = 6"),
+    ("y = 3", "x = 3"),
+    # Unparseable
+    ("three", "3"),
+    ("", "3"),
+    ("3", None),
+])
+def test_equivalent_answers_returns_none_when_it_cannot_compare(answer, expected):
+    assert equivalent_answers(answer, expected) is None
+
+
+def test_expected_answer_kinds():
+    assert expected_answer("Solve for x: 2x + 4 = 10") == {"kind": "equation", "value": Fraction(3), "variable": "x"}
+    assert expected_answer("What is 3/4 + 1/2?") == {"kind": "value", "value": Fraction(5, 4)}
+    assert expected_answer("Simplify: 2(x + 3) - x")["kind"] == "expression"
+    assert expected_answer("Write an essay about fractions") is None
+
+
+@pytest.mark.parametrize("text", ["x + y", "2 ** x", "x / x", "import os", "x" * 300, "1/0"])
+def test_parse_expression_rejects_unsupported_input(text):
+    with pytest.raises(AlgebraError):
+        parse_expression(text)
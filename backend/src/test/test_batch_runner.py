@@ -0,0 +1,134 @@
+import json
+import re
+import pytest
+from src.question_generation.batch_runner import LocalBatchBackend, load_state, new_state, progress, run, save_state
+
+CARTRIDGE = {
+    "meta": {"title": "Algebra"},
+    "curriculum": [
+        {"name": "Linear equations", "concepts": ["one step", "two step"]},
+        {"name": "Inequalities"},
+    ],
+}
+
+
+class Crash(BaseException):
+    """Stands in for the process dying; not an Exception, so nothing catches it."""
+
+
+class Responder:
+    """`respond` for LocalBatchBackend: answers from the concept in the prompt, with scripted failures."""
+
+    def __init__(self, fail=None, crash_after=None):
+        # concept -> number of calls for it that fail
+        self.fail = dict(fail or {})
+        self.crash_after = crash_after
+        self.calls = []
+
+    def __call__(self, model, contents, config):
+        text = contents[0].parts[0].text
+        concept = re.search(r'the concept "([^"]+)"', text).group(1)
+        level = int(re.search(r"at Level (\d+)", text).group(1))
+        if self.crash_after is not None and len(self.calls) >= self.crash_after:
+            raise Crash()
+        self.calls.append(concept)
+        if self.fail.get(concept):
+            self.fail[concept] -= 1
+            raise RuntimeError(f"{concept} failed")
+        return json.dumps({"questions": [
+            {"question": f"{concept} question {i}", "level": level} for i in range(2)
+        ]})
+
+
+class Writer:
+    def __init__(self, crash=False):
+        self.crash = crash
+        self.rows = []
+
+    def __call__(self, rows):
+        if self.crash:
+            raise Crash()
+        self.rows.extend(rows)
+        return len(rows)
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    path = str(tmp_path / "state.json")
+    save_state(path, new_state("subject", "gemini-2.5-flash", "fast", "local", [1, 2], 2, CARTRIDGE))
+    return path
+
+
+def _run(state_path, tmp_path, respond, writer, **kwargs):
+    backend = LocalBatchBackend(str(tmp_path / "jobs"), respond=respond)
+    return run(state_path, backend, CARTRIDGE, writer=writer, poll_seconds=0, **kwargs)
+
+
+def test_run_writes_every_concept(state_path, tmp_path):
+    writer = Writer()
+    state = _run(state_path, tmp_path, Responder(), writer)
+
+    assert {request["status"] for request in state["requests"].values()} == {"written"}
+    assert progress(state) == {"requests": 3, "questions": 6, "written": 3}
+    assert sorted({(row["level"], row["concept"]) for row in writer.rows}) == [
+        (1, "one step"), (1, "two step"), (2, "Inequalities"),
+    ]
+    assert all(row["subject_id"] == "subject" and row["model"] == "gemini-2.5-flash" for row in writer.rows)
+    assert load_state(state_path) == state
+
+
+def test_failed_requests_are_resubmitted_in_a_new_job(state_path, tmp_path):
+    respond = Responder(fail={"two step": 1})
+    writer = Writer()
+    state = _run(state_path, tmp_path, respond, writer)
+
+    retried = state["requests"]["L1:C1"]
+    assert retried["status"] == "written"
+    assert retried["attempts"] == 2
+    assert len(state["jobs"]) == 2
+    # Only the failed request goes into the second job
+    assert sorted(respond.calls) == ["Inequalities", "one step", "two step", "two step"]
+    assert len(writer.rows) == 6
+
+
+def test_requests_stop_after_max_attempts(state_path, tmp_path):
+    respond = Responder(fail={"two step": 5})
+    state = _run(state_path, tmp_path, respond, Writer(), max_attempts=2)
+
+    failed = state["requests"]["L1:C1"]
+    assert failed["status"] == "failed"
+    assert failed["attempts"] == 2
+    assert failed["error"] == "two step failed"
+    assert respond.calls.count("two step") == 2
+
+
+def test_resume_after_a_crash_mid_job_only_answers_the_rest(state_path, tmp_path):
+    with pytest.raises(Crash):
+        _run(state_path, tmp_path, Responder(crash_after=1), Writer())
+    crashed = load_state(state_path)
+    assert {request["status"] for request in crashed["requests"].values()} == {"submitted"}
+
+    respond = Responder()
+    writer = Writer()
+    state = _run(state_path, tmp_path, respond, writer)
+
+    # The same job is polled again; the answer saved before the crash is kept
+    assert len(state["jobs"]) == 1
+    assert len(respond.calls) == 2
+    assert {request["status"] for request in state["requests"].values()} == {"written"}
+    assert len(writer.rows) == 6
+
+
+def test_resume_writes_questions_collected_before_a_crash(state_path, tmp_path):
+    with pytest.raises(Crash):
+        _run(state_path, tmp_path, Responder(), Writer(crash=True))
+    crashed = load_state(state_path)
+    assert {request["status"] for request in crashed["requests"].values()} == {"done"}
+
+    respond = Responder()
+    writer = Writer()
+    state = _run(state_path, tmp_path, respond, writer)
+
+    assert respond.calls == []
+    assert {request["status"] for request in state["requests"].values()} == {"written"}
+    assert len(writer.rows) == 6
@@ -0,0 +1,19 @@
+import asyncio
+from src.llm import clients
+
+
+def test_close_clients_closes_the_http_pools():
+    async def scenario():
+        client = clients.get_client("test-key")
+        assert clients.get_client("test-key") is client
+        http, async_http = clients._pools["test-key"]
+        assert not http.is_closed and not async_http.is_closed
+
+        await clients.close_clients()
+        assert http.is_closed
+        assert async_http.is_closed
+        # A later call gets a fresh client rather than the closed one
+        assert clients.get_client("test-key") is not client
+        await clients.close_clients()
+
+    asyncio.run(scenario())
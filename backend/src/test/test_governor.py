@@ -0,0 +1,171 @@
+import asyncio
+import math
+import pytest
+from google.genai import errors
+from src.llm import governor as governor_module
+from src.llm.governor import Governor, ModelGovernor, Priority, RateLimitTimeout, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(governor_module.time, "monotonic", clock)
+    return clock
+
+
+def rate_limited():
+    return errors.APIError(429, {"error": {"code": 429, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}})
+
+
+def test_token_bucket_refills_per_minute(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.wait_time(30) == 0
+    assert bucket.wait_time(31) == pytest.approx(1.0)
+
+
+def test_token_bucket_oversized_requests_wait_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1000) == pytest.approx(60.0)
+
+
+def test_token_bucket_drain_and_unlimited(clock):
+    bucket = TokenBucket(60)
+    bucket.drain()
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+
+    unlimited = TokenBucket(0)
+    unlimited.take(10**9)
+    assert unlimited.wait_time(10**9) == 0
+
+
+def test_window_is_unlimited_until_the_first_429(clock):
+    model = ModelGovernor("m", rpm=0, tpm=0, max_concurrency=0)
+    assert model.limit == math.inf
+
+    async def scenario():
+        slots = [model.slot(1, Priority.NORMAL, 1) for _ in range(100)]
+        for slot in slots:
+            await slot.__aenter__()
+        assert model.active == 100
+        # The 429 opens the window at half the calls that were in flight
+        await slots[0].__aexit__(errors.APIError, rate_limited(), None)
+        assert model.limit == 50
+        assert model.stats()["concurrency_limit"] == 50
+        for slot in slots[1:]:
+            await slot.__aexit__(None, None, None)
+        # Successes grow the window additively from there
+        assert 50 < model.limit < 60
+
+    asyncio.run(scenario())
+
+
+def test_aimd_halves_on_429_with_cooldown_and_grows_on_success(clock):
+    model = ModelGovernor("m", rpm=0, tpm=0, max_concurrency=8, min_concurrency=1)
+
+    async def call(error=None):
+        async with model.slot(1, Priority.NORMAL, 1):
+            if error is not None:
+                raise error
+
+    async def scenario():
+        with pytest.raises(errors.APIError):
+            await call(rate_limited())
+        assert model.limit == 4
+        # A second 429 within the cooldown is the same congestion event
+        with pytest.raises(errors.APIError):
+            await call(rate_limited())
+        assert model.limit == 4
+
+        clock.now += governor_module.GEMINI_BACKOFF_COOLDOWN
+        with pytest.raises(errors.APIError):
+            await call(rate_limited())
+        assert model.limit == 2
+
+        await call()
+        assert model.limit == pytest.approx(2.5)
+        for _ in range(100):
+            await call()
+        assert model.limit == 8
+
+    asyncio.run(scenario())
+
+
+def test_higher_priority_is_admitted_first_and_queue_times_out():
+    model = ModelGovernor("m", rpm=0, tpm=0, max_concurrency=1)
+    order = []
+
+    async def call(name, priority, hold):
+        async with model.slot(1, priority, 1):
+            order.append(name)
+            await hold.wait()
+
+    async def scenario():
+        release = asyncio.Event()
+        first = asyncio.create_task(call("first", Priority.NORMAL, release))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(call("background", Priority.BACKGROUND, release))
+        interactive = asyncio.create_task(call("interactive", Priority.INTERACTIVE, release))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, background, interactive)
+
+        blocker = asyncio.Event()
+        held = asyncio.create_task(call("held", Priority.NORMAL, blocker))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitTimeout):
+            async with model.slot(1, Priority.INTERACTIVE, 0.01):
+                pass
+        blocker.set()
+        await held
+
+    asyncio.run(scenario())
+    assert order[:3] == ["first", "interactive", "background"]
+    assert model.timeouts == 1
+    assert model.active == 0
+
+
+def test_governor_keeps_a_bounded_number_of_idle_models():
+    governor = Governor(limits={"pinned": {"max_concurrency": 4}}, max_models=3)
+    pinned = governor.for_model("pinned")
+    assert pinned.limit == 4
+
+    for i in range(10):
+        governor.for_model(f"client-model-{i}")
+    assert len(governor.stats()) == 3
+    assert "client-model-9" in governor.stats()
+
+
+def test_governor_does_not_evict_busy_models():
+    governor = Governor(limits={}, max_models=1)
+
+    async def scenario():
+        async with governor.slot("busy", 1):
+            governor.for_model("other")
+            assert "busy" in governor.stats()
+
+    asyncio.run(scenario())
+
+
+def test_governor_never_evicts_the_model_just_requested():
+    governor = Governor(limits={}, max_models=1)
+
+    async def scenario():
+        async with governor.slot("busy", 1):
+            other = governor.for_model("other")
+            # The map is full of busy governors; the new one must survive its own lookup
+            assert governor.for_model("other") is other
+
+    asyncio.run(scenario())
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from src.question_generation.prefetch import QuestionPool, predict_next_level
+
+
+def answers(*marks):
+    return [{"question": f"q{i}", "marks": mark} for i, mark in enumerate(marks)]
+
+
+@pytest.mark.parametrize("history, expected", [
+    ([], 3),
+    (answers(9), 4),
+    (answers(8), 4),
+    (answers(7), 3),
+    # One low mark holds the level, two in a row drop it
+    (answers(9, 4), 3),
+    (answers(4, 5), 2),
+    (answers(4, 6), 3),
+])
+def test_predict_next_level(history, expected):
+    assert predict_next_level(3, history) == expected
+
+
+def test_predict_next_level_reads_score_and_skips_missing_marks():
+    assert predict_next_level(2, [{"score": "9"}]) == 3
+    assert predict_next_level(2, [{"remarks": []}]) == 2
+
+
+def test_predict_next_level_stays_within_the_curriculum():
+    assert predict_next_level(1, answers(3, 2)) == 1
+    assert predict_next_level(5, answers(10), max_level=5) == 5
+    assert predict_next_level(7, answers(7), max_level=5) == 5
+    assert predict_next_level(5, answers(10)) == 6
+
+
+def test_pool_never_prefetches_past_the_last_level():
+    async def scenario():
+        pool = QuestionPool(enabled=True, offsets=[0, 1, -1])
+        requested = []
+
+        async def generate(level):
+            requested.append(level)
+            return f'{{"question": "next", "level": {level}}}'
+
+        pool.schedule("u", "s", "m", "served", 5, generate, max_level=5)
+        await asyncio.sleep(0)
+        await asyncio.gather(*pool._tasks)
+        return pool, requested
+
+    pool, requested = asyncio.run(scenario())
+    assert sorted(requested) == [4, 5]
+
+    history = [{"question": "served", "marks": 10}]
+    assert pool.take("u", "s", "m", {"question": "served"}, history, max_level=5) is not None
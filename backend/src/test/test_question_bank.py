@@ -0,0 +1,107 @@
+import pytest
+from src.database.question_bank import question_id
+from src.question_generation import bank
+from src.question_generation.bank import QuestionBank
+
+
+class FakeMemory:
+    def __init__(self, answered=()):
+        self.user_id = "user"
+        self.subject_id = "subject"
+        self.answered = list(answered)
+        self.queries = 0
+
+    def get_answered_questions(self, limit):
+        self.queries += 1
+        return self.answered[:limit]
+
+
+def _row(level, concept, question):
+    return {"question_id": question_id("subject", question), "level": level, "concept": concept, "question": question}
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    rows = []
+    monkeypatch.setattr(bank, "fetch_questions", lambda subject_id: list(rows))
+    return rows
+
+
+def test_take_serves_each_unseen_question_once(rows):
+    rows.extend([_row(1, "a", "q1"), _row(1, "b", "q2"), _row(2, "a", "q3")])
+    question_bank = QuestionBank(enabled=True)
+    index = question_bank.index("subject")
+    seen = {question_id("subject", "q1")}
+
+    taken = question_bank.take("subject", 1, index, seen)
+    assert taken == {"question": "q2", "level": 1, "concept": "b"}
+    assert question_id("subject", "q2") in seen
+
+    assert question_bank.take("subject", 1, index, seen) is None
+    assert question_bank.take("subject", 3, index, seen) is None
+    assert question_bank.stats()["hits"] == 1
+    assert question_bank.stats()["misses"] == 2
+
+
+def test_take_picks_a_concept_before_a_question(rows, monkeypatch):
+    rows.extend([_row(1, "a", f"a{i}") for i in range(9)] + [_row(1, "b", "b0")])
+    question_bank = QuestionBank(enabled=True)
+    index = question_bank.index("subject")
+    picks = []
+    monkeypatch.setattr(bank.random, "choice", lambda items: picks.append(list(items)) or items[-1])
+
+    assert question_bank.take("subject", 1, index, set())["concept"] == "b"
+    assert picks[0] == ["a", "b"]
+
+
+def test_load_skips_seen_for_an_empty_bank(rows):
+    question_bank = QuestionBank(enabled=True)
+    memory = FakeMemory(answered=["q1"])
+
+    index, seen = question_bank.load(memory)
+    assert index["levels"] == {}
+    assert seen == set()
+    assert memory.queries == 0
+
+    rows.append(_row(1, "a", "q1"))
+    question_bank = QuestionBank(enabled=True)
+    index, seen = question_bank.load(memory)
+    assert seen == {question_id("subject", "q1")}
+    assert memory.queries == 1
+    # Cached per student
+    question_bank.load(memory)
+    assert memory.queries == 1
+
+
+def test_failed_index_load_is_cached_and_disables_top_ups(monkeypatch):
+    calls = []
+
+    def fail(subject_id):
+        calls.append(subject_id)
+        raise RuntimeError("no table")
+
+    monkeypatch.setattr(bank, "fetch_questions", fail)
+    question_bank = QuestionBank(enabled=True)
+    assert question_bank.index("subject")["loaded"] is False
+    question_bank.index("subject")
+    assert calls == ["subject"]
+    assert question_bank.stats()["load_errors"] == 1
+
+
+def test_next_level_follows_the_adaptive_rules(rows):
+    rows.append(_row(2, "a", "q2"))
+    question_bank = QuestionBank(enabled=True)
+    index = question_bank.index("subject")
+
+    assert question_bank.next_level("user", "subject", {}, [], index) == 1
+    # Level from the bank's index
+    answered = {"question": "q2", "marks": 9}
+    assert question_bank.next_level("user", "subject", answered, [answered], index) == 3
+    assert question_bank.next_level("user", "subject", answered, [answered], index, max_level=2) == 2
+    # Level recorded when the question was served
+    question_bank.served("user", "subject", "live question", 4)
+    answered = {"question": "live question", "marks": 6}
+    assert question_bank.next_level("user", "subject", answered, [answered], index) == 4
+    # Unknown level
+    answered = {"question": "unknown", "marks": 9}
+    assert question_bank.next_level("user", "subject", answered, [answered], index) is None
@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from google.genai import errors
+from src.llm import calls
+from src.llm.calls import RetryPolicy, is_retryable
+
+
+def api_error(code):
+    return errors.APIError(code, {"error": {"code": code, "message": "error", "status": "ERROR"}})
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (api_error(429), True),
+    (api_error(503), True),
+    (api_error(500), True),
+    (api_error(400), False),
+    (api_error(404), False),
+    (httpx.ConnectError("refused"), True),
+    (ValueError("bad json"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_delay_is_full_jitter_capped_at_max_delay(monkeypatch):
+    policy = RetryPolicy(max_attempts=10, base_delay=0.5, max_delay=4)
+    monkeypatch.setattr(calls.random, "uniform", lambda low, high: high)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [0.5, 1, 2, 4, 4]
+
+    monkeypatch.setattr(calls.random, "uniform", lambda low, high: low)
+    assert policy.delay(3) == 0
+
+
+def test_next_delay_gives_up(monkeypatch):
+    monkeypatch.setattr(calls.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(calls.time, "monotonic", lambda: 100.0)
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=8, max_elapsed=10)
+
+    assert policy.next_delay(1, 100.0, api_error(503)) == 1
+    # Out of attempts
+    assert policy.next_delay(3, 100.0, api_error(503)) is None
+    # Not a transient error
+    assert policy.next_delay(1, 100.0, api_error(400)) is None
+    # Sleeping would pass the elapsed budget
+    assert policy.next_delay(2, 91.0, api_error(503)) is None
+
+
+def test_generate_content_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(calls.retry_policy, "delay", lambda attempt: 0)
+    response = MagicMock(usage_metadata=None)
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(side_effect=[api_error(503), response])
+
+    result = asyncio.run(calls.generate_content("retry-model", "hi", calls.types.GenerateContentConfig(), client=client))
+    assert result is response
+    assert client.aio.models.generate_content.await_count == 2
+
+
+def test_generate_content_does_not_retry_client_errors():
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(side_effect=api_error(400))
+
+    with pytest.raises(errors.APIError):
+        asyncio.run(calls.generate_content("retry-model", "hi", calls.types.GenerateContentConfig(), client=client))
+    assert client.aio.models.generate_content.await_count == 1
+
+
+def test_hedge_delay_is_tracked_per_model(monkeypatch):
+    monkeypatch.setattr(calls, "GEMINI_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(calls, "GEMINI_HEDGE_MIN_DELAY", 0.0)
+    tracker = calls.LatencyTracker(window=10)
+    for _ in range(3):
+        tracker.record("steps", "fast-model", 1.0)
+        tracker.record("steps", "slow-model", 20.0)
+
+    assert tracker.hedge_delay("steps", "fast-model") == 1.0
+    assert tracker.hedge_delay("steps", "slow-model") == 20.0
+    assert tracker.hedge_delay("grading", "fast-model") is None
+    assert set(tracker.stats()) == {"steps:fast-model", "steps:slow-model"}
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from pydantic import BaseModel
+from src.llm.singleflight import SingleFlight, request_key
+
+
+class Body(BaseModel):
+    model_name: str
+    question: str
+
+
+def test_request_key_ignores_key_order_and_accepts_models():
+    assert request_key("/grade", {"a": 1, "b": 2}) == request_key("/grade", {"b": 2, "a": 1})
+    assert request_key("/grade", {"a": 1}) != request_key("/steps", {"a": 1})
+    body = Body(model_name="m", question="q")
+    assert request_key("/grade", body) == request_key("/grade", {"question": "q", "model_name": "m"})
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    async def scenario():
+        flight = SingleFlight(enabled=True)
+        release = asyncio.Event()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.create_task(flight.do("k", upstream)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return flight, calls, await asyncio.gather(*waiters)
+
+    flight, calls, results = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["inflight"] == 0
+
+
+def test_exceptions_reach_every_caller_and_the_key_is_released():
+    async def scenario():
+        flight = SingleFlight(enabled=True)
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flight.do("k", failing), flight.do("k", failing), return_exceptions=True,
+        )
+
+        async def ok():
+            return "fresh"
+
+        return results, await flight.do("k", ok)
+
+    results, after = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert after == "fresh"
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight(enabled=True)
+        release = asyncio.Event()
+
+        async def upstream():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", upstream))
+        second = asyncio.create_task(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_disabled_runs_every_call():
+    async def scenario():
+        flight = SingleFlight(enabled=False)
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            return len(calls)
+
+        return await asyncio.gather(flight.do("k", upstream), flight.do("k", upstream))
+
+    assert sorted(asyncio.run(scenario())) == [1, 2]
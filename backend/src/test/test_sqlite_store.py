@@ -0,0 +1,77 @@
+from src.utils import sqlite_store
+from src.utils.sqlite_store import SQLiteStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(tmp_path, **kwargs):
+    options = {"ttl": 60, "max_rows": 100, "prune_every": 1}
+    options.update(kwargs)
+    return SQLiteStore(str(tmp_path / "store.sqlite3"), ["a", "b"], **options)
+
+
+def _rows(store, table):
+    return store._connection().execute(f"SELECT key FROM {table} ORDER BY rowid").fetchall()
+
+
+def test_get_set_and_replace(tmp_path):
+    store = _store(tmp_path)
+    assert store.get("a", "k") is None
+
+    store.set("a", "k", "one")
+    store.set("a", "k", "two")
+    assert store.get("a", "k") == "two"
+    # Tables are independent
+    assert store.get("b", "k") is None
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 2
+    store.close()
+
+
+def test_expired_rows_are_not_read_and_are_pruned(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sqlite_store.time, "time", clock)
+    store = _store(tmp_path, ttl=10)
+
+    store.set("a", "old", "x")
+    clock.now += 11
+    assert store.get("a", "old") is None
+
+    store.set("a", "new", "y")
+    assert _rows(store, "a") == [("new",)]
+    store.close()
+
+
+def test_prune_keeps_the_most_recently_written_rows(tmp_path):
+    store = _store(tmp_path, max_rows=3)
+    for key in ["k1", "k2", "k3", "k4"]:
+        store.set("a", key, key)
+    # Rewriting a key makes it the newest
+    store.set("a", "k2", "again")
+    store.set("a", "k5", "k5")
+
+    assert [key for (key,) in _rows(store, "a")] == ["k4", "k2", "k5"]
+    assert store.get("a", "k2") == "again"
+    store.close()
+
+
+def test_prune_runs_every_n_writes(tmp_path):
+    store = _store(tmp_path, max_rows=2, prune_every=3)
+    for key in ["k1", "k2", "k3", "k4"]:
+        store.set("a", key, key)
+    # Pruned on the 3rd write only
+    assert [key for (key,) in _rows(store, "a")] == ["k2", "k3", "k4"]
+    store.close()
+
+
+def test_errors_are_counted_not_raised(tmp_path):
+    store = SQLiteStore(str(tmp_path / "missing" / "store.sqlite3"), ["a"], ttl=60, max_rows=10)
+    store.set("a", "k", "v")
+    assert store.get("a", "k") is None
+    assert store.stats()["errors"] == 2
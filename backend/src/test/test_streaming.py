@@ -0,0 +1,91 @@
+import pytest
+from src.llm.streaming import JSONStreamParser, parse_partial_json
+
+
+def test_complete_document_parses_as_is():
+    assert parse_partial_json('{"a": 1, "b": [1, 2]}') == {"a": 1, "b": [1, 2]}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"feedback": "Good wo', {"feedback": "Good wo"}),
+    ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1, 2]}),
+    ('{"a": {"b": "x"', {"a": {"b": "x"}}),
+    ('{"a": 1, ', {"a": 1}),
+    # A key without a value yet is dropped
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": 1, "b": ', {"a": 1}),
+    ('{"a": "x", "b": tr', {"a": "x"}),
+])
+def test_truncated_documents_are_closed(text, expected):
+    assert parse_partial_json(text) == expected
+
+
+def test_escapes_cut_mid_sequence_are_dropped():
+    assert parse_partial_json('{"a": "line\\') == {"a": "line"}
+    assert parse_partial_json('{"a": "caf\\u00') == {"a": "caf"}
+    assert parse_partial_json('{"a": "say \\"hi') == {"a": 'say "hi'}
+
+
+def test_nothing_usable_returns_none():
+    assert parse_partial_json("") is None
+    assert parse_partial_json("tru") is None
+    # An object whose first key is still open has no fields yet
+    assert parse_partial_json('{"') == {}
+
+
+def test_parser_reports_text_deltas():
+    parser = JSONStreamParser(text_fields=["feedback"])
+    deltas = []
+    for chunk in ['{"feed', 'back": "Nice', ' work', '.", "marks": 9}']:
+        deltas.extend(parser.feed(chunk))
+
+    assert "".join(text for _, text in deltas) == "Nice work."
+    assert {field for field, _ in deltas} == {"feedback"}
+    assert parser.result() == {"feedback": "Nice work.", "marks": 9}
+
+
+def test_parser_ignores_non_object_prefixes():
+    parser = JSONStreamParser(text_fields=["feedback"])
+    assert parser.feed("[") == []
+
+
+def _feed_all(parser, chunks):
+    events = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        events.extend(parser.completed())
+    return events
+
+
+def test_completed_reports_array_items_once_the_next_starts():
+    parser = JSONStreamParser(array_fields=["curriculum"])
+    events = _feed_all(parser, [
+        '{"curriculum": [{"level": 1, "concepts": ["a"',
+        ']}, {"level": 2',
+        ', "concepts": ["b"]}',
+    ])
+    # The second level could still be cut short, so only the first is out
+    assert [(event["index"], event["value"]["level"]) for event in events] == [(0, 1)]
+
+    parser.feed("]}")
+    final = parser.completed(final=True)
+    assert final == [{"event": "item", "field": "curriculum", "index": 1, "value": {"level": 2, "concepts": ["b"]}}]
+    assert parser.completed(final=True) == []
+
+
+def test_completed_reports_value_fields_once_the_next_key_has_a_value():
+    parser = JSONStreamParser(array_fields=["curriculum"], value_fields=["meta"])
+    events = _feed_all(parser, ['{"meta": {"title": "Alg', 'ebra"}, "curriculum"'])
+    assert events == []
+
+    events = _feed_all(parser, [': ['])
+    assert events == [{"event": "field", "field": "meta", "value": {"title": "Algebra"}}]
+
+    parser.feed("]}")
+    assert parser.completed(final=True) == []
+
+
+def test_completed_final_takes_a_trailing_value_field():
+    parser = JSONStreamParser(value_fields=["meta"])
+    assert _feed_all(parser, ['{"meta": {"title": "X"}', "}"]) == []
+    assert parser.completed(final=True) == [{"event": "field", "field": "meta", "value": {"title": "X"}}]
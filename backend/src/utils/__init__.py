@@ -0,0 +1,3 @@
+"""
+Small shared helpers (caches, stores) used across the backend modules.
+"""
@@ -0,0 +1,458 @@
+"""
+Exact single-variable algebra for checking short answers locally.
+
+Expressions are parsed with the ast module into a whitelisted subset
+(numbers, one one-letter variable, + - * / ** and parentheses) and reduced
+to polynomials with Fraction coefficients: no eval(), no floating point.
+That covers the linear equations ("Solve for x: 2x + 4 = 10"), arithmetic
+and simplification questions most students answer with a single value;
+anything else raises AlgebraError (or check_answer() returns None) and is
+left to the model. sympy is intentionally not a dependency for this.
+"""
+
+import ast
+import re
+from fractions import Fraction
+from math import gcd
+from typing import Any, Dict, Optional, Tuple
+
+# degree -> coefficient, without zero coefficients
+Poly = Dict[int, Fraction]
+
+MAX_LENGTH = 200
+MAX_DEGREE = 8
+MAX_CONSTANT_EXPONENT = 64
+
+_ALLOWED = re.compile(r"^[0-9a-zA-Z.+\-*/()\s]*$")
+_IMPLICIT_PRODUCT = re.compile(r"(?<=[0-9.)a-zA-Z])\s*(?=[a-zA-Z(])|(?<=[)a-zA-Z])\s*(?=[0-9.])")
+_LATEX_FRAC = re.compile(r"\\[dt]?frac\{([^{}]*)\}\{([^{}]*)\}")
+_REPLACEMENTS = [
+    ("\\left", ""), ("\\right", ""), ("\\cdot", "*"), ("\\times", "*"), ("\\div", "/"),
+    ("$", ""), ("{", "("), ("}", ")"), ("[", "("), ("]", ")"),
+    ("−", "-"), ("–", "-"), ("×", "*"), ("·", "*"), ("÷", "/"), ("^", "**"), ("²", "**2"), ("³", "**3"),
+]
+
+# Leading instructions stripped from questions, by kind of expected answer
+_SOLVE = re.compile(
+    r"^\s*(?:solve|find|what is|what's|determine|calculate)(?:\s+(?:for|the value of))?\s+([a-zA-Z])\b"
+    r"\s*(?:[:,]|\b(?:if|when|in|given)\b)\s*",
+    re.IGNORECASE,
+)
+_SOLVE_PLAIN = re.compile(r"^\s*solve\s*(?:the equation)?\s*[:,]?\s*", re.IGNORECASE)
+_SIMPLIFY = re.compile(r"^\s*(?:simplify|expand)\s*(?:the expression)?\s*[:,]?\s*", re.IGNORECASE)
+_EVALUATE = re.compile(r"^\s*(?:what is|what's|calculate|compute|evaluate|find the value of|find)\s*[:,]?\s*", re.IGNORECASE)
+_ANSWER_PREFIX = re.compile(r"^\s*(?:the answer is|answer\s*:|ans\s*:)\s*", re.IGNORECASE)
+
+
+class AlgebraError(ValueError):
+    """The text is not an expression or equation this module can handle."""
+
+
+def _normalize(text: str) -> str:
+    if len(text) > MAX_LENGTH:
+        raise AlgebraError("expression too long")
+    text = _LATEX_FRAC.sub(r"((\1)/(\2))", text)
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    text = text.strip().rstrip(".?!").strip()
+    if not text or not _ALLOWED.match(text):
+        raise AlgebraError(f"unsupported characters in {text!r}")
+    return _IMPLICIT_PRODUCT.sub("*", text)
+
+
+def _add(a: Poly, b: Poly, sign: int = 1) -> Poly:
+    result = dict(a)
+    for degree, coefficient in b.items():
+        result[degree] = result.get(degree, Fraction(0)) + sign * coefficient
+    return {degree: c for degree, c in result.items() if c != 0}
+
+
+def _mul(a: Poly, b: Poly) -> Poly:
+    result: Poly = {}
+    for da, ca in a.items():
+        for db, cb in b.items():
+            result[da + db] = result.get(da + db, Fraction(0)) + ca * cb
+    result = {degree: c for degree, c in result.items() if c != 0}
+    if result and max(result) > MAX_DEGREE:
+        raise AlgebraError("degree too high")
+    return result
+
+
+def constant(poly: Poly) -> Optional[Fraction]:
+    """The polynomial's value if it has no variable terms, else None."""
+    if any(degree != 0 for degree in poly):
+        return None
+    return poly.get(0, Fraction(0))
+
+
+class _Parser:
+    def __init__(self):
+        self.variable: Optional[str] = None
+
+    def parse(self, text: str) -> Poly:
+        try:
+            tree = ast.parse(_normalize(text), mode="eval")
+        except SyntaxError:
+            raise AlgebraError(f"cannot parse {text!r}") from None
+        return self._node(tree.body)
+
+    def _node(self, node: ast.AST) -> Poly:
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            try:
+                value = Fraction(str(node.value))
+            except ValueError:
+                raise AlgebraError(f"unsupported number {node.value!r}") from None
+            return {0: value} if value else {}
+        if isinstance(node, ast.Name):
+            if len(node.id) != 1:
+                raise AlgebraError(f"unsupported name {node.id!r}")
+            if self.variable not in (None, node.id):
+                raise AlgebraError("more than one variable")
+            self.variable = node.id
+            return {1: Fraction(1)}
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = self._node(node.operand)
+            return operand if isinstance(node.op, ast.UAdd) else {d: -c for d, c in operand.items()}
+        if isinstance(node, ast.BinOp):
+            left, right = self._node(node.left), self._node(node.right)
+            if isinstance(node.op, ast.Add):
+                return _add(left, right)
+            if isinstance(node.op, ast.Sub):
+                return _add(left, right, -1)
+            if isinstance(node.op, ast.Mult):
+                return _mul(left, right)
+            if isinstance(node.op, ast.Div):
+                divisor = constant(right)
+                if not divisor:
+                    raise AlgebraError("division by zero or by a variable")
+                return {d: c / divisor for d, c in left.items()}
+            if isinstance(node.op, ast.Pow):
+                exponent = constant(right)
+                if exponent is None or exponent.denominator != 1:
+                    raise AlgebraError("unsupported exponent")
+                base = constant(left)
+                if base is not None and abs(exponent) <= MAX_CONSTANT_EXPONENT and (base or exponent >= 0):
+                    value = base ** int(exponent)
+                    return {0: value} if value else {}
+                if not 0 <= exponent <= MAX_DEGREE:
+                    raise AlgebraError("unsupported exponent")
+                result: Poly = {0: Fraction(1)}
+                for _ in range(int(exponent)):
+                    result = _mul(result, left)
+                return result
+        raise AlgebraError(f"unsupported syntax: {type(node).__name__}")
+
+
+def parse_expression(text: str) -> Tuple[Poly, Optional[str]]:
+    """
+    Parse an expression in at most one variable.
+
+    Returns:
+        (polynomial, variable name or None)
+
+    Raises:
+        AlgebraError: For anything outside the supported subset
+    """
+    parser = _Parser()
+    return parser.parse(text), parser.variable
+
+
+def parse_equation(text: str) -> Tuple[Poly, Optional[str]]:
+    """Parse "lhs = rhs" as the polynomial lhs - rhs (== 0)."""
+    sides = text.split("=")
+    if len(sides) != 2:
+        raise AlgebraError("expected exactly one '='")
+    parser = _Parser()
+    left, right = parser.parse(sides[0]), parser.parse(sides[1])
+    return _add(left, right, -1), parser.variable
+
+
+def solve_linear(text: str) -> Tuple[Fraction, str]:
+    """
+    Solve a linear equation in one variable.
+
+    Returns:
+        (solution, variable)
+
+    Raises:
+        AlgebraError: If the equation is not linear in exactly one variable
+    """
+    poly, variable = parse_equation(text)
+    if variable is None or not poly or max(poly) != 1:
+        raise AlgebraError("not a linear equation with a unique solution")
+    return -poly.get(0, Fraction(0)) / poly[1], variable
+
+
+def format_value(value: Fraction) -> str:
+    return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+
+
+def format_poly(poly: Poly, variable: str) -> str:
+    terms = []
+    for degree in sorted(poly, reverse=True):
+        coefficient = poly[degree]
+        magnitude = format_value(abs(coefficient))
+        if degree == 0:
+            term = magnitude
+        else:
+            power = variable if degree == 1 else f"{variable}^{degree}"
+            term = power if magnitude == "1" else f"{magnitude}{power}"
+        if not terms:
+            terms.append(f"-{term}" if coefficient < 0 else term)
+        else:
+            terms.append(f"{'-' if coefficient < 0 else '+'} {term}")
+    return " ".join(terms) or "0"
+
+
+def expected_answer(question: str) -> Optional[Dict[str, Any]]:
+    """
+    What a correct answer to `question` must equal, if it is a question of a
+    supported form:
+
+        "Solve for x: 2x + 4 = 10"      -> {"kind": "equation", "value": 3, "variable": "x"}
+        "What is 3/4 + 1/2?"            -> {"kind": "value", "value": 5/4}
+        "Simplify: 2(x + 3) - x"        -> {"kind": "expression", "poly": {...}, "variable": "x"}
+
+    Returns None for anything else (word problems, other subjects, ...).
+    """
+    # "Solve for x: ..." / "Find x if ...": the math is after the instruction
+    for pattern in (_SOLVE, _SOLVE_PLAIN):
+        match = pattern.match(question)
+        if match and "=" in question:
+            body = question[match.end():]
+            try:
+                value, variable = solve_linear(body)
+            except AlgebraError:
+                return None
+            if pattern is _SOLVE and match.group(1).lower() != variable.lower():
+                return None
+            return {"kind": "equation", "value": value, "variable": variable}
+
+    match = _SIMPLIFY.match(question)
+    if match:
+        try:
+            poly, variable = parse_expression(question[match.end():])
+        except AlgebraError:
+            return None
+        if variable is None:
+            return {"kind": "value", "value": constant(poly)}
+        return {"kind": "expression", "poly": poly, "variable": variable}
+
+    match = _EVALUATE.match(question)
+    if match:
+        try:
+            poly, variable = parse_expression(question[match.end():])
+        except AlgebraError:
+            return None
+        if variable is None:
+            return {"kind": "value", "value": constant(poly)}
+    return None
+
+
+def _power_degree(node: ast.AST) -> Optional[int]:
+    """Degree of a bare power of the variable ("x", "x**3"), else None."""
+    if isinstance(node, ast.Name):
+        return 1
+    if (
+        isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow) and isinstance(node.left, ast.Name)
+        and _is_integer(node.right) and node.right.value >= 2
+    ):
+        return node.right.value
+    return None
+
+
+def _is_integer(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and type(node.value) is int
+
+
+def _unsigned(node: ast.AST) -> ast.AST:
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        return node.operand
+    return node
+
+
+def _is_number(node: ast.AST) -> bool:
+    """A literal ("3", "1.25") or a fraction in lowest terms ("5/4", "-5/4")."""
+    if isinstance(node, ast.Constant):
+        return type(node.value) in (int, float)
+    return (
+        isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div)
+        and _is_integer(_unsigned(node.left)) and _is_integer(node.right)
+        and node.right.value > 1 and gcd(_unsigned(node.left).value, node.right.value) == 1
+    )
+
+
+def _term_degree(node: ast.AST) -> Optional[int]:
+    """Degree of a single term ("-3", "2x^2", "x/2", "3x/2", "1/2x"), else None."""
+    node = _unsigned(node)
+    if _is_number(node):
+        return 0
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div) and _is_integer(node.right):
+        degree = _variable_term_degree(_unsigned(node.left))
+        return degree if node.right.value > 1 else None
+    return _variable_term_degree(node)
+
+
+def _variable_term_degree(node: ast.AST) -> Optional[int]:
+    """Degree of "x^2" or "2x^2", else None."""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        for coefficient, power in ((node.left, node.right), (node.right, node.left)):
+            if _is_number(_unsigned(coefficient)):
+                return _power_degree(power)
+        return None
+    return _power_degree(node)
+
+
+def is_reduced(text: str) -> bool:
+    """
+    Whether `text` is a finished answer: a plain number ("5/4", "-1.25") or
+    an expanded polynomial with like terms combined ("x^2 + 2x + 1").
+
+    Echoed or unfinished working ("2(x + 3) - x", "(x+1)^2", "3/4 + 1/2",
+    "2^10", "6/2") is not.
+    """
+    try:
+        node = ast.parse(_normalize(text), mode="eval").body
+    except (AlgebraError, SyntaxError):
+        return False
+    terms = []
+    while isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        terms.append(node.right)
+        node = node.left
+    terms.append(node)
+    degrees = [_term_degree(term) for term in terms]
+    return None not in degrees and len(set(degrees)) == len(degrees)
+
+
+def _decimal_places(answer: str) -> Optional[int]:
+    match = re.fullmatch(r"\s*-?\d*\.(\d+)\s*", answer)
+    return len(match.group(1)) if match else None
+
+
+def check_answer(question: str, student_answer: str) -> Optional[Dict[str, Any]]:
+    """
+    Deterministically decide whether `student_answer` answers `question`.
+
+    Accepts "3", "x = 3", "3 = x", "6/2", "The answer is 3" for equations.
+    Simplify, expand and evaluate questions need a finished answer (see
+    is_reduced()): "x + 6" or "6 + x" for "Simplify: 2(x + 3) - x", but not
+    the question's own expression echoed back.
+
+    Returns:
+        {"correct": bool, "expected_answer": str}, or None when the question
+        isn't supported or the answer can't be judged exactly (working such
+        as "2x = 6" or "3/4 + 1/2", prose, rounded decimals) and the model
+        should decide.
+    """
+    expected = expected_answer(question)
+    if expected is None:
+        return None
+
+    answer = _ANSWER_PREFIX.sub("", (student_answer or "").replace("$", "")).strip()
+    variable = expected.get("variable")
+    if "=" in answer:
+        sides = [side.strip() for side in answer.split("=")]
+        if len(sides) != 2 or variable is None:
+            return None
+        if sides[0] == variable:
+            answer = sides[1]
+        elif sides[1] == variable:
+            answer = sides[0]
+        else:
+            # Further working ("2x = 6") rather than a final answer
+            return None
+
+    try:
+        poly, answer_variable = parse_expression(answer)
+    except AlgebraError:
+        return None
+    if expected["kind"] != "equation" and not is_reduced(answer):
+        # Unevaluated working; only the model can judge how far it got
+        return None
+
+    if expected["kind"] == "expression":
+        if answer_variable not in (None, variable):
+            return None
+        return {
+            "correct": poly == expected["poly"],
+            "expected_answer": format_poly(expected["poly"], variable),
+        }
+
+    value = constant(poly)
+    if value is None:
+        return None
+    expected_value = expected["value"]
+    expected_text = format_value(expected_value)
+    if variable:
+        expected_text = f"{variable} = {expected_text}"
+
+    if value != expected_value:
+        places = _decimal_places(answer)
+        if places is not None and abs(value - expected_value) <= Fraction(1, 2 * 10 ** places):
+            # A rounded decimal; how much credit that deserves is the model's call
+            return None
+    return {"correct": value == expected_value, "expected_answer": expected_text}
+
+
+def _answer_form(text: str) -> Tuple[str, Poly, Optional[str], str]:
+    """
+    Classify a short answer.
+
+    Returns:
+        ("value", poly, variable, value_text) for "3", "x = 3", "3 = x" or "2x + 1"
+        (variable is the one being assigned, if any), or
+        ("equation", lhs - rhs, variable, text) for any other equation
+    """
+    text = _ANSWER_PREFIX.sub("", text.replace("$", "")).strip()
+    sides = [side.strip() for side in text.split("=")]
+    if len(sides) == 1:
+        return "value", parse_expression(text)[0], None, text
+    if len(sides) != 2:
+        raise AlgebraError("expected at most one '='")
+    for name, value_text in (sides, sides[::-1]):
+        if re.fullmatch(r"[a-zA-Z]", name):
+            poly, variable = parse_expression(value_text)
+            if variable is None:
+                return "value", poly, name, value_text
+    poly, variable = parse_equation(text)
+    return "equation", poly, variable, text
+
+
+def equivalent_answers(answer: str, expected: str) -> Optional[bool]:
+    """
+    Whether a student's answer is mathematically the same as the expected one.
+
+    "x = 3" matches "3", "2x = 6" matches "6 = 2x" or "x*2 = 6" (equations
+    match up to a constant factor), "2 + 2x" matches "2x + 2". The answer
+    must be finished (see is_reduced()): working such as "6/2" for "3",
+    "2(x + 1)" for "2x + 2" or "2x = 10 - 4" for "2x = 6" isn't compared.
+
+    Returns:
+        True or False, or None when either side can't be parsed or the two
+        can't be compared exactly (different forms, unfinished working,
+        rounded decimals)
+    """
+    try:
+        kind, poly, variable, value_text = _answer_form(answer or "")
+        expected_kind, expected_poly, expected_variable, _ = _answer_form(expected or "")
+    except AlgebraError:
+        return None
+    if kind != expected_kind or not all(is_reduced(side) for side in value_text.split("=")):
+        return None
+
+    if kind == "equation":
+        if variable != expected_variable or set(poly) != set(expected_poly) or not poly:
+            return False if variable == expected_variable else None
+        ratio = expected_poly[max(poly)] / poly[max(poly)]
+        return all(poly[degree] * ratio == expected_poly[degree] for degree in poly)
+
+    if variable and expected_variable and variable != expected_variable:
+        return None
+    if poly == expected_poly:
+        return True
+    value, expected_value = constant(poly), constant(expected_poly)
+    if value is not None and expected_value is not None:
+        places = _decimal_places(value_text)
+        if places is not None and abs(value - expected_value) <= Fraction(1, 2 * 10 ** places):
+            return None
+    return False
@@ -0,0 +1,120 @@
+"""
+Small on-disk key/value store with a TTL, backed by SQLite.
+
+Used by the sqlite modes of the response cache and the Studio sessions: a
+file shared across restarts and workers, holding one or more tables of
+(key, text value, expires_at). Reads ignore expired rows; every
+`prune_every` writes to a table its expired rows are deleted and it is cut
+back to its `max_rows` most recently written rows.
+
+Pruning never scans the table. A write replaces the row, which gives it the
+next rowid, so rowids follow write order: the excess rows are the ones with
+rowid <= max(rowid) - max_rows, a range on the primary key. Expired rows are
+found through the expires_at index.
+
+The methods block; call them with asyncio.to_thread from async code.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class SQLiteStore:
+    def __init__(
+        self,
+        path: str,
+        tables: Iterable[str],
+        ttl: float,
+        max_rows: int,
+        prune_every: int = 500,
+        label: str = "sqlite store",
+    ):
+        """
+        Args:
+            path: SQLite file, created on first use
+            tables: Table names; each is created if missing
+            ttl: Seconds a row stays readable after it is written
+            max_rows: Rows kept per table (the most recently written)
+            prune_every: Writes to a table between two prunes of it
+            label: Name used in error messages
+        """
+        self.path = path
+        self.tables = tuple(tables)
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.prune_every = max(1, prune_every)
+        self.label = label
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = {table: 0 for table in self.tables}
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, table: str, key: str) -> Optional[str]:
+        """The value stored under `key`, or None if it is missing, expired or unreadable."""
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    f"SELECT value FROM {table} WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"❌ Error reading {self.label}: {e}")
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, table: str, key: str, value: str):
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._connection()
+                db.execute(
+                    f"INSERT OR REPLACE INTO {table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, now + self.ttl),
+                )
+                self._writes[table] += 1
+                if self._writes[table] % self.prune_every == 0:
+                    self._prune(db, table, now)
+                db.commit()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"❌ Error writing {self.label}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            for table in self.tables:
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)")
+            self._db.commit()
+        return self._db
+
+    def _prune(self, db: sqlite3.Connection, table: str, now: float):
+        db.execute(f"DELETE FROM {table} WHERE expires_at <= ?", (now,))
+        (newest,) = db.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()
+        if newest is not None and newest > self.max_rows:
+            db.execute(f"DELETE FROM {table} WHERE rowid <= ?", (newest - self.max_rows,))
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import os
 import json
@@ -7,7 +8,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 
 from studio.main import generate
 
-def test_chat_flow():
+async def test_chat_flow():
     print("\n--- Testing Chat Flow ---")
     
     # Step 1: User initiates
@@ -15,7 +16,7 @@ def test_chat_flow():
         "user_input": "I want to learn about Quantum Physics.",
         "history": []
     }
-    response = generate(model="gemini-2.5-pro", input_data=input_data)
+    response = await generate(model="gemini-2.5-pro", input_data=input_data)
     print("Step 1 Response:", response)
     
     if "tool" in response and response["tool"] == "conversation":
@@ -25,7 +26,7 @@ def test_chat_flow():
         input_data["history"].append({"user": input_data["user_input"], "model": response["args"]["message"]})
         input_data["user_input"] = "I am a complete beginner."
         
-        response = generate(model="gemini-2.5-pro", input_data=input_data)
+        response = await generate(model="gemini-2.5-pro", input_data=input_data)
         print("Step 2 Response:", response)
         
         if "tool" in response and response["tool"] == "cartridge_schema":
@@ -39,7 +40,7 @@ def test_chat_flow():
     else:
         print("Unexpected response in Step 1")
 
-def test_file_upload():
+async def test_file_upload():
     print("\n--- Testing File Upload ---")
     # Mock file URI (in a real scenario, this would be a valid GS URI or uploaded file)
     # Since we can't easily upload a file to Gemini here without a real key/file, 
@@ -59,11 +60,11 @@ def test_file_upload():
     }
     
     try:
-        response = generate(model="gemini-2.0-flash-exp", input_data=input_data)
+        response = await generate(model="gemini-2.0-flash-exp", input_data=input_data)
         print("File Upload Response:", response)
     except Exception as e:
         print(f"Caught expected exception (likely due to invalid API key or URI access): {e}")
 
 if __name__ == "__main__":
-    test_chat_flow()
-    # test_file_upload() # Commented out as we might not have a valid file URI accessible to the model
+    asyncio.run(test_chat_flow())
+    # asyncio.run(test_file_upload()) # Commented out as we might not have a valid file URI accessible to the model